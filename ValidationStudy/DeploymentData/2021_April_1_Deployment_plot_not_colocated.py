@@ -120,20 +120,24 @@ dfsu5['MS5803_T corrected']=dfsu5['MS5803_T']+Toffset_su5_MS
 
 #set up the figures and subfigures (aka axes)
 fig, axs = plt.subplots(3, sharex = True)
+#set the time axis before plotting, so the lines are decimated to what is shown
+axs[0].set_xlim(xmin=datetime.datetime(2021, 4, 1, hour=15, minute = 15), xmax=datetime.datetime(2021, 4, 5, hour=19))
 
 
-import numpy as np
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'host'))
+import decimate
 def plot_CDT_data(dfs,start1,end1,start2,end2,color_t,label_t,linewidth_t,linestyle_t,axs):
     
     for i in range(len(dfs)):
         df = dfs[i]
         mask = (((df.index > start1) & (df.index < end1)) 
             | ((df.index >= start2) & (df.index < end2)))
-        x_values = np.array(df.index)
     
-        #Plot a line on each figure
-        y_values_masked = np.ma.masked_where(mask, df)
-        line = axs[i].plot(x_values,y_values_masked, 
+        #Plot a line on each figure, decimated to the width of the axes; the
+        #masked windows are left as gaps
+        line = decimate.plot(axs[i], df.index, df, mask = mask,
                 color = color_t, 
                 label = label_t, 
                 linewidth = linewidth_t, 
@@ -165,7 +169,6 @@ handles,labels = axs[0].get_legend_handles_labels()
 handles = [handles[0],handles[4],handles[1],handles[2],handles[3]]
 
 #Set the axis limits
-axs[0].set_xlim(xmin=datetime.datetime(2021, 4, 1, hour=15, minute = 15), xmax=datetime.datetime(2021, 4, 5, hour=19))
 axs[0].set_ylim(ymin = 8, ymax = 13)
 axs[1].set_ylim(ymin = 0, ymax = 35)
 axs[2].set_ylim(ymin = 0, ymax = 4)
@@ -214,6 +217,11 @@ end2 = '2021-4-4 18:40'
 
 axs2 = fig2.get_axes()
 
+#zoom in before plotting, and decimate the lines copied from fig again for the new limits
+axs2[0].set_xlim(xmin=datetime.datetime(2021, 4, 2, hour=16), xmax=datetime.datetime(2021, 4, 3, hour=16))
+for ax in axs2:
+    decimate.refresh(ax)
+
 dfs = (dfsu1['therm_T corrected'], dfsu1['conductance'], dfsu1['depth'])
 plot_CDT_data(dfs, start1, end1, start2, end2,'b','SU1',0.3,'-',axs2)
 
@@ -245,7 +253,6 @@ axs2[0].xaxis.set_major_formatter(myFmt)
 
 #ReSet the axis limits
 
-axs2[0].set_xlim(xmin=datetime.datetime(2021, 4, 2, hour=16), xmax=datetime.datetime(2021, 4, 3, hour=16))
 axs2[0].set_ylim(8,16)
 axs2[1].set_ylim(0,30)
 #ax[2].set_ylim(0,3)
@@ -0,0 +1,178 @@
+"""Align the records of several logger units with a reference instrument.
+
+The deployment scripts compare each unit with the EXO sonde by slicing every frame to
+the same period by hand.  align() instead matches every unit to the times of the
+reference (or to a regular grid) at once: for each unit, the index of the record
+nearest to, at or before, or at or after each target time is found with a single
+np.searchsorted over the sorted times, and records further than the tolerance from
+the target give NaN.  There is no loop over rows, so weeks of data from many units
+align in well under a second.
+
+Example
+-------
+>>> import ingest, align
+>>> units = {'su1': ingest.read('datalogCTD_su1.txt'), 'su2': ingest.read('datalogCTD_su2.txt')}
+>>> sonde = ingest.read('sonde.txt')
+>>> df = align.align(units, sonde, columns = ['therm_T', 'pressure'], reference_columns = ['Temp C'],
+...                  tolerance = '60s', start = '2021-04-02 00:00', end = '2021-04-02 08:00')
+>>> dT = align.differences(df, 'therm_T', 'Temp C')
+>>> dT.mean()
+"""
+import numpy as np
+import pandas as pd
+
+METHODS = ('nearest', 'backward', 'forward')
+
+def sorted_times(df):
+    """Index of df as int64 nanoseconds, sorted, and the order that sorts the rows."""
+    times = df.index.to_numpy().astype('datetime64[ns]').view(np.int64)
+    valid = times != np.iinfo(np.int64).min    #NaT
+    order = np.flatnonzero(valid)
+    if not np.all(times[order][1:] >= times[order][:-1]):
+        order = order[np.argsort(times[order], kind = 'stable')]
+    return times[order], order
+
+def match(times, targets, tolerance = None, method = 'nearest'):
+    """Position in times of the record matched to each target time.
+
+    Parameters
+    ----------
+    times: :obj:'numpy.ndarray'
+        Sorted int64 times (ns)
+    targets: :obj:'numpy.ndarray'
+        int64 target times (ns), in any order
+    tolerance: int, optional
+        Largest difference (ns) accepted.  Default none (any)
+    method: str, optional
+        'nearest' (default), 'backward' (last record at or before the target, as
+        pd.merge_asof) or 'forward' (first record at or after it)
+
+    Returns
+    -------
+    :obj:'numpy.ndarray'
+        Positions, -1 where there is no record within the tolerance
+    """
+    if method not in METHODS:
+        raise ValueError('method must be one of %s' % (METHODS,))
+    if len(times) == 0:
+        return np.full(len(targets), -1, dtype = np.int64)
+    after = np.searchsorted(times, targets, side = 'left')
+    if method == 'backward':
+        pos = np.searchsorted(times, targets, side = 'right') - 1
+    elif method == 'forward':
+        pos = after
+    else:
+        before = np.clip(after - 1, 0, len(times) - 1)
+        later = np.clip(after, 0, len(times) - 1)
+        pos = np.where(np.abs(times[later] - targets) < np.abs(targets - times[before]), later, before)
+    valid = (pos >= 0) & (pos < len(times))
+    pos = np.where(valid, pos, 0)
+    if tolerance is not None:
+        valid &= np.abs(times[pos] - targets) <= tolerance
+    return np.where(valid, pos, -1)
+
+def take(df, order, pos, columns):
+    """Columns of df at sorted positions pos (-1 gives NaN), as a dict of arrays."""
+    rows = order[np.maximum(pos, 0)]
+    missing = pos < 0
+    out = {}
+    for name in columns:
+        values = df[name].to_numpy()
+        if not np.issubdtype(values.dtype, np.floating):
+            values = values.astype(np.float64)
+        picked = values[rows]
+        picked[missing] = np.nan
+        out[name] = picked
+    return out
+
+def align(units, reference, columns = None, reference_columns = None, tolerance = None, method = 'nearest',
+          start = None, end = None, freq = None, reference_name = 'reference'):
+    """Match the records of every unit to the reference times, or to a regular grid.
+
+    Parameters
+    ----------
+    units: dict
+        Unit name to DataFrame indexed by datetime, e.g. from ingest.read()
+    reference: :obj:'pandas.DataFrame'
+        Reference instrument records, indexed by datetime
+    columns: list of str, optional
+        Columns taken from each unit that has them.  Default all columns of each unit
+    reference_columns: list of str, optional
+        Columns taken from the reference.  Default all numeric columns
+    tolerance: str or :obj:'pandas.Timedelta', optional
+        Largest time difference between a target and the matched record, e.g. '60s'.
+        Default none (any)
+    method: str, optional
+        'nearest' (default), 'backward' or 'forward', see match()
+    start, end: str or datetime-like, optional
+        Only targets from start to end (inclusive)
+    freq: str, optional
+        If given, the targets are a regular grid with this spacing (e.g. '30s') from
+        start (or the first reference time) to end (or the last), and the reference is
+        matched to the grid like the units.  Default none (the reference times)
+    reference_name: str, optional
+        Name of the reference in the result, default 'reference'
+
+    Returns
+    -------
+    :obj:'pandas.DataFrame'
+        Indexed by the target times, with (name, column) MultiIndex columns, so
+        df['su1'] is the frame of unit su1
+    """
+    tol = None if tolerance is None else pd.Timedelta(tolerance).value
+    if reference_columns is None:
+        reference_columns = [name for name in reference.columns if pd.api.types.is_numeric_dtype(reference[name])]
+    [ref_times, ref_order] = sorted_times(reference)
+    if len(ref_times) == 0:
+        raise ValueError('the reference has no records with a valid time')
+    lo = ref_times[0] if start is None else pd.Timestamp(start).value
+    hi = ref_times[-1] if end is None else pd.Timestamp(end).value
+
+    if freq is None:
+        keep = (ref_times >= lo) & (ref_times <= hi)
+        targets = ref_times[keep]
+        pos = np.flatnonzero(keep)
+    else:
+        targets = pd.date_range(pd.Timestamp(lo), pd.Timestamp(hi), freq = freq).to_numpy().astype('datetime64[ns]').view(np.int64)
+        pos = match(ref_times, targets, tol, method)
+
+    data = {}
+    for name, column in take(reference, ref_order, pos, reference_columns).items():
+        data[(reference_name, column)] = column
+    for unit, df in units.items():
+        names = list(df.columns) if columns is None else [name for name in columns if name in df.columns]
+        [times, order] = sorted_times(df)
+        pos = match(times, targets, tol, method)
+        for name, column in take(df, order, pos, names).items():
+            data[(unit, name)] = column
+
+    index = pd.DatetimeIndex(targets.view('datetime64[ns]'), name = 'datetime')
+    aligned = pd.DataFrame(data, index = index)
+    aligned.columns = pd.MultiIndex.from_tuples(aligned.columns, names = ['unit', 'column'])
+    return aligned
+
+def differences(aligned, column, reference_column, reference_name = 'reference'):
+    """Unit minus reference for one column, with one column per unit that has it.
+
+    Parameters
+    ----------
+    aligned: :obj:'pandas.DataFrame'
+        Returned by align()
+    column: str
+        Column of the units, e.g. 'therm_T'
+    reference_column: str
+        Matching column of the reference, e.g. 'Temp C'
+    reference_name: str, optional
+        Name of the reference in aligned, default 'reference'
+
+    Returns
+    -------
+    :obj:'pandas.DataFrame'
+        Differences, indexed like aligned
+    """
+    ref = aligned[(reference_name, reference_column)].to_numpy()
+    out = {}
+    for unit in aligned.columns.get_level_values(0).unique():
+        if unit != reference_name and (unit, column) in aligned.columns:
+            out[unit] = aligned[(unit, column)].to_numpy() - ref
+    return pd.DataFrame(out, index = aligned.index)
@@ -0,0 +1,117 @@
+"""Host check and benchmark of the derived-quantity kernels against the scalar formulas.
+
+Compares ``derived.salinity_batch`` (Horner form), ``k25_batch`` and
+``TDS_batch`` on ``array.array`` buffers with the salinity, k25 and TDS equations as
+written in cond_sensor before derived.py, over the range of temperature and
+conductance seen in fresh, estuarine and sea water.  If NumPy is installed, the
+vectorized functions in reprocess.py are checked the same way.  Run from any
+directory::
+
+    python host/bench_derived.py
+
+The script exits with an error if any kernel differs from the scalar formula by more
+than the tolerance.  Timings are for CPython, so only the relative cost is meaningful
+for a pyboard.
+"""
+import array as arr
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'pyboard'))
+sys.path.insert(0, HERE)
+import derived
+try:
+    import numpy as np
+    import reprocess
+except ImportError:
+    np = None
+
+#largest relative difference from the scalar formulas accepted
+TOL = 1e-5
+
+def salinity_scalar(T, k):
+    """Salinity as computed by cond_sensor.salinity() before derived.py."""
+    B0 = 0.13855E1
+    B1 = -0.46485668E-1
+    B2 = 0.14887785E-2
+    B3 = -0.63083433E-4
+    B4 = 0.25144517E-5
+    B5 = -0.59600245E-7
+    B6 = 0.57778085E-9
+    K = B0 + B1*T + B2*T**2 + B3*T**3 + B4*T**4 + B5*T**5 + B6*T**6
+    A = 0.36996/(k**(-1.07)-0.7464E-3)
+    chlorinity = A * K
+    salinity = 1.80655 * chlorinity
+    return salinity
+
+def k25_scalar(k, T):
+    """As cond_sensor.k25()."""
+    return k*(1/(1+0.0191*(T-25)))
+
+def TDS_scalar(k25):
+    """As cond_sensor.TDS()."""
+    return 0.65*k25
+
+def make_readings(n):
+    """Random temperatures (degrees C) and conductances (mS/cm), as float arrays."""
+    T = arr.array('f', [random.uniform(-2, 35) for i in range(n)])
+    k = arr.array('f', [10**random.uniform(-1, 1.9) for i in range(n)])
+    return T, k
+
+def max_relative(a, b):
+    """Largest relative difference between two sequences."""
+    return max(abs(x - y)/abs(y) for x, y in zip(a, b))
+
+def time_call(func, repeats = 20):
+    """Mean time per call (microseconds)."""
+    start = time.perf_counter()
+    for i in range(repeats):
+        func()
+    return (time.perf_counter() - start)/repeats*1e6
+
+def run(n = 1000):
+    """Print the timing and largest difference of each kernel; return False if any exceeds TOL."""
+    [T, k] = make_readings(n)
+    out = arr.array('f', [0]*n)
+    expected_S = [salinity_scalar(T[i], k[i]) for i in range(n)]
+    expected_k25 = [k25_scalar(k[i], T[i]) for i in range(n)]
+    expected_TDS = [TDS_scalar(x) for x in expected_k25]
+
+    cases = [('salinity scalar formula', lambda: [salinity_scalar(T[i], k[i]) for i in range(n)], expected_S),
+             ('salinity_batch', lambda: derived.salinity_batch(T, k, out), expected_S),
+             ('k25 scalar formula', lambda: [k25_scalar(k[i], T[i]) for i in range(n)], expected_k25),
+             ('k25_batch', lambda: derived.k25_batch(k, T, out), expected_k25),
+             ('TDS_batch', lambda: derived.TDS_batch(arr.array('f', expected_k25), out), expected_TDS)]
+    if np is not None:
+        T_np = np.array(T, dtype = float)
+        k_np = np.array(k, dtype = float)
+        cases += [('reprocess.salinity', lambda: reprocess.salinity(T_np, k_np), expected_S),
+                  ('reprocess.k25', lambda: reprocess.k25(k_np, T_np), expected_k25),
+                  ('reprocess.TDS', lambda: reprocess.TDS(np.array(expected_k25)), expected_TDS)]
+
+    ok = True
+    print('%-28s %12s %12s' % ('kernel (%d values)' % n, 'time (us)', 'max rel diff'))
+    for name, func, expected in cases:
+        elapsed = time_call(func)
+        diff = max_relative(func(), expected)
+        ok = ok and diff <= TOL
+        print('%-28s %12.1f %12.2g%s' % (name, elapsed, diff, '' if diff <= TOL else '  FAIL'))
+    if np is None:
+        print('NumPy not installed; reprocess.py not checked')
+
+    #missing temperature and non-positive conductance give -999
+    missing = list(derived.salinity_batch([-999, 20, 20], [40, 0, -1], out, 3)[:3])
+    missing.append(derived.k25_batch([40], [-999], out, 1)[0])
+    missing.append(derived.TDS_batch([-999], out, 1)[0])
+    if missing != [-999]*5:
+        print('missing values not kept as -999: %s' % missing)
+        ok = False
+    return ok
+
+if __name__ == '__main__':
+    random.seed(1)
+    if not run():
+        sys.exit('derived kernels disagree with the scalar formulas')
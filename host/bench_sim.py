@@ -0,0 +1,100 @@
+"""Benchmark the unmodified firmware drivers on the host simulator (see sim).
+
+For each call, reports the host time per call, the peak heap allocated during one call
+(tracemalloc), the modeled time the board is awake, the number of ADC reads and I2C
+bytes, and the difference between the result and the value set on the model.  Run from
+any directory::
+
+    python host/bench_sim.py
+
+Host times are for CPython and only useful for comparing versions of the code.  The
+modeled awake time is the sum of the sleeps in the code and the assumed cost of each
+ADC read, pin write and I2C byte (sim.Model.COSTS); it does not include the time the
+MicroPython interpreter spends running the code.
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sim
+
+def run_case(model, name, func, truth, repeats):
+    """Run func repeats times and print one line of results."""
+    func()   #first call builds lookup tables and allocates buffers
+    model.reset_counts()
+    awake = model.clock.awake_us
+    start = time.perf_counter()
+    for i in range(repeats):
+        result = func()
+    host_us = (time.perf_counter() - start)/repeats*1e6
+    awake_us = (model.clock.awake_us - awake)/repeats
+    adc = model.counts['adc_read']/repeats
+    i2c = model.counts['i2c_byte']/repeats
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('%-34s %10.0f %10d %12.0f %8.0f %6.0f %10.3g' % (name, host_us, peak, awake_us, adc, i2c, result - truth))
+
+def quiet(func):
+    """Call func with its printed output discarded."""
+    def wrapper():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func()
+    return wrapper
+
+def pyboard_cases(repeats):
+    model = sim.install(sim.Model(cell_resistance = 800, temperature = 15, pressure = 1100))
+    conductivity4pole = sim.load('conductivity4pole')
+    thermistor_ac = sim.load('thermistor_ac')
+    pressure = sim.load('pressure')
+    sensor_bank = sim.load('sensor_bank')
+    from pyb import Pin, ADC
+    import machine
+
+    gpio1 = Pin('X3', Pin.OUT_PP)
+    gpio2 = Pin('X4', Pin.OUT_PP)
+    adc4_therm = ADC('X8')
+    sensor = conductivity4pole.cond_sensor(gpio1, gpio2, ADC('X5'), ADC('X6'), ADC('X7'), adc4_therm,
+                                           250, 20000, 1, 0, gpio1, gpio2)
+    i2c = machine.I2C(scl='X9', sda='X10', freq = 100000)
+    pres_power = Pin('Y7', Pin.OUT_PP)
+    pres_gnd = Pin('Y8', Pin.OUT_PP)
+    ms5803 = pressure.MS5803_sensor(i2c, pres_power, pres_gnd)
+
+    R = model.cell_resistance
+    T = model.temperature
+    run_case(model, 'measure() R1', lambda: sensor.measure()[0], R, repeats)
+    run_case(model, 'measure(combined=True) R1', lambda: sensor.measure(combined = True)[0], R, repeats)
+    run_case(model, 'measure(burst=True) R1', lambda: sensor.measure(burst = True)[0], R, repeats)
+    run_case(model, 'measure(n=50) R1', lambda: sensor.measure(n = 50)[0], R, repeats)
+    #four probes on the same simulated cell, each resting 500 us between polarities
+    bank = sensor_bank.sensor_bank([conductivity4pole.cond_sensor(gpio1, gpio2, ADC('X5'), ADC('X6'), ADC('X7'), adc4_therm,
+                                                                  250, 20000, 1, 0, gpio1, gpio2) for i in range(4)])
+    run_case(model, 'measure(combined, off=500) R1', lambda: sensor.measure(combined = True, off1 = 500, off2 = 500)[0], R, repeats)
+    run_case(model, 'sensor_bank 4 probes, off=500', lambda: bank.measure(off = 500)[0], R, repeats)
+    run_case(model, 'temperature(n=400, lut=False)', lambda: thermistor_ac.temperature(adc4_therm, gpio1, gpio2, 20000, 400, False), T, repeats)
+    run_case(model, 'temperature(n=400)', lambda: thermistor_ac.temperature(adc4_therm, gpio1, gpio2, 20000, 400), T, repeats)
+    run_case(model, 'MS5803() pressure', quiet(lambda: pressure.MS5803(i2c, pres_power, pres_gnd)[0]), model.pressure, repeats)
+    run_case(model, 'MS5803_sensor.read() pressure', lambda: ms5803.read()[0], model.pressure, repeats)
+    sim.unload()
+
+def pico_cases(repeats):
+    model = sim.install(sim.Model.pico(cell_resistance = 800))
+    conductivity4pole = sim.load('conductivity4pole', 'pico')
+    from machine import Pin, ADC
+    sensor = conductivity4pole.cond_sensor(Pin(19, Pin.OUT), Pin(20, Pin.OUT), ADC(26), ADC(27), ADC(28), None, 250, 20000, 1, 0)
+    run_case(model, 'pico measure(n=50) R1', lambda: sensor.measure(n = 50)[0], model.cell_resistance, repeats)
+    sim.unload()
+
+def run(repeats = 20):
+    print('%-34s %10s %10s %12s %8s %6s %10s' % ('call', 'host (us)', 'heap (B)', 'awake (us)', 'ADC', 'I2C', 'error'))
+    pyboard_cases(repeats)
+    pico_cases(repeats)
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,75 @@
+"""Host benchmark of robust_stats against the sort-based interquartile mean.
+
+Compares the time and peak heap use of ``sum(sorted(a)[lower:upper])/length``, as used
+by the drivers before robust_stats, with ``robust_stats.trimmed_mean`` on float and
+integer ``array.array`` buffers of the sizes used on the boards (12 and 50 conductivity
+samples, 400 thermistor samples) and a larger burst (4000).  Run from any directory::
+
+    python host/bench_stats.py
+
+Timings are for CPython, so only the relative cost is meaningful for a pyboard.
+"""
+import array as arr
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'pyboard'))
+sys.path.insert(0, HERE)
+#robust_stats imports micropython for its code emitter decorator
+from sim import micropython
+sys.modules.setdefault('micropython', micropython)
+import robust_stats
+
+def sorted_mean(a):
+    """Interquartile mean as computed by the drivers before robust_stats."""
+    n = len(a)
+    upper_index = math.ceil(3*n/4)
+    lower_index = math.floor(n/4)
+    sampled_length = (upper_index - lower_index)
+    return sum(sorted(a)[lower_index:upper_index])/sampled_length
+
+def make_buffers(typecode, n, repeats):
+    """Identical random buffers, one per repeat, since trimmed_mean reorders in place."""
+    if typecode == 'f':
+        values = [random.gauss(250, 5) for i in range(n)]
+    else:
+        values = [random.randint(1500, 2500) for i in range(n)]
+    return [arr.array(typecode, values) for i in range(repeats)]
+
+def time_call(func, buffers):
+    """Mean time per call (microseconds)."""
+    start = time.perf_counter()
+    for a in buffers:
+        func(a)
+    return (time.perf_counter() - start)/len(buffers)*1e6
+
+def peak_heap(func, a):
+    """Peak heap allocated during a single call (bytes)."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func(a)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def run(sizes = (12, 50, 400, 4000), repeats = 200):
+    print('%-5s %6s %14s %14s %12s %12s %10s' % ('type', 'n', 'sorted (us)', 'select (us)', 'sorted (B)', 'select (B)', 'max diff'))
+    for typecode in ('f', 'l'):
+        for n in sizes:
+            buffers = make_buffers(typecode, n, repeats)
+            t_sorted = time_call(sorted_mean, buffers)
+            t_select = time_call(robust_stats.trimmed_mean, buffers)
+            check = make_buffers(typecode, n, 2)
+            diff = abs(sorted_mean(check[0]) - robust_stats.trimmed_mean(check[1]))
+            h_sorted = peak_heap(sorted_mean, make_buffers(typecode, n, 1)[0])
+            h_select = peak_heap(robust_stats.trimmed_mean, make_buffers(typecode, n, 1)[0])
+            print('%-5s %6d %14.1f %14.1f %12d %12d %10.2g' % (typecode, n, t_sorted, t_select, h_sorted, h_select, diff))
+
+if __name__ == '__main__':
+    random.seed(1)
+    run()
@@ -0,0 +1,233 @@
+"""Fit the calibration models to the calibration data of every unit and year at once.
+
+graph_calibration_2021.py fits each model to each unit with its own call to
+scipy.optimize.curve_fit and works out r2 by hand.  fit() fits every model to every
+(unit, year) data set in one call and returns one row per fit.  Three of the models
+are linear least-squares problems, solved directly from sums of the data; only the
+offset power law needs an iterative fit, and those fits are spread over a process pool.
+The models, fitted to the conductance y (1/R) as a function of the conductivity x of
+the standards as in graph_calibration_2021.py, are:
+
+================  =========================  ==========================================
+model             equation                   solution
+================  =========================  ==========================================
+'zero_intercept'  y = a*x                    closed form
+'linear'          y = a*x + c                closed form
+'log_log'         y = a*x**b                 closed form, linear fit of ln(y) on ln(x)
+'offset_power'    y = a*(x + c)**b           curve_fit, started from the log_log fit
+================  =========================  ==========================================
+
+The r2 of the log_log model is that of the logarithms (r2_loglog in the figures); the
+others are of y.  The residual statistics (rmse, ser, rmsre and the largest residual)
+are always of y.
+
+Run from any directory to print the fits of a calibration workbook::
+
+    python host/calfit.py ValidationStudy/CalibrationDataAndCode/Calibration_Data_all.xlsx
+
+Example
+-------
+>>> import calfit
+>>> data = calfit.read_workbook('Calibration_Data_all.xlsx')
+>>> fits = calfit.fit(data)
+>>> fits.loc[('SU2', 2021, 'log_log')]
+
+On Windows, call fit() with workers greater than 1 only from under
+``if __name__ == '__main__':``, since the pool starts new interpreters that import the
+calling script.
+"""
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+try:
+    from scipy.optimize import curve_fit
+except ImportError:
+    curve_fit = None
+
+MODELS = ('zero_intercept', 'linear', 'log_log', 'offset_power')
+#number of fitted coefficients, for the standard error of the regression
+PARAMETERS = {'zero_intercept': 1, 'linear': 2, 'log_log': 2, 'offset_power': 3}
+COLUMNS = ['n', 'a', 'b', 'c', 'r2', 'rmse', 'ser', 'rmsre', 'max_residual']
+
+def read_workbook(fname, x_column = 'Kt', y_column = '1/R (uS)', default_year = 2020, header = 3):
+    """Calibration data of every sheet of a workbook, as used by graph_calibration_2021.py.
+
+    Parameters
+    ----------
+    fname: str
+        Name of the .xlsx file
+    x_column, y_column: str, optional
+        Columns of the standard conductivity (uS/cm) and of 1/R (uS), default 'Kt' and
+        '1/R (uS)'; both are divided by 1000 (mS/cm and mS)
+    default_year: int, optional
+        Year of sheets named after the unit only (e.g. 'SU1'); sheets named with a date
+        (e.g. 'SU1 3-17-21') take the year of the date.  Default 2020
+    header: int, optional
+        Row of the column names, default 3
+
+    Returns
+    -------
+    dict
+        (unit, year) to (x, y) float64 arrays
+    """
+    sheets = pd.read_excel(fname, sheet_name = None, header = header)
+    data = {}
+    for name, df in sheets.items():
+        if x_column not in df.columns or y_column not in df.columns:
+            continue
+        match = re.match(r'\s*(\S+)\s+\d+-\d+-(\d+)\s*$', name)
+        if match:
+            unit = match.group(1)
+            year = int(match.group(2))
+            if year < 100:
+                year += 2000
+        else:
+            unit = name.strip()
+            year = default_year
+        x = pd.to_numeric(df[x_column], errors = 'coerce').to_numpy(dtype = np.float64)/1000
+        y = pd.to_numeric(df[y_column], errors = 'coerce').to_numpy(dtype = np.float64)/1000
+        data[(unit, year)] = (x, y)
+    return data
+
+def predict(model, a, b, c, x):
+    """Value of a fitted model at x, with the coefficients of a row returned by fit()."""
+    x = np.asarray(x, dtype = np.float64)
+    if model == 'zero_intercept':
+        return a*x
+    if model == 'linear':
+        return a*x + c
+    if model == 'log_log':
+        return a*x**b
+    if model == 'offset_power':
+        return a*(x + c)**b
+    raise ValueError('unknown model %s, expected one of %s' % (model, MODELS))
+
+def power_with_offset(x, a, b, c):
+    """The offset_power model, as in graph_calibration_2021.py."""
+    return a*(x + c)**b
+
+def line(x, y):
+    """Slope and intercept of the least-squares line through x, y."""
+    xm = x.mean()
+    ym = y.mean()
+    dx = x - xm
+    slope = (dx*(y - ym)).sum()/(dx*dx).sum()
+    return slope, ym - slope*xm
+
+def r_squared(y, fitted):
+    """Coefficient of determination of fitted values."""
+    return 1 - ((y - fitted)**2).sum()/((y - y.mean())**2).sum()
+
+def statistics(model, x, y, a, b, c, r2):
+    """Row of the fit table for one fit."""
+    n = len(x)
+    residuals = y - predict(model, a, b, c, x)
+    dof = n - PARAMETERS[model]
+    return {'n': n, 'a': a, 'b': b, 'c': c, 'r2': r2,
+            'rmse': np.sqrt((residuals**2).mean()),
+            'ser': np.sqrt((residuals**2).sum()/dof) if dof > 0 else np.nan,
+            'rmsre': np.sqrt(((residuals/y)**2).mean()),
+            'max_residual': np.abs(residuals).max()}
+
+def fit_closed_form(model, x, y):
+    """Least-squares fit of zero_intercept, linear or log_log, see the module docstring."""
+    if model == 'zero_intercept':
+        a = (x*y).sum()/(x*x).sum()
+        return statistics(model, x, y, a, np.nan, np.nan, r_squared(y, a*x))
+    if model == 'linear':
+        [a, c] = line(x, y)
+        return statistics(model, x, y, a, np.nan, c, r_squared(y, a*x + c))
+    if model == 'log_log':
+        [b, ln_a] = line(np.log(x), np.log(y))
+        return statistics(model, x, y, np.exp(ln_a), b, np.nan, r_squared(np.log(y), ln_a + b*np.log(x)))
+    raise ValueError('%s has no closed-form fit' % model)
+
+def fit_offset_power(x, y, p0):
+    """Fit of the offset power law by curve_fit; NaN coefficients if it does not converge.
+
+    Module-level so that it can be run in a process pool.
+    """
+    if curve_fit is None:
+        raise ImportError('the offset_power model needs scipy')
+    try:
+        [popt, pcov] = curve_fit(power_with_offset, x, y, p0 = p0, maxfev = 10000)
+    except (RuntimeError, ValueError):
+        popt = (np.nan, np.nan, np.nan)
+    [a, b, c] = popt
+    return statistics('offset_power', x, y, a, b, c, r_squared(y, power_with_offset(x, a, b, c)))
+
+def valid(model, x, y):
+    """x and y without missing values, and without values <= 0 for the power laws."""
+    keep = np.isfinite(x) & np.isfinite(y)
+    if model in ('log_log', 'offset_power'):
+        keep &= (x > 0) & (y > 0)
+    return x[keep], y[keep]
+
+def fit(data, models = MODELS, workers = None):
+    """Fit every model to every data set.
+
+    Parameters
+    ----------
+    data: dict
+        (unit, year) to (x, y) arrays, e.g. from read_workbook(); select the points used
+        (e.g. x[:36]) before passing them in
+    models: tuple of str, optional
+        Models to fit, default all of MODELS
+    workers: int, optional
+        Processes for the offset_power fits.  Default the number of processors; 1 runs
+        them in this process
+
+    Returns
+    -------
+    :obj:'pandas.DataFrame'
+        Indexed by (unit, year, model), with columns COLUMNS: points used, coefficients
+        a, b and c (NaN where the model has none), r2, root mean square error, standard
+        error of the regression, root mean square relative error and largest absolute
+        residual
+    """
+    for model in models:
+        if model not in MODELS:
+            raise ValueError('unknown model %s, expected one of %s' % (model, MODELS))
+    rows = {}
+    pending = []
+    for key, (x, y) in data.items():
+        x = np.asarray(x, dtype = np.float64)
+        y = np.asarray(y, dtype = np.float64)
+        for model in models:
+            [xm, ym] = valid(model, x, y)
+            if len(xm) < PARAMETERS[model]:
+                rows[key + (model,)] = dict(zip(COLUMNS, [len(xm)] + [np.nan]*(len(COLUMNS) - 1)))
+            elif model == 'offset_power':
+                #start from the power law without offset, which is usually close
+                [b, ln_a] = line(np.log(xm), np.log(ym))
+                pending.append((key + (model,), xm, ym, (np.exp(ln_a), b, 0.0)))
+            else:
+                rows[key + (model,)] = fit_closed_form(model, xm, ym)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers = min(workers, len(pending))) as pool:
+            results = pool.map(fit_offset_power, *zip(*[job[1:] for job in pending]))
+            for job, result in zip(pending, results):
+                rows[job[0]] = result
+    else:
+        for job in pending:
+            rows[job[0]] = fit_offset_power(*job[1:])
+
+    index = pd.MultiIndex.from_tuples(list(rows), names = ['unit', 'year', 'model'])
+    table = pd.DataFrame(list(rows.values()), index = index, columns = COLUMNS)
+    table['n'] = table['n'].astype(int)
+    return table.sort_index()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Fit the calibration models to every sheet of a workbook.')
+    parser.add_argument('fname')
+    parser.add_argument('--workers', type = int, default = None)
+    args = parser.parse_args()
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(fit(read_workbook(args.fname), workers = args.workers))
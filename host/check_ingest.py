@@ -0,0 +1,74 @@
+"""Host check that ingest.py turns the sentinel values of every layout into NaN.
+
+Writes a short log of each layout known to ingest.py, with failed readings recorded
+as -999 and -999999.33 as the loggers and the sonde write them, reads each one with
+ingest.read() (parsed, then again from the cache) and checks that the sentinel rows
+come back as NaN and the other rows with their values.  Run from any directory::
+
+    python host/check_ingest.py
+
+The script exits with an error if any value is not read as expected.  It needs
+NumPy and pandas; run it under each pandas version in use, since copy-on-write in
+pandas 3 changed which arrays can be written to.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+import numpy as np
+import ingest
+
+#layout to (header, rows); the second row of each holds the sentinels
+LOGS = {
+    'ctd': ('YY/MM/DD,Hour:Min:Sec,r1,r2,MS5803_T,pressure,therm_T',
+            ['2021/3/16,23:21:2,31.85,26.29,19.63,1010.01,18.22',
+             '2021/3/16,23:21:16,-999,-999,-999,-999,-999',
+             '2021/3/16,23:21:28,30.64,26.86,19.63,1010.01,18.20']),
+    'pres_temp': ('date,time,pressure(mbar),temperature(C)',
+                  ['2021/3/16,23:21:2,1010.01,19.63',
+                   '2021/3/16,23:21:16,-999,-999',
+                   '2021/3/16,23:21:28,1010.24,19.89']),
+    'pico': ('time(s),R1(ohm),R2(ohm),temp(C),pres(mbar)',
+             ['12.0,31.85,26.29,19.63,1010.01',
+              '24.0,-999,-999,-999,-999',
+              '36.0,30.64,26.86,19.63,1010.01']),
+    'sonde': ('Date (MM/DD/YYYY),Time (HH:mm:ss),Time (Fract. Sec),Site Name,Cond uS/cm,Temp C',
+              ['4/1/2021,13:30:30,0,Default,352.1,18.22',
+               '4/1/2021,13:31:00,0,Default,-999999.33,-999999.33',
+               '4/1/2021,13:31:30,0,Default,351.7,18.20']),
+    }
+
+def check(layout, df):
+    """True if the middle row of df is all NaN and the others have no NaN."""
+    values = df.drop(columns = ['seconds'], errors = 'ignore').to_numpy()
+    ok = df.attrs.get('layout') == layout and len(df) == 3
+    ok = ok and np.isnan(values[1]).all() and not np.isnan(values[[0, 2]]).any()
+    return ok
+
+def run():
+    """Write, read and check a log of each layout; True if all are as expected."""
+    folder = tempfile.mkdtemp()
+    ok = True
+    try:
+        for layout, (header, rows) in LOGS.items():
+            fname = os.path.join(folder, '%s.txt' % layout)
+            with open(fname, 'w', encoding = 'utf-8', newline = '') as f:
+                f.write('\r\n'.join([header] + rows) + '\r\n')
+            for source in ('parsed', 'cached'):
+                try:
+                    passed = check(layout, ingest.read(fname))
+                except Exception as e:
+                    print('%-10s %-7s %s' % (layout, source, e))
+                    passed = False
+                print('%-10s %-7s %s' % (layout, source, 'ok' if passed else 'FAIL'))
+                ok = ok and passed
+    finally:
+        shutil.rmtree(folder, ignore_errors = True)
+    return ok
+
+if __name__ == '__main__':
+    if not run():
+        sys.exit('sentinel values not read as NaN')
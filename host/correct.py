@@ -0,0 +1,127 @@
+"""Offset and drift corrections of logger units against a reference instrument.
+
+The deployment scripts compute one temperature offset per unit and sensor with a line
+each (sonde mean minus unit mean over the night of April 2).  estimate() finds the
+correction for every (unit, column) pair at once: the units are matched to the
+reference times with align.align(), the differences reference minus unit are stacked
+into one array with a column per pair, and the offsets (or the offsets and linear
+drift rates) come from column-wise sums that skip missing values.  apply() then adds
+each correction as a new column of the unit's frame (or replaces the column), without
+copying the rest of the frame.
+
+The offsets are not the same as those of the deployment scripts, which subtract the
+mean of each unit over the window from the mean of the sonde over it, each mean taken
+over its own records.  estimate() averages the differences of matched pairs instead,
+so records of one instrument with no counterpart in the other are left out.  Without a
+tolerance, every sonde record is matched to the nearest unit record however far away,
+so a unit record next to a gap is reused for every sonde record in the gap; pass a
+tolerance of about the logging interval to leave those out.
+
+Example
+-------
+Corrected temperatures for 2021_April_1_Deployment_plot.py, in one call each (close to,
+but not the same as, the script's mean() - mean() offsets):
+
+>>> import correct
+>>> units = {'su1': dfsu1, 'su2': dfsu2, 'su3': dfsu3, 'su5': dfsu5}
+>>> corrections = correct.estimate(units, dfsonde, {'therm_T': 'Temp C', 'MS5803_T': 'Temp C'},
+...                                start = '2021-04-02 00:00', end = '2021-04-02 08:00', tolerance = '60s')
+>>> correct.apply(units, corrections)
+>>> dfsu1['therm_T corrected']
+"""
+import numpy as np
+import pandas as pd
+
+import align
+
+def nanoseconds(index):
+    """DatetimeIndex as int64 nanoseconds."""
+    return index.to_numpy().astype('datetime64[ns]').view(np.int64)
+
+def estimate(units, reference, pairs, start = None, end = None, drift = False, tolerance = None, method = 'nearest',
+             min_count = 2):
+    """Offset, and optionally drift, of every unit column relative to the reference.
+
+    Parameters
+    ----------
+    units: dict
+        Unit name to DataFrame indexed by datetime
+    reference: :obj:'pandas.DataFrame'
+        Reference instrument records, indexed by datetime
+    pairs: dict
+        Unit column to the reference column it is corrected to, e.g. {'therm_T': 'Temp C'}
+    start, end: str or datetime-like, optional
+        Window used for the estimate, default all reference times
+    drift: boolean, optional
+        If true, fit offset + slope*(t - t0) by least squares instead of a constant
+        offset.  Default false
+    tolerance: str, optional
+        Largest time difference between matched records, as for align.align().
+        Default none (nearest record at any distance, see the module docstring)
+    method: str, optional
+        'nearest' (default), 'backward' or 'forward', as for align.align()
+    min_count: int, optional
+        Fewest matched records for an estimate; pairs with fewer get NaN.  Default 2
+
+    Returns
+    -------
+    :obj:'pandas.DataFrame'
+        Indexed by (unit, column), with the reference column, n (records used), offset
+        (added to the unit at t0), slope (per day, 0 unless drift) and t0 (start of the
+        window)
+    """
+    aligned = align.align(units, reference, columns = list(pairs), reference_columns = sorted(set(pairs.values())),
+                          tolerance = tolerance, method = method, start = start, end = end)
+    keys = [(unit, column) for unit in units for column in pairs if (unit, column) in aligned.columns]
+    if not keys:
+        raise ValueError('none of the units has a column in pairs')
+    units_values = np.column_stack([aligned[key].to_numpy(dtype = np.float64) for key in keys])
+    ref_values = np.column_stack([aligned[('reference', pairs[column])].to_numpy(dtype = np.float64) for unit, column in keys])
+    diff = ref_values - units_values
+    valid = ~np.isnan(diff)
+    n = valid.sum(axis = 0)
+    diff = np.where(valid, diff, 0)
+
+    t0 = aligned.index[0] if start is None else pd.Timestamp(start)
+    t = ((nanoseconds(aligned.index) - t0.value)/86400e9)[:, None]    #days since t0
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        mean_diff = diff.sum(axis = 0)/n
+        if drift:
+            mean_t = np.where(valid, t, 0).sum(axis = 0)/n
+            centred = np.where(valid, t - mean_t, 0)
+            slope = (centred*diff).sum(axis = 0)/(centred**2).sum(axis = 0)
+            offset = mean_diff - slope*mean_t
+        else:
+            slope = np.zeros(len(keys))
+            offset = mean_diff
+    few = n < min_count
+    offset[few] = np.nan
+    slope[few] = np.nan
+
+    index = pd.MultiIndex.from_tuples(keys, names = ['unit', 'column'])
+    return pd.DataFrame({'reference': [pairs[column] for unit, column in keys], 'n': n, 'offset': offset,
+                         'slope': slope, 't0': t0}, index = index)
+
+def apply(units, corrections, suffix = ' corrected'):
+    """Add the corrected values to the unit frames.
+
+    Parameters
+    ----------
+    units: dict
+        Unit name to DataFrame, as passed to estimate(); the frames are changed in place
+    corrections: :obj:'pandas.DataFrame'
+        Returned by estimate()
+    suffix: str, optional
+        Appended to the column name for the corrected column, default ' corrected'.
+        If None or '', the column itself is replaced.
+    """
+    for (unit, column), row in corrections.iterrows():
+        df = units[unit]
+        values = df[column].to_numpy(dtype = np.float64) + row['offset']
+        if row['slope']:
+            values += row['slope']*(nanoseconds(df.index) - row['t0'].value)/86400e9
+        dtype = df[column].dtype
+        if not np.issubdtype(dtype, np.floating):
+            dtype = np.float64
+        name = column + suffix if suffix else column
+        df[name] = values.astype(dtype, copy = False)
@@ -0,0 +1,258 @@
+"""Decimate long time series before plotting them.
+
+A line plot cannot show more than a few values per pixel of the axes, but matplotlib
+still transforms and draws every point it is given, so plotting a multi-month log is
+slow and most of the work is invisible.  plot() reduces the part of each series within
+the x limits of the axes to about two points per pixel of the axes width before passing
+it to matplotlib, so the time to draw stays about the same however long the record is.  Two methods are provided:
+
+============  ==========================================================================
+method        points kept
+============  ==========================================================================
+'minmax'      the lowest and highest value in each pixel-wide bucket of time, plus the
+              ends of the series, so spikes and the envelope of noisy records are drawn
+              exactly as with every point (default)
+'lttb'        Largest-Triangle-Three-Buckets: one point per bucket, the one forming the
+              largest triangle with the points kept on either side, which follows the
+              shape of smooth records with fewer points
+============  ==========================================================================
+
+Masked (excluded) and missing values are not bridged: the series is split into runs of
+valid values, each run is decimated on its own, and the runs are joined with NaN so
+matplotlib leaves the same gaps as when the full masked array is plotted.
+
+Example
+-------
+>>> import decimate
+>>> fig, ax = plt.subplots()
+>>> ax.set_xlim(datetime.datetime(2021, 4, 1, 15), datetime.datetime(2021, 4, 5, 19))
+>>> excluded = (df.index > '2021-4-2 14:20') & (df.index < '2021-4-3 16:40')
+>>> decimate.plot(ax, df.index, df['conductance'], mask = excluded, color = 'b', linewidth = 0.3)
+"""
+import matplotlib.dates as mdates
+import numpy as np
+
+METHODS = ('minmax', 'lttb')
+#points kept per pixel by minmax; lttb keeps twice as many buckets to match
+POINTS_PER_PIXEL = 2
+
+def pixels(ax):
+    """Width of the axes in display pixels, at the figure's dpi."""
+    return max(int(ax.get_window_extent().width), 1)
+
+def as_numbers(x):
+    """x as float64 for bucketing (datetimes as ns)."""
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').view(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+def runs(valid):
+    """Start and stop positions of the runs of True in a boolean array."""
+    edges = np.diff(np.concatenate(([0], valid.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def minmax(x, y, buckets):
+    """Positions of the minimum and maximum of y in each of buckets equal spans of x.
+
+    Parameters
+    ----------
+    x: :obj:'numpy.ndarray'
+        Sorted float64 positions
+    y: :obj:'numpy.ndarray'
+        Values, with no NaN
+    buckets: int
+        Number of buckets over the span of x
+
+    Returns
+    -------
+    :obj:'numpy.ndarray'
+        Sorted positions to keep, including the first and last
+    """
+    n = len(x)
+    if n <= 2*buckets + 2:
+        return np.arange(n)
+    span = x[-1] - x[0]
+    if span > 0:
+        bucket = np.minimum(((x - x[0])*(buckets/span)).astype(np.int64), buckets - 1)
+    else:
+        bucket = np.zeros(n, dtype = np.int64)
+    #x is sorted, so each bucket is a contiguous slice starting where the bucket changes
+    starts = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    counts = np.diff(np.append(starts, n))
+    owner = np.repeat(np.arange(len(starts)), counts)
+    keep = [starts, [n - 1]]
+    for reduce in (np.minimum, np.maximum):
+        extreme = np.repeat(reduce.reduceat(y, starts), counts)
+        hits = np.flatnonzero(y == extreme)
+        first = np.unique(owner[hits], return_index = True)[1]
+        keep.append(hits[first])
+    return np.unique(np.concatenate(keep))
+
+def lttb(x, y, points):
+    """Positions of the points kept by Largest-Triangle-Three-Buckets.
+
+    Parameters
+    ----------
+    x: :obj:'numpy.ndarray'
+        Sorted float64 positions
+    y: :obj:'numpy.ndarray'
+        Values, with no NaN
+    points: int
+        Number of points to keep, at least 3
+
+    Returns
+    -------
+    :obj:'numpy.ndarray'
+        Sorted positions to keep, including the first and last
+    """
+    n = len(x)
+    points = max(points, 3)
+    if n <= points:
+        return np.arange(n)
+    #the first and last points are kept; the rest are split into points - 2 buckets
+    edges = (1 + np.arange(points - 1)*((n - 2)/(points - 2))).astype(np.int64)
+    edges[-1] = n - 1
+    keep = np.empty(points, dtype = np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    #each choice depends on the previous one, so the loop is over buckets (one per pixel,
+    #however long the record); the work within a bucket is vectorized
+    for i in range(points - 2):
+        lo = edges[i]
+        hi = edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[hi:edges[i + 2]].mean()
+            next_y = y[hi:edges[i + 2]].mean()
+        else:
+            next_x = x[-1]
+            next_y = y[-1]
+        #twice the area of the triangle with the last point kept and the next bucket's mean
+        area = np.abs((x[a] - next_x)*(y[lo:hi] - y[a]) - (x[a] - x[lo:hi])*(next_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def decimate(x, y, buckets, mask = None, method = 'minmax', view = None):
+    """Decimated copy of a series, with NaN between runs of valid values.
+
+    Parameters
+    ----------
+    x: array_like
+        Sorted positions, float or datetime64 (e.g. a DatetimeIndex)
+    y: array_like
+        Values; NaN and masked values of a masked array are treated as missing
+    buckets: int
+        Number of buckets over the view, usually the axes width in pixels
+    mask: array_like of bool, optional
+        True where values are excluded, as for np.ma.masked_where.  Default none
+    method: str, optional
+        'minmax' (default) or 'lttb', see the module docstring
+    view: tuple, optional
+        (lo, hi) range of x shown, in the units of x.  Only points in the view are
+        decimated and the buckets are spread over it; the nearest point outside it on
+        each side is kept, so the line runs to the edge of the axes.  Default none
+        (the whole span of x)
+
+    Returns
+    -------
+    tuple of :obj:'numpy.ndarray'
+        x (same kind as given) and float64 y to plot
+    """
+    if method not in METHODS:
+        raise ValueError('method must be one of %s' % (METHODS,))
+    x = np.asarray(x)
+    xs = as_numbers(x)
+    y = np.ma.masked_invalid(np.ma.asarray(y, dtype = np.float64))
+    valid = ~np.ma.getmaskarray(y)
+    y = y.filled(np.nan)
+    if mask is not None:
+        valid &= ~np.asarray(mask, dtype = bool)
+    if view is None:
+        [lo, hi] = [-np.inf, np.inf]
+        span = xs[-1] - xs[0] if len(xs) > 1 else 0
+    else:
+        [lo, hi] = as_numbers(np.asarray(view, dtype = x.dtype))
+        span = hi - lo
+        #drop everything but the nearest point beyond each edge of the view
+        first = max(np.searchsorted(xs, lo, side = 'left') - 1, 0)
+        last = min(np.searchsorted(xs, hi, side = 'right') + 1, len(xs))
+        [x, xs, y, valid] = [x[first:last], xs[first:last], y[first:last], valid[first:last]]
+    [starts, stops] = runs(valid)
+    parts = []
+    for start, stop in zip(starts, stops):
+        #points of the run in the view; the one on either side is kept as it is
+        a = start + np.searchsorted(xs[start:stop], lo, side = 'left')
+        b = start + np.searchsorted(xs[start:stop], hi, side = 'right')
+        parts.append(np.arange(start, a))
+        if b > a:
+            #buckets in proportion to the share of the view covered by this run
+            share = (xs[b - 1] - xs[a])/span if span > 0 else 1
+            n = max(int(np.ceil(buckets*share)), 1)
+            if method == 'minmax':
+                pos = minmax(xs[a:b], y[a:b], n)
+            else:
+                pos = lttb(xs[a:b], y[a:b], POINTS_PER_PIXEL*n + 2)
+            parts.append(a + pos)
+        parts.append(np.arange(b, stop))
+        parts.append(np.array([-1]))    #gap
+    if not parts:
+        return x[:0], np.empty(0)
+    pos = np.concatenate(parts[:-1]).astype(np.int64)
+    gap = pos < 0
+    x_out = x[np.maximum(pos, 0)]
+    y_out = y[np.maximum(pos, 0)]
+    #repeat the x of the point before a gap, so the x values stay sorted
+    x_out[gap] = x_out[np.flatnonzero(gap) - 1]
+    y_out[gap] = np.nan
+    return x_out, y_out
+
+def x_view(ax, x):
+    """x limits of ax in the units of x, or None if they are still autoscaled."""
+    if ax.get_autoscalex_on():
+        return None
+    limits = ax.get_xlim()
+    if np.issubdtype(np.asarray(x).dtype, np.datetime64):
+        return tuple(np.datetime64(mdates.num2date(v).replace(tzinfo = None), 'ns') for v in limits)
+    return limits
+
+def plot(ax, x, y, mask = None, method = 'minmax', buckets = None, **kwargs):
+    """Plot a decimated series on an axes, sized to the axes width and x limits.
+
+    Set the x limits before plotting: the buckets are spread over the limits if they
+    have been set, and over the whole series while the axes are autoscaled.  After the
+    limits are changed, call refresh() to decimate the lines again.
+
+    Parameters
+    ----------
+    ax: :obj:'matplotlib.axes.Axes'
+        Axes to plot on
+    x, y, mask, method:
+        As for decimate()
+    buckets: int, optional
+        Number of buckets.  Default the width of ax in pixels
+    **kwargs:
+        Passed to ax.plot (color, label, linewidth, ...)
+
+    Returns
+    -------
+    list of :obj:'matplotlib.lines.Line2D'
+        As returned by ax.plot
+    """
+    x = np.asarray(x)
+    y = np.ma.asarray(y, dtype = np.float64)
+    if mask is not None:
+        mask = np.asarray(mask, dtype = bool)
+    [x_out, y_out] = decimate(x, y, pixels(ax) if buckets is None else buckets, mask, method, x_view(ax, x))
+    lines = ax.plot(x_out, y_out, **kwargs)
+    #kept on the line (and in pickled copies of the figure) for refresh()
+    lines[0].decimate_source = (x, y, mask, method, buckets)
+    return lines
+
+def refresh(ax):
+    """Decimate the lines drawn on ax by plot() again, for the current x limits and size."""
+    for line in ax.lines:
+        source = getattr(line, 'decimate_source', None)
+        if source is not None:
+            [x, y, mask, method, buckets] = source
+            line.set_data(*decimate(x, y, pixels(ax) if buckets is None else buckets, mask, method, x_view(ax, x)))
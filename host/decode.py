@@ -0,0 +1,150 @@
+"""Decode binary log files written by logwriter.log_writer.
+
+The files start with a 10-byte header (magic ``CTDB``, format version, record size and
+epoch year of the board's clock) followed by fixed-size records, so they are read
+straight into a NumPy structured array without parsing any text.  A partial record at
+the end of a file (e.g. if power failed during a write) is ignored.  Run from any
+directory to convert a file to the text layout the loggers write::
+
+    python host/decode.py datalogCTD.bin datalogCTD.txt --layout ctd
+
+The layouts are ``ctd`` (logger_ctd.log), ``pres_temp`` (logger_pres_temp.log) and
+``pico`` (logger_ctd_nothermistor_pico.log).
+"""
+import argparse
+import os
+import struct
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pyboard'))
+import logwriter
+
+HEADER_SIZE = struct.calcsize(logwriter.HEADER_FORMAT)
+DTYPE = np.dtype([('time', '<u4'), ('flags', '<u2'), ('n', '<u2'), ('n_T', '<u2')] +
+                 [(name, '<f4') for name in logwriter.FIELDS[4:]])
+COUNT_FIELDS = ('icount1', 'probe3count1', 'probe4count1', 'icount2', 'probe3count2', 'probe4count2')
+COUNTS_HEADER = ','.join(COUNT_FIELDS)
+#offset subtracted from the time column by the pico logger
+PICO_TIME_OFFSET = 1609459241
+
+def read_header(fname):
+    """Read and check the file header.
+
+    Parameters
+    ----------
+    fname: str
+        Name of the binary log file
+
+    Returns
+    -------
+    version: int
+        Record format version
+    epoch: int
+        Year of the epoch of the timestamps (2000 on the pyboard, 1970 on the pico)
+    """
+    with open(fname, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE:
+        raise ValueError('%s is too short to be a binary log file' % fname)
+    [magic, version, size, epoch] = struct.unpack(logwriter.HEADER_FORMAT, header)
+    if magic != logwriter.MAGIC:
+        raise ValueError('%s is not a binary log file' % fname)
+    if version != logwriter.VERSION or size != DTYPE.itemsize:
+        raise ValueError('%s has record format version %d (%d bytes), expected version %d (%d bytes)'
+                         % (fname, version, size, logwriter.VERSION, DTYPE.itemsize))
+    return version, epoch
+
+def read(fname):
+    """Read all complete records from a binary log file.
+
+    Parameters
+    ----------
+    fname: str
+        Name of the binary log file
+
+    Returns
+    -------
+    records: :obj:'numpy.ndarray'
+        Structured array with the fields in logwriter.FIELDS
+    epoch: int
+        Year of the epoch of the time field
+    """
+    [version, epoch] = read_header(fname)
+    count = (os.path.getsize(fname) - HEADER_SIZE)//DTYPE.itemsize
+    records = np.fromfile(fname, dtype = DTYPE, count = count, offset = HEADER_SIZE)
+    return records, epoch
+
+def datetimes(records, epoch):
+    """Convert the time field to numpy datetime64 values."""
+    return np.datetime64('%d-01-01' % epoch, 's') + records['time'].astype('timedelta64[s]')
+
+def to_dataframe(records, epoch):
+    """Convert records to a pandas DataFrame indexed by datetime.
+
+    -999 values (readings that failed or were not taken) are kept as they are in the text logs.
+    """
+    import pandas as pd
+    df = pd.DataFrame({name: records[name] for name in DTYPE.names})
+    df.index = pd.DatetimeIndex(datetimes(records, epoch), name = 'datetime')
+    return df
+
+def text(x):
+    """Format a float32 value the way %s formats a float on the board."""
+    return str(np.float32(x))
+
+def counts(rec):
+    """The six raw count columns of a record, as written by the loggers."""
+    return '%.2f,%.2f,%.2f,%.2f,%.2f,%.2f,' % tuple(rec[name] for name in COUNT_FIELDS)
+
+def burst(rec):
+    """1 if the record was taken at the fast rate of an event-triggered logger, else 0."""
+    return 1 if rec['flags'] & logwriter.FLAG_BURST else 0
+
+def to_csv(records, epoch, csvname, layout = 'ctd'):
+    """Write records in the text layout used by one of the loggers, with a header line.
+
+    Parameters
+    ----------
+    records: :obj:'numpy.ndarray'
+        Structured array returned by read()
+    epoch: int
+        Year of the epoch of the time field
+    csvname: str
+        Name of the text file to write
+    layout: str, optional
+        'ctd', 'pres_temp' or 'pico', default 'ctd'
+    """
+    if layout == 'ctd':
+        header = 'YY/MM/DD,Hour:Min:Sec,r1,r2,MS5803_T,pressure,therm_T,' + COUNTS_HEADER + ',n,n_T,burst,k\r\n'
+    elif layout == 'pres_temp':
+        header = 'date,time,pressure(mbar),temperature(C)\r\n'
+    elif layout == 'pico':
+        header = 'time(s),R1(ohm),R2(ohm),temp(C),pres(mbar),' + COUNTS_HEADER + ',n,burst,k\r\n'
+    else:
+        raise ValueError("layout must be 'ctd', 'pres_temp' or 'pico'")
+    stamps = datetimes(records, epoch).astype(object)
+    lines = [header]
+    for i in range(len(records)):
+        rec = records[i]
+        d = stamps[i]
+        date = '%s/%s/%s,%s:%s:%s,' % (d.year, d.month, d.day, d.hour, d.minute, d.second)
+        if layout == 'ctd':
+            lines.append(date + '%5.2f,%5.2f,%s,%s,%s,' % (rec['r1'], rec['r2'], text(rec['MS5803_T']), text(rec['pressure']), text(rec['T'])) + counts(rec) + '%d,%d,%d,%s\r\n' % (rec['n'], rec['n_T'], burst(rec), text(rec['k'])))
+        elif layout == 'pres_temp':
+            lines.append(date + '%s,%s\r\n' % (text(rec['pressure']), text(rec['MS5803_T'])))
+        else:
+            lines.append('%s,%5.2f,%5.2f,%5.2f,%5.1f,' % (int(rec['time']) - PICO_TIME_OFFSET, rec['r1'], rec['r2'], rec['MS5803_T'], rec['pressure']) + counts(rec) + '%d,%d,%s\r\n' % (rec['n'], burst(rec), text(rec['k'])))
+    with open(csvname, 'w', newline = '') as f:
+        f.writelines(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Convert a binary CTD log file to text.')
+    parser.add_argument('binfile')
+    parser.add_argument('csvfile')
+    parser.add_argument('--layout', default = 'ctd', choices = ['ctd', 'pres_temp', 'pico'])
+    args = parser.parse_args()
+    [records, epoch] = read(args.binfile)
+    to_csv(records, epoch, args.csvfile, args.layout)
+    print('%d records written to %s' % (len(records), args.csvfile))
@@ -0,0 +1,242 @@
+"""Read text logs from the loggers and the reference sonde into typed DataFrames, with a cache.
+
+The deployment scripts read each file with ``pd.read_csv(..., parse_dates=...)``, which
+guesses the date format row by row and does not handle every layout in use.  read()
+detects the layout from the header line, parses the date and time columns with a fixed
+format, converts every value column to float32 with the -999 and -999999.33 sentinels
+(failed or missing readings) turned into NaN, and returns a DataFrame indexed by
+datetime.  Known layouts are:
+
+============  ==========================================================================
+layout        header
+============  ==========================================================================
+'ctd'         YY/MM/DD,Hour:Min:Sec,r1,r2,... (logger_ctd.log, with or without the raw
+              counts; dates are year first, or month first in hand-processed files)
+'pres_temp'   date,time,pressure(mbar),temperature(C) (logger_pres_temp.log)
+'pico'        time(s),R1(ohm),R2(ohm),... (logger_ctd_nothermistor_pico.log)
+'pico_v1'     date,time,R1(ohm),R2(ohm),temp(C),pres(mbar) (early pico logger, whose rows
+              hold a single time in seconds)
+'sonde'       Date (MM/DD/YYYY),Time (HH:mm:ss),... (YSI sonde export)
+============  ==========================================================================
+
+Columns are renamed to the names used by logger_ctd.py (r1, r2, MS5803_T, pressure,
+therm_T), so files from different loggers can be compared directly.  The pico loggers
+record seconds since their clock was set (the pico clock starts at 2021-01-01 on power
+up unless it is set), which are kept in a 'seconds' column; pass the start and end
+times noted in the field book to place them in real time.
+
+The parsed result is saved as a NumPy .npz file in a .ingest_cache folder next to the
+source file, named after a hash of the file's contents and the options, so loading the
+same file again only reads the binary columns.
+
+Example
+-------
+>>> import ingest
+>>> su1 = ingest.read('datalogCTD_su1.txt')
+>>> su5 = ingest.read('datalogCTD_su5.txt', start = '2021-04-01 13:50:00', end = '2021-04-05 10:05:00')
+>>> sonde = ingest.read('sonde.txt')
+"""
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+#bump when parsing changes, so that older cache files are not used
+CACHE_VERSION = 1
+CACHE_DIR = '.ingest_cache'
+#values written for failed or missing readings
+SENTINELS = (-999, -999999.33)
+#time 0 of the pico loggers, which write time.time() - 1609459241
+PICO_EPOCH = np.datetime64('2021-01-01T00:00:41')
+#header column names to names used by logger_ctd
+RENAME = {'R1(ohm)': 'r1', 'R2(ohm)': 'r2', 'temp(C)': 'MS5803_T', 'pres(mbar)': 'pressure',
+          'pressure(mbar)': 'pressure', 'temperature(C)': 'MS5803_T', 'time(s)': 'seconds'}
+
+def detect(header):
+    """Name of the layout of a file with the given header line, see the module docstring."""
+    header = header.lstrip('\ufeff').strip()
+    if header.startswith('YY/MM/DD,Hour:Min:Sec'):
+        return 'ctd'
+    if header.startswith('date,time,pressure(mbar)'):
+        return 'pres_temp'
+    if header.startswith('time(s),'):
+        return 'pico'
+    if header.startswith('date,time,R1(ohm)'):
+        return 'pico_v1'
+    if header.startswith('Date (MM/DD/YYYY),Time (HH:mm:ss)'):
+        return 'sonde'
+    raise ValueError('unknown log layout with header %s' % header[:60])
+
+def parse_datetimes(dates, times):
+    """Combine date and time strings with a fixed format, year first or month first.
+
+    The order is taken from the first date: a four-digit first field means year first.
+    Rows that do not match give NaT.
+    """
+    first = str(dates.iloc[0]) if len(dates) else ''
+    if len(first.strip().split('/')[0]) == 4:
+        fmt = '%Y/%m/%d %H:%M:%S'
+    else:
+        fmt = '%m/%d/%Y %H:%M:%S'
+    return pd.to_datetime(dates.str.strip() + ' ' + times.str.strip(), format = fmt, errors = 'coerce')
+
+def pico_datetimes(seconds, start = None, end = None):
+    """Datetimes of pico records from their seconds column.
+
+    Parameters
+    ----------
+    seconds: array_like
+        Seconds since the pico clock was set
+    start: str or datetime-like, optional
+        Time of the first record.  Default none (PICO_EPOCH + seconds)
+    end: str or datetime-like, optional
+        Time of the last record.  If given with start, the clock drift is spread over
+        the records in proportion to the time since the first one.
+
+    Returns
+    -------
+    :obj:'numpy.ndarray'
+        datetime64[ns] values
+    """
+    seconds = np.asarray(seconds, dtype = float)
+    if len(seconds) == 0:
+        return np.array([], dtype = 'datetime64[ns]')
+    elapsed = seconds - seconds[0]
+    if start is None:
+        return (PICO_EPOCH + (seconds*1e9).astype('timedelta64[ns]')).astype('datetime64[ns]')
+    start = np.datetime64(pd.Timestamp(start).to_datetime64(), 'ns')
+    if end is not None and elapsed[-1] > 0:
+        span = (np.datetime64(pd.Timestamp(end).to_datetime64(), 'ns') - start)/np.timedelta64(1, 's')
+        elapsed = elapsed*span/elapsed[-1]
+    return start + (elapsed*1e9).astype('timedelta64[ns]')
+
+def to_float32(df, columns):
+    """Float32 array of each column, with the sentinels as NaN."""
+    out = {}
+    for name in columns:
+        values = pd.to_numeric(df[name], errors = 'coerce').to_numpy(dtype = np.float64)
+        #a new array rather than assigning into values, which with copy-on-write
+        #(pandas 3) is a read-only view of the frame
+        values = np.where(np.isin(values, SENTINELS), np.nan, values)
+        out[name] = values.astype(np.float32)
+    return out
+
+def parse(fname, start = None, end = None):
+    """Parse a text log without the cache.
+
+    Parameters
+    ----------
+    fname: str
+        Name of the text file
+    start, end: str or datetime-like, optional
+        Times of the first and last records of a pico log, see pico_datetimes()
+
+    Returns
+    -------
+    :obj:'pandas.DataFrame'
+        Float32 columns indexed by datetime, in file order, with a 'layout' attribute
+        (df.attrs['layout']).  Rows with more fields than the header or an unreadable
+        date are dropped.  The 'seconds' column of pico logs stays float64.
+    """
+    with open(fname, 'r', encoding = 'utf-8-sig', newline = '') as f:
+        text = f.read()
+    header = text.split('\n', 1)[0]
+    layout = detect(header)
+    names = [RENAME.get(name.strip(), name.strip()) for name in header.strip().split(',')]
+    if layout == 'pico_v1':
+        #the header names two time columns, but the rows hold one
+        names = ['seconds'] + names[2:]
+    table = pd.read_csv(io.StringIO(text), header = None, skiprows = 1, names = names, dtype = str,
+                        index_col = False, on_bad_lines = 'skip', skipinitialspace = True)
+
+    if layout in ('pico', 'pico_v1'):
+        seconds = pd.to_numeric(table['seconds'], errors = 'coerce')
+        table = table[seconds.notna().to_numpy()]
+        index = pico_datetimes(seconds.dropna().to_numpy(), start, end)
+        values = [name for name in names if name != 'seconds']
+        columns = to_float32(table, values)
+        columns['seconds'] = seconds.dropna().to_numpy(dtype = np.float64)
+        values.append('seconds')
+    else:
+        index = parse_datetimes(table.iloc[:, 0], table.iloc[:, 1])
+        if layout == 'sonde':
+            index = index + pd.to_timedelta(pd.to_numeric(table.iloc[:, 2], errors = 'coerce').fillna(0), unit = 's')
+        keep = index.notna().to_numpy()
+        table = table[keep]
+        index = index[keep].to_numpy()
+        values = [name for name in names[2:] if name not in ('Time (Fract. Sec)', 'Site Name')]
+        columns = to_float32(table, values)
+
+    df = pd.DataFrame(columns, columns = values, index = pd.DatetimeIndex(index, name = 'datetime'))
+    df.attrs['layout'] = layout
+    return df
+
+def cache_name(fname, start = None, end = None, cache_dir = None):
+    """Path of the cache file for fname, from the hash of its contents and the options."""
+    digest = hashlib.sha1()
+    with open(fname, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(('%s|%s|%s' % (CACHE_VERSION, start, end)).encode())
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(fname)), CACHE_DIR)
+    return os.path.join(cache_dir, '%s.npz' % digest.hexdigest())
+
+def save(df, path):
+    """Write a DataFrame returned by parse() to an uncompressed .npz file."""
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    arrays = {'index': df.index.to_numpy().astype('datetime64[ns]').view(np.int64),
+              'names': np.array(df.columns, dtype = str),
+              'layout': np.array(df.attrs.get('layout', ''))}
+    for i, name in enumerate(df.columns):
+        arrays['c%d' % i] = df[name].to_numpy()
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+def load(path):
+    """Read a DataFrame written by save()."""
+    with np.load(path, allow_pickle = False) as data:
+        names = [str(name) for name in data['names']]
+        columns = {name: data['c%d' % i] for i, name in enumerate(names)}
+        index = pd.DatetimeIndex(data['index'].view('datetime64[ns]'), name = 'datetime')
+        layout = str(data['layout'])
+    df = pd.DataFrame(columns, columns = names, index = index)
+    df.attrs['layout'] = layout
+    return df
+
+def read(fname, start = None, end = None, cache = True, cache_dir = None):
+    """Read a text log, from the cache if it has been parsed before.
+
+    Parameters
+    ----------
+    fname: str
+        Name of the text file
+    start, end: str or datetime-like, optional
+        Times of the first and last records of a pico log, see pico_datetimes()
+    cache: boolean, optional
+        If false, always parse the file and do not write a cache file. Default true
+    cache_dir: str, optional
+        Folder for the cache files, default .ingest_cache next to fname
+
+    Returns
+    -------
+    :obj:'pandas.DataFrame'
+        As returned by parse()
+    """
+    if not cache:
+        return parse(fname, start, end)
+    path = cache_name(fname, start, end, cache_dir)
+    if os.path.exists(path):
+        try:
+            return load(path)
+        except (OSError, ValueError, KeyError):
+            pass
+    df = parse(fname, start, end)
+    try:
+        save(df, path)
+    except OSError:
+        pass
+    return df
@@ -0,0 +1,100 @@
+"""Summarize the phase timings written by profiler.phase_timer.
+
+Each line of the diagnostics file (profileCTD.txt) holds the count, minimum, mean and
+maximum time of one phase over a block of logging cycles.  This script combines the
+blocks, prints the time per cycle spent in each phase, and estimates the duty cycle,
+mean current and battery life from the 'awake' phase and the logging interval::
+
+    python host/profile_summary.py profileCTD.txt --interval 600 --capacity 3000
+
+The currents default to a pyboard (about 40 mA awake at 168 MHz and 0.5 mA in stop
+mode); measure the board in use for a better estimate.  Phases recorded inside
+cond_sensor.measure() ('acquire', 'compute', 'thermistor') are part of 'conductivity',
+so the phase times do not add up to 'awake'.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+def read(fname):
+    """Read a diagnostics file into a DataFrame with one row per phase and block."""
+    return pd.read_csv(fname)
+
+def summarize(df):
+    """Combine the blocks of a diagnostics file.
+
+    Parameters
+    ----------
+    df: :obj:'pandas.DataFrame'
+        Returned by read()
+
+    Returns
+    -------
+    :obj:'pandas.DataFrame'
+        Indexed by phase, in the order first recorded, with n, min_us, mean_us,
+        max_us and per_cycle_us (mean time per logging cycle)
+    """
+    cycles = df.groupby('time')['cycles'].first().sum()
+    df = df.assign(total_us = df['n']*df['mean_us'])
+    grouped = df.groupby('phase', sort = False)
+    summary = pd.DataFrame({'n': grouped['n'].sum(),
+                            'min_us': grouped['min_us'].min(),
+                            'max_us': grouped['max_us'].max()})
+    total = grouped['total_us'].sum()
+    summary.insert(2, 'mean_us', total/summary['n'])
+    summary['per_cycle_us'] = total/cycles
+    return summary
+
+def estimate(awake_us, interval, awake_current = 40, sleep_current = 0.5, capacity = 3000):
+    """Duty cycle, mean current and battery life.
+
+    Parameters
+    ----------
+    awake_us: float
+        Time awake per logging cycle (us)
+    interval: float
+        Logging interval (s)
+    awake_current: float, optional
+        Current while awake (mA), default 40
+    sleep_current: float, optional
+        Current while asleep (mA), default 0.5
+    capacity: float, optional
+        Battery capacity (mAh), default 3000
+
+    Returns
+    -------
+    duty: float
+        Fraction of the time awake
+    current: float
+        Mean current (mA)
+    days: float
+        Battery life (days)
+    """
+    duty = np.minimum(awake_us/1e6/interval, 1)
+    current = duty*awake_current + (1 - duty)*sleep_current
+    return duty, current, capacity/current/24
+
+def report(summary, interval, awake_current = 40, sleep_current = 0.5, capacity = 3000):
+    """Print the phase table and the estimates."""
+    if 'awake' not in summary.index:
+        raise ValueError("no 'awake' phase in the diagnostics file")
+    awake_us = summary.loc['awake', 'per_cycle_us']
+    print('%-14s %8s %10s %10s %10s %12s %8s %12s' % ('phase', 'n', 'min (ms)', 'mean (ms)', 'max (ms)',
+                                                     'ms/cycle', 'awake %', 'mA s/cycle'))
+    for phase, row in summary.iterrows():
+        print('%-14s %8d %10.2f %10.2f %10.2f %12.2f %8.1f %12.3f' % (phase, row['n'], row['min_us']/1e3, row['mean_us']/1e3,
+              row['max_us']/1e3, row['per_cycle_us']/1e3, 100*row['per_cycle_us']/awake_us, row['per_cycle_us']/1e6*awake_current))
+    [duty, current, days] = estimate(awake_us, interval, awake_current, sleep_current, capacity)
+    print('awake %.2f s of every %s s (duty cycle %.2f%%)' % (awake_us/1e6, interval, 100*duty))
+    print('mean current %.3f mA, battery life %.0f days with %s mAh' % (current, days, capacity))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Summarize logger phase timings and estimate battery life.')
+    parser.add_argument('fname')
+    parser.add_argument('--interval', type = float, required = True, help = 'logging interval (s)')
+    parser.add_argument('--awake-current', type = float, default = 40, help = 'current while awake (mA)')
+    parser.add_argument('--sleep-current', type = float, default = 0.5, help = 'current while asleep (mA)')
+    parser.add_argument('--capacity', type = float, default = 3000, help = 'battery capacity (mAh)')
+    args = parser.parse_args()
+    report(summarize(read(args.fname)), args.interval, args.awake_current, args.sleep_current, args.capacity)
@@ -0,0 +1,131 @@
+"""Recompute resistance, conductivity and derived quantities from logged raw counts.
+
+The loggers save the six trimmed-mean counts returned by cond_sensor.measure()
+(icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2), so past
+deployments can be reprocessed with a new current measuring resistor value, cell
+constant or intercept without redeploying the firmware.  Every function here works on
+whole NumPy arrays or pandas Series at once and uses the same equations as cond_sensor.
+
+Note that cond_sensor computes a resistance for each sample and then takes the trimmed
+mean, while resistances() works from the trimmed-mean counts, so the results agree
+closely with the logged r1 and r2 but not to the last digit.
+
+Example
+-------
+>>> import pandas as pd
+>>> import reprocess
+>>> df = pd.read_csv('datalogCTD.txt', parse_dates={'datetime': [0, 1]}).set_index('datetime')
+>>> df = reprocess.reprocess(df, con_resistance = 250, cell_const = 1.1, b = 0)
+"""
+import numpy as np
+
+#counts at full scale and ADC reference voltage, as in cond_sensor on the pyboard
+FULL_SCALE = 4095
+#full scale of the 16-bit counts logged by the pico
+PICO_FULL_SCALE = 65535
+VREF = 3.3
+#coefficients B0 to B6 of the temperature polynomial in the salinity equation, as in derived.B
+SALINITY_B = (0.13855E1, -0.46485668E-1, 0.14887785E-2, -0.63083433E-4, 0.25144517E-5, -0.59600245E-7, 0.57778085E-9)
+COUNT_COLUMNS = ('icount1', 'probe3count1', 'probe4count1', 'icount2', 'probe3count2', 'probe4count2')
+
+def resistances(icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2, con_resistance = 250,
+                full_scale = FULL_SCALE, vref = VREF):
+    """Apparent resistance at normal and reverse polarity, as in compute_resistances().
+
+    Rows logged as -999 (failed readings) and rows with zero current give NaN.
+
+    Parameters
+    ----------
+    icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2: array_like
+        Raw counts (current, pole 3 and pole 4, normal then reverse polarity)
+    con_resistance: float, optional
+        Resistance (ohm) of the current measuring resistor, default 250
+    full_scale: int, optional
+        ADC count at vref, default 4095
+    vref: float, optional
+        ADC reference voltage, default 3.3
+
+    Returns
+    -------
+    R1, R2: :obj:'numpy.ndarray'
+        Resistance (ohm)
+    """
+    icount1 = np.asarray(icount1, dtype = float)
+    icount2 = np.asarray(icount2, dtype = float)
+    i1 = icount1 / full_scale * vref / con_resistance
+    i2 = (vref - icount2 / full_scale * vref) / con_resistance
+    V1 = (np.asarray(probe3count1, dtype = float) - np.asarray(probe4count1, dtype = float))/full_scale * vref
+    V2 = (np.asarray(probe4count2, dtype = float) - np.asarray(probe3count2, dtype = float))/full_scale * vref
+    bad = (i1 == 0) | (i2 == 0) | (icount1 == -999) | (icount2 == -999)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        R1 = np.where(bad, np.nan, V1/i1)
+        R2 = np.where(bad, np.nan, V2/i2)
+    return R1, R2
+
+def conductivity(R, cell_const, b):
+    """Conductivity from resistance, k = 1/(cell_const*R) + b, as in cond_sensor.conductivity()."""
+    return 1/(cell_const*np.asarray(R, dtype = float)) + b
+
+def salinity(T, k):
+    """Salinity (parts per thousand) from temperature (degrees C) and conductance (mS/cm).
+
+    From Miller, Bradford, and Peters, USGS Water Supply Paper 2311, as in derived.salinity(),
+    with the temperature polynomial in Horner form.
+    """
+    T = np.asarray(T, dtype = float)
+    k = np.asarray(k, dtype = float)
+    K = SALINITY_B[6]
+    for b in SALINITY_B[5::-1]:
+        K = b + T*K
+    return 1.80655*0.36996*K/(k**(-1.07) - 0.7464E-3)
+
+def k25(k, T):
+    """Conductivity at 25C for KCl or fresh water, as in cond_sensor.k25()."""
+    return np.asarray(k, dtype = float)*(1/(1+0.0191*(np.asarray(T, dtype = float)-25)))
+
+def TDS(k25):
+    """Total dissolved solids from conductivity at 25C, as in cond_sensor.TDS()."""
+    return 0.65*np.asarray(k25, dtype = float)
+
+def reprocess(df, con_resistance = 250, cell_const = 1, b = 0, temperature = 'therm_T', full_scale = FULL_SCALE):
+    """Add recomputed columns to a DataFrame read from a text log with raw counts.
+
+    Adds R1, R2, R (their mean), k, S, k25 and TDS, replacing the k column written by
+    loggers with a calibration model (cal_model.py).  Salinity, k25 and TDS use the
+    temperature column given; rows where it is -999 give NaN.
+
+    Parameters
+    ----------
+    df: :obj:'pandas.DataFrame'
+        Log with the columns in COUNT_COLUMNS
+    con_resistance: float, optional
+        Resistance (ohm) of the current measuring resistor, default 250
+    cell_const: float, optional
+        Cell constant (1/cm), default 1
+    b: float, optional
+        Intercept of the calibration equation, default 0
+    temperature: str, optional
+        Name of the temperature column, default 'therm_T' ('temp(C)' for the pico logger)
+    full_scale: int, optional
+        ADC count at the reference voltage, default 4095 (pyboard).  Use PICO_FULL_SCALE
+        for pico logs, which hold 16-bit read_u16() counts.
+
+    Returns
+    -------
+    :obj:'pandas.DataFrame'
+        Copy of df with the new columns
+    """
+    df = df.copy()
+    [R1, R2] = resistances(*(df[name].to_numpy() for name in COUNT_COLUMNS), con_resistance = con_resistance,
+                           full_scale = full_scale)
+    df['R1'] = R1
+    df['R2'] = R2
+    df['R'] = (R1 + R2)/2
+    df['k'] = conductivity(df['R'].to_numpy(), cell_const, b)
+    T = df[temperature].to_numpy(dtype = float)
+    T = np.where(T == -999, np.nan, T)
+    with np.errstate(invalid = 'ignore'):
+        df['S'] = salinity(T, df['k'].to_numpy())
+    df['k25'] = k25(df['k'].to_numpy(), T)
+    df['TDS'] = TDS(df['k25'].to_numpy())
+    return df
@@ -0,0 +1,95 @@
+"""Host stand-ins for the pyb, machine, micropython, time and uasyncio modules.
+
+The firmware in the pyboard and rpi_pico folders runs unmodified under CPython
+once the simulator is installed::
+
+    import sim
+    model = sim.install(sim.Model(cell_resistance = 800, temperature = 15))
+    conductivity4pole = sim.load('conductivity4pole')
+
+Pins, ADCs and the I2C bus read from and write to the model (see sim.model), and all
+sleeps advance its virtual clock instead of waiting, so model.clock.awake_us gives the
+time the board would be awake.  The MicroPython ``time`` module is only substituted
+while firmware modules are imported by load(), so host code keeps the real one.
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+from . import hardware, utime, micropython, pyb, machine, uasyncio
+from .model import Model, Clock, MS5803
+
+FIRMWARE = {'pyboard': os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'pyboard'),
+            'pico': os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'rpi_pico')}
+
+#names of the firmware modules imported by load()
+loaded = set()
+
+def _mem_alloc():
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return 0
+
+def install(model = None):
+    """Make the stand-in modules importable and set the model they use.
+
+    Parameters
+    ----------
+    model: :obj:'sim.Model', optional
+        Electrical model and clock. A default Model() is created if not given.
+
+    Returns
+    -------
+    :obj:'sim.Model'
+        The installed model
+    """
+    if model is None:
+        model = Model()
+    hardware.current = model
+    sys.modules['pyb'] = pyb
+    sys.modules['machine'] = machine
+    sys.modules['micropython'] = micropython
+    sys.modules['uasyncio'] = uasyncio
+    sys.modules['utime'] = utime
+    #gc.mem_alloc() is used by cond_sensor's stats_hook; traced with tracemalloc on the host
+    if not hasattr(gc, 'mem_alloc'):
+        gc.mem_alloc = _mem_alloc
+    return model
+
+def load(name, board = 'pyboard'):
+    """Import a firmware module (and the firmware modules it imports) with the simulated time module.
+
+    Parameters
+    ----------
+    name: str
+        Module name, e.g. 'conductivity4pole'
+    board: str, optional
+        'pyboard' or 'pico', selecting the folder the module is imported from. Default is 'pyboard'.
+        Modules with the same name in both folders are only imported once; call unload()
+        before switching boards.
+
+    Returns
+    -------
+    module
+    """
+    if hardware.current is None:
+        install()
+    path = os.path.abspath(FIRMWARE[board])
+    host_time = sys.modules['time']
+    before = set(sys.modules)
+    sys.path.insert(0, path)
+    sys.modules['time'] = utime
+    try:
+        module = __import__(name)
+    finally:
+        sys.modules['time'] = host_time
+        sys.path.remove(path)
+    loaded.update(set(sys.modules) - before)
+    return module
+
+def unload():
+    """Forget all firmware modules imported by load()."""
+    for name in loaded:
+        sys.modules.pop(name, None)
+    loaded.clear()
@@ -0,0 +1,298 @@
+"""Simulated peripherals shared by the pyb and machine stand-ins.
+
+Every object looks up the active model (set by sim.install()) when it is used, so
+objects created before the model is replaced follow the new model.
+"""
+import errno
+
+from . import model as _model
+
+#the model that simulated hardware reads from and writes to; set by sim.install()
+current = None
+
+def active():
+    if current is None:
+        raise RuntimeError('no model installed; call sim.install() first')
+    return current
+
+def pin_id(pin):
+    """Pin id of a Pin object or a plain pin name/number."""
+    if isinstance(pin, Pin):
+        return pin.id
+    return pin
+
+class Pin:
+    """Digital pin, accepting both the pyb (OUT_PP) and machine (OUT) mode names."""
+    IN = 0
+    OUT = 1
+    OUT_PP = 1
+    OUT_OD = 2
+    ALT = 3
+    AF_PP = 3
+    ANALOG = 4
+    PULL_NONE = None
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    class board:
+        """Named board pins, as in pyb.Pin.board."""
+        pass
+
+    def __init__(self, id, mode = IN, pull = None, value = None, **kwargs):
+        self.id = pin_id(id)
+        self.mode = mode
+        if value is not None:
+            self.value(value)
+
+    def init(self, mode = IN, pull = None, value = None, **kwargs):
+        self.mode = mode
+        if value is not None:
+            self.value(value)
+
+    def value(self, x = None):
+        if x is None:
+            return active().pin(self.id)
+        active().set_pin(self.id, x)
+
+    def __call__(self, x = None):
+        return self.value(x)
+
+    def high(self):
+        self.value(1)
+
+    def low(self):
+        self.value(0)
+
+    on = high
+    off = low
+
+    def toggle(self):
+        self.value(1 - self.value())
+
+    def irq(self, handler = None, trigger = IRQ_FALLING | IRQ_RISING, **kwargs):
+        self.handler = handler
+
+    def name(self):
+        return str(self.id)
+
+    def __repr__(self):
+        return 'Pin(%r)' % (self.id,)
+
+class _usb_vbus(Pin):
+    """VBUS sense pin, high when model.usb is True."""
+    def value(self, x = None):
+        if x is None:
+            return 1 if active().usb else 0
+
+Pin.board.USB_VBUS = _usb_vbus('USB_VBUS')
+
+class ADC:
+    """Analog input returning 12-bit counts from read() (pyb) and 16-bit counts from read_u16() (machine)."""
+
+    def __init__(self, pin):
+        self.id = pin_id(pin)
+
+    def read(self):
+        m = active()
+        m.cost('adc_read')
+        return m.count(self.id)
+
+    def read_u16(self):
+        m = active()
+        m.cost('adc_read')
+        return m.count(self.id, 16)
+
+    def read_timed(self, buf, timer):
+        return ADC.read_timed_multi((self,), (buf,), timer)
+
+    @staticmethod
+    def read_timed_multi(adcs, bufs, timer):
+        """Fill the buffers with one reading per channel at each timer update event.
+
+        If PWM channels are set up on the timer, the pins are driven alternately high
+        and low on successive events, starting with the non-inverted channel high.
+        """
+        m = active()
+        period = 1000000/timer.freq()
+        for i in range(len(bufs[0])):
+            for pin, inverted in timer.outputs:
+                m.pins[pin] = (i + inverted) % 2 == 0 and 1 or 0
+            m.clock.advance(period)
+            for adc, buf in zip(adcs, bufs):
+                m.counts['adc_read'] += 1
+                buf[i] = m.count(adc.id)
+        return True
+
+class ADCAll:
+    """Internal channels of the pyboard ADC."""
+
+    def __init__(self, resolution, mask = 0xffffffff):
+        self.resolution = resolution
+
+    def read_vref(self):
+        return active().vdd
+
+    def read_core_vref(self):
+        return 1.21
+
+    def read_core_vbat(self):
+        return 3.0
+
+    def read_core_temp(self):
+        return active().temperature
+
+class TimerChannel:
+    def __init__(self, timer, channel, mode, pin, pulse_width_percent):
+        self.timer = timer
+        self.channel = channel
+        self.mode = mode
+        self.pin = pin
+        self.percent = pulse_width_percent
+
+    def pulse_width_percent(self, value = None):
+        if value is None:
+            return self.percent
+        self.percent = value
+
+class Timer:
+    """Hardware timer; only the frequency and the pins driven by PWM channels are modeled."""
+    UP = 0
+    DOWN = 1
+    CENTER = 2
+    PWM = 0
+    PWM_INVERTED = 1
+    OC_TIMING = 2
+    OC_ACTIVE = 3
+    OC_INACTIVE = 4
+    OC_TOGGLE = 5
+    IC = 6
+    ENC_A = 7
+    ENC_B = 8
+    ENC_AB = 9
+
+    def __init__(self, id, freq = 1, mode = UP, callback = None, **kwargs):
+        self.id = id
+        self.init(freq, mode, callback)
+
+    def init(self, freq = 1, mode = UP, callback = None, **kwargs):
+        self._freq = freq
+        self.mode = mode
+        self._callback = callback
+        self.channels = {}
+        self.outputs = []
+
+    def freq(self, value = None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def channel(self, channel, mode = None, pin = None, pulse_width_percent = 50, **kwargs):
+        if mode is None:
+            return self.channels.get(channel)
+        ch = TimerChannel(self, channel, mode, pin, pulse_width_percent)
+        self.channels[channel] = ch
+        if pin is not None and mode in (Timer.PWM, Timer.PWM_INVERTED):
+            self.outputs.append((pin_id(pin), 1 if mode == Timer.PWM_INVERTED else 0))
+        return ch
+
+    def callback(self, fun):
+        self._callback = fun
+
+    def deinit(self):
+        self.channels = {}
+        self.outputs = []
+
+class I2C:
+    """I2C bus routing transactions to the devices in model.i2c_devices."""
+
+    def __init__(self, *args, **kwargs):
+        self.freq = kwargs.get('freq', 100000)
+
+    def device(self, addr):
+        dev = active().i2c_devices.get(addr)
+        if dev is None:
+            raise OSError(errno.ENODEV)
+        return dev
+
+    def scan(self):
+        return sorted(active().i2c_devices)
+
+    def writeto(self, addr, buf, stop = True):
+        dev = self.device(addr)
+        active().cost('i2c_byte', len(buf) + 1)
+        dev.write(buf)
+        return len(buf)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize = 8):
+        dev = self.device(addr)
+        active().cost('i2c_byte', nbytes + 3)
+        return dev.read_register(memaddr, nbytes)
+
+class RTC:
+    """Real-time clock counting from the model's clock."""
+
+    def __init__(self, *args):
+        self.wakeup_ms = None
+
+    def datetime(self, datetimetuple = None):
+        m = active()
+        if datetimetuple is not None:
+            return
+        t = _model.time_tuple(m.clock.seconds(), m.clock.epoch)
+        subseconds = int(m.clock.now_us % 1000000)//1000
+        #(year, month, day, weekday, hours, minutes, seconds, subseconds)
+        return (t[0], t[1], t[2], t[6] + 1, t[3], t[4], t[5], subseconds)
+
+    def wakeup(self, timeout, callback = None):
+        self.wakeup_ms = timeout
+        active().wakeup_ms = timeout
+
+class LED:
+    def __init__(self, id):
+        self.id = id
+        self.state = 0
+
+    def on(self):
+        self.state = 1
+
+    def off(self):
+        self.state = 0
+
+    def toggle(self):
+        self.state = 1 - self.state
+
+    def intensity(self, value = None):
+        if value is None:
+            return 255*self.state
+        self.state = 1 if value else 0
+
+class Switch:
+    """USR switch; pressed while model.switch is True."""
+
+    def __init__(self):
+        self.handler = None
+
+    def value(self):
+        return bool(active().switch)
+
+    def __call__(self):
+        return self.value()
+
+    def callback(self, fun):
+        self.handler = fun
+
+class USB_VCP:
+    def __init__(self, *args):
+        pass
+
+    def isconnected(self):
+        return bool(active().usb)
+
+class WDT:
+    def __init__(self, id = 0, timeout = 5000):
+        self.timeout = timeout
+
+    def feed(self):
+        pass
@@ -0,0 +1,24 @@
+"""Stand-in for the machine module."""
+from .hardware import Pin, ADC, I2C, RTC, WDT, Timer, active
+
+_freq = [125000000]
+
+def freq(hz = None):
+    if hz is None:
+        return _freq[0]
+    _freq[0] = hz
+
+def idle():
+    pass
+
+def lightsleep(ms = None):
+    active().clock.sleep(1000*(ms or 1000))
+
+def deepsleep(ms = None):
+    lightsleep(ms)
+
+def reset():
+    raise SystemExit('machine.reset()')
+
+def unique_id():
+    return b'\x00\x00\x00\x00\x00\x00\x00\x00'
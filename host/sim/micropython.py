@@ -0,0 +1,21 @@
+"""Stand-in for the micropython module.  Code emitter decorators leave functions unchanged."""
+
+def native(f):
+    return f
+
+viper = native
+
+def const(x):
+    return x
+
+def opt_level(level = None):
+    return 0
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+def mem_info(verbose = None):
+    pass
+
+def schedule(func, arg):
+    func(arg)
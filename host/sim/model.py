@@ -0,0 +1,344 @@
+"""Electrical model behind the simulated pins, ADCs and I2C bus.
+
+The model holds a virtual clock, the state of every output pin, and the circuits the
+firmware measures: the four-pole conductivity cell with its current measuring resistor,
+the thermistor divider, and an MS5803 pressure sensor.  ADC readings are computed from
+the pin states when they are read, so a driver only sees a sensible voltage if it powers
+the circuit the way the real board would.
+"""
+import datetime
+import math
+import random
+
+#ticks_us() and ticks_ms() wrap at this value, as on the boards
+TICKS_PERIOD = 2**30
+
+class Clock:
+    """Virtual time in microseconds.
+
+    Sleeps and modeled hardware costs advance the clock instantly, so simulated runs take
+    only as long as the Python code itself.  Time spent in pyb.stop(), machine.lightsleep()
+    or machine.deepsleep() is counted as asleep; everything else is awake time.
+
+    Parameters
+    ----------
+    epoch: int, optional
+        Year of the board's epoch, 2000 on the pyboard and 1970 on the pico, default 2000
+    start: :obj:'datetime.datetime', optional
+        Date and time at the start of the simulation, default 2021-01-01
+    """
+
+    def __init__(self, epoch = 2000, start = datetime.datetime(2021, 1, 1)):
+        self.now_us = 0.0
+        self.asleep_us = 0.0
+        self.epoch = epoch
+        self.epoch_offset = int((start - datetime.datetime(epoch, 1, 1)).total_seconds())
+
+    def advance(self, us):
+        if us > 0:
+            self.now_us += us
+
+    def sleep(self, us):
+        """Advance the clock with the board in a low power state."""
+        if us > 0:
+            self.now_us += us
+            self.asleep_us += us
+
+    @property
+    def awake_us(self):
+        return self.now_us - self.asleep_us
+
+    def seconds(self):
+        """Seconds since the board's epoch."""
+        return self.epoch_offset + int(self.now_us//1000000)
+
+def time_tuple(seconds, epoch):
+    """(year, month, mday, hour, minute, second, weekday, yearday) for seconds since the start of year epoch."""
+    d = datetime.datetime(epoch, 1, 1) + datetime.timedelta(seconds = seconds)
+    return (d.year, d.month, d.day, d.hour, d.minute, d.second, d.weekday(), d.timetuple().tm_yday)
+
+def steinhart_hart_resistance(T, A, B, C):
+    """Thermistor resistance (ohm) at temperature T (degrees C), inverting the Steinhart-Hart equation."""
+    y = (A - 1/(T + 273.15))/C
+    x = math.sqrt((B/(3*C))**3 + y**2/4)
+    return math.exp((x - y/2)**(1/3) - (x + y/2)**(1/3))
+
+def crc4(prom):
+    """4-bit CRC of the eight MS5803 PROM words (application note AN520)."""
+    n_rem = 0
+    for cnt in range(16):
+        word = prom[cnt >> 1]
+        if cnt == 15:
+            word = word & 0xFF00
+        if cnt % 2 == 1:
+            n_rem ^= word & 0x00FF
+        else:
+            n_rem ^= word >> 8
+        for n_bit in range(8):
+            if n_rem & 0x8000:
+                n_rem = ((n_rem << 1) ^ 0x3000) & 0xFFFF
+            else:
+                n_rem = (n_rem << 1) & 0xFFFF
+    return (n_rem >> 12) & 0x000F
+
+class MS5803:
+    """Register model of an MS5803 pressure sensor.
+
+    Responds to reset, PROM read, conversion and ADC read commands.  The raw values D1
+    and D2 are chosen so that the datasheet compensation gives back the pressure and
+    temperature set on the model.  Reading the ADC before a conversion has finished
+    returns 0, as the real sensor does.
+
+    Parameters
+    ----------
+    clock: :obj:'Clock'
+        Virtual clock used for conversion times
+    pressure: float, optional
+        Pressure (mbar), default 1013.25
+    temperature: float, optional
+        Temperature (degrees C), default 20
+    coefficients: list of int, optional
+        Calibration coefficients C1 to C6
+    """
+    #maximum conversion times (microseconds) from the datasheet
+    CONVERSION_US = {0x00: 540, 0x02: 1060, 0x04: 2080, 0x06: 4130, 0x08: 8220}
+
+    def __init__(self, clock, pressure = 1013.25, temperature = 20.0, coefficients = (46546, 42845, 29751, 29457, 32745, 29059)):
+        self.clock = clock
+        self.pressure = pressure
+        self.temperature = temperature
+        prom = [0] + list(coefficients) + [0]
+        prom[7] = crc4(prom)
+        self.prom = prom
+        self.result = 0
+        self.ready_at = None
+        self.conversions = 0
+
+    def compensate(self, D1, D2):
+        """Datasheet compensation, as in pressure.MS5803_sensor.compensate()."""
+        C = self.prom
+        dT = D2 - C[5] * 256
+        TEMP = 2000 + dT * C[6] / 8388608
+        OFF = C[2] * 262144 + (C[4] * dT) / 32
+        SENS = C[1] * 131072 + (C[3] * dT) / 128
+        T2 = 0
+        OFF2 = 0
+        SENS2 = 0
+        if TEMP < 2000:
+            T2 = 3 * (dT * dT) / 8589934592
+            OFF2 = 3 * ((TEMP - 2000) * (TEMP - 2000)) / 8
+            SENS2 = 7 * ((TEMP - 2000) * (TEMP - 2000)) / 8
+            if TEMP < -1500:
+                SENS2 = SENS2 + 3 * ((TEMP + 1500) * (TEMP + 1500))
+        TEMP = TEMP - T2
+        OFF = OFF - OFF2
+        SENS = SENS - SENS2
+        return ((((D1 * SENS) / 2097152) - OFF) / 32768.0) / 100.0, TEMP / 100.0
+
+    def raw(self):
+        """Raw values (D1, D2) for the model's pressure and temperature, found by bisection."""
+        lo, hi = 0, 2**24 - 1
+        while lo < hi:
+            mid = (lo + hi)//2
+            if self.compensate(0, mid)[1] < self.temperature:
+                lo = mid + 1
+            else:
+                hi = mid
+        D2 = lo
+        lo, hi = 0, 2**24 - 1
+        while lo < hi:
+            mid = (lo + hi)//2
+            if self.compensate(mid, D2)[0] < self.pressure:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo, D2
+
+    def write(self, data):
+        command = data[0]
+        if command == 0x1E:
+            self.result = 0
+            self.ready_at = None
+        elif command & 0xF0 in (0x40, 0x50):
+            osr = command & 0x0F
+            if osr not in self.CONVERSION_US:
+                raise OSError(5)
+            [D1, D2] = self.raw()
+            self.result = D1 if command & 0xF0 == 0x40 else D2
+            self.ready_at = self.clock.now_us + self.CONVERSION_US[osr]
+            self.conversions += 1
+
+    def read_register(self, register, nbytes):
+        if register == 0x00:
+            if self.ready_at is None or self.clock.now_us < self.ready_at:
+                value = 0
+            else:
+                value = self.result
+            self.ready_at = None
+            return bytes([(value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF])[:nbytes]
+        if 0xA0 <= register <= 0xAE:
+            word = self.prom[(register - 0xA0)//2]
+            return bytes([word >> 8, word & 0xFF])[:nbytes]
+        raise OSError(5)
+
+class Model:
+    """The circuits and timing seen by the firmware.
+
+    The default wiring follows logger_ctd.py on a pyboard: the electrodes are powered
+    from X3 (directly) and X4 (through the current measuring resistor), the inner poles
+    are read on X5 and X6, the current on X7 and the thermistor on X8.  For the pico
+    logger, use Model.pico().
+
+    Parameters
+    ----------
+    cell_resistance: float, optional
+        Resistance (ohm) of the solution between the two inner poles, default 1000
+    cell_const: float, optional
+        Cell constant (1/cm), used to report the modeled conductivity, default 1
+    outer_resistance: float, optional
+        Resistance (ohm) between each outer electrode and the nearest inner pole, default 500
+    con_resistance: float, optional
+        Resistance (ohm) of the current measuring resistor, default 250
+    temperature: float, optional
+        Water temperature (degrees C) seen by the thermistor, default 20
+    therm_resistance: float, optional
+        Fixed resistor (ohm) in the thermistor divider, default 20000
+    pressure: float, optional
+        Pressure (mbar) seen by the MS5803, default 1013.25
+    noise: float, optional
+        Standard deviation (counts) of the Gaussian noise added to every ADC reading, default 1
+    seed: int, optional
+        Seed for the noise generator, default 0
+    wiring: dict, optional
+        Pin ids of 'gpio1', 'gpio2', 'pole3', 'pole4', 'current', 'therm', 'therm_power'
+        and 'therm_ground'; 'therm_power' and 'therm_ground' may be None (3.3V and GND)
+    costs: dict, optional
+        Modeled time (microseconds) of 'adc_read', 'pin' and 'i2c_byte' operations
+
+    Attributes
+    ----------
+    clock : :obj:'Clock'
+        Virtual clock
+    ms5803 : :obj:'MS5803'
+        Register model of the pressure sensor at I2C address 0x76
+    counts : dict
+        Number of ADC reads, pin writes and I2C bytes since the last reset_counts()
+    """
+    VREF = 3.3
+    FULL_SCALE = 4095
+    #Steinhart-Hart coefficients of the PS103J2
+    A = 0.001125308852122
+    B = 0.000234711863267
+    C = 0.000000085663516
+
+    PYBOARD_WIRING = {'gpio1': 'X3', 'gpio2': 'X4', 'pole3': 'X5', 'pole4': 'X6', 'current': 'X7',
+                      'therm': 'X8', 'therm_power': 'X3', 'therm_ground': 'X4'}
+    PICO_WIRING = {'gpio1': 19, 'gpio2': 20, 'pole3': 26, 'pole4': 27, 'current': 28,
+                   'therm': None, 'therm_power': None, 'therm_ground': None}
+    #assumed costs of the MicroPython calls, in microseconds
+    COSTS = {'adc_read': 12, 'pin': 1, 'i2c_byte': 90}
+
+    def __init__(self, cell_resistance = 1000.0, cell_const = 1.0, outer_resistance = 500.0, con_resistance = 250.0,
+                 temperature = 20.0, therm_resistance = 20000.0, pressure = 1013.25, noise = 1.0, seed = 0,
+                 wiring = None, costs = None):
+        self.clock = Clock()
+        self.cell_resistance = cell_resistance
+        self.cell_const = cell_const
+        self.outer_resistance = outer_resistance
+        self.con_resistance = con_resistance
+        self.therm_resistance = therm_resistance
+        self.noise = noise
+        self.random = random.Random(seed)
+        self.wiring = dict(self.PYBOARD_WIRING if wiring is None else wiring)
+        self.costs = dict(self.COSTS)
+        if costs is not None:
+            self.costs.update(costs)
+        self.ms5803 = MS5803(self.clock, pressure, temperature)
+        self.temperature = temperature
+        self.i2c_devices = {0x76: self.ms5803}
+        self.pins = {}
+        self.switch = False
+        self.usb = False
+        self.wakeup_ms = None
+        self.vdd = 3.3
+        self.reset_counts()
+
+    @classmethod
+    def pico(cls, **kwargs):
+        """Model wired as in logger_ctd_nothermistor_pico.py."""
+        kwargs.setdefault('wiring', cls.PICO_WIRING)
+        model = cls(**kwargs)
+        #the pico's clock counts from 1970
+        model.clock = Clock(epoch = 1970)
+        model.ms5803.clock = model.clock
+        return model
+
+    @property
+    def conductivity(self):
+        """Conductivity (uS/cm) corresponding to the cell resistance, i.e. 1/(cell_const*R)."""
+        return 1/(self.cell_const*self.cell_resistance)
+
+    @property
+    def temperature(self):
+        return self._temperature
+
+    @temperature.setter
+    def temperature(self, value):
+        #the thermistor and the MS5803 are in the same water
+        self._temperature = value
+        self.ms5803.temperature = value
+
+    @property
+    def pressure(self):
+        return self.ms5803.pressure
+
+    @pressure.setter
+    def pressure(self, value):
+        self.ms5803.pressure = value
+
+    def reset_counts(self):
+        self.counts = {'adc_read': 0, 'pin': 0, 'i2c_byte': 0}
+
+    def cost(self, kind, number = 1):
+        """Count an operation and advance the clock by its modeled time."""
+        self.counts[kind] += number
+        self.clock.advance(self.costs[kind]*number)
+
+    def set_pin(self, pin_id, value):
+        self.cost('pin')
+        self.pins[pin_id] = 1 if value else 0
+
+    def pin(self, pin_id):
+        return self.pins.get(pin_id, 0)
+
+    def level(self, role):
+        """Voltage on the pin with the given role, or 3.3V/0V if the role is not wired to a pin."""
+        pin_id = self.wiring.get(role)
+        if pin_id is None:
+            return self.VREF if role == 'therm_power' else 0.0
+        return self.VREF*self.pin(pin_id)
+
+    def voltage(self, pin_id):
+        """Voltage (V) on an analog input, given the current pin states."""
+        w = self.wiring
+        v1 = self.level('gpio1')
+        v2 = self.level('gpio2')
+        if pin_id in (w['pole3'], w['pole4'], w['current']):
+            #electrode 1 - outer - pole 3 - cell - pole 4 - outer - electrode 2 - resistor - gpio2
+            R = [self.outer_resistance, self.cell_resistance, self.outer_resistance, self.con_resistance]
+            I = (v1 - v2)/sum(R)
+            node = {w['pole3']: R[0], w['pole4']: R[0] + R[1], w['current']: R[0] + R[1] + R[2]}[pin_id]
+            return v1 - I*node
+        if pin_id == w['therm']:
+            Rt = steinhart_hart_resistance(self.temperature, self.A, self.B, self.C)
+            R = self.therm_resistance
+            return (self.level('therm_power')*Rt + self.level('therm_ground')*R)/(R + Rt)
+        return 0.0
+
+    def count(self, pin_id, bits = 12):
+        """Noisy ADC reading of an analog input, with the given resolution."""
+        full_scale = 2**bits - 1
+        value = self.voltage(pin_id)/self.VREF*full_scale
+        if self.noise:
+            value += self.random.gauss(0, self.noise*2**(bits - 12))
+        return min(max(int(round(value)), 0), full_scale)
@@ -0,0 +1,35 @@
+"""Stand-in for the pyb module."""
+from .hardware import Pin, ADC, ADCAll, Timer, I2C, RTC, LED, Switch, USB_VCP, active
+from . import utime as _time
+
+def delay(ms):
+    _time.sleep_ms(ms)
+
+def udelay(us):
+    _time.sleep_us(us)
+
+def millis():
+    return _time.ticks_ms()
+
+def micros():
+    return _time.ticks_us()
+
+def elapsed_millis(start):
+    return _time.ticks_diff(millis(), start)
+
+def elapsed_micros(start):
+    return _time.ticks_diff(micros(), start)
+
+def stop():
+    """Sleep until the RTC wakeup timer fires (or for one second if none is set)."""
+    m = active()
+    m.clock.sleep(1000*(m.wakeup_ms or 1000))
+
+def standby():
+    stop()
+
+def usb_mode(mode = None, **kwargs):
+    pass
+
+def freq(*args):
+    return (168000000, 168000000, 42000000, 84000000)
@@ -0,0 +1,18 @@
+"""Stand-in for uasyncio on top of asyncio.
+
+sleep_ms() only yields to other tasks without advancing the virtual clock.  Drivers
+that wait on hardware (e.g. MS5803_sensor.read_result()) then sleep for whatever
+time remains, so the modeled time of a cycle is that of the longest chain of work
+rather than the sum of the waits.
+"""
+import asyncio
+from asyncio import create_task, gather, Event, Lock, CancelledError, TimeoutError, wait_for, get_event_loop
+
+def run(coro):
+    return asyncio.run(coro)
+
+async def sleep(seconds):
+    await asyncio.sleep(0)
+
+async def sleep_ms(ms):
+    await asyncio.sleep(0)
@@ -0,0 +1,56 @@
+"""Stand-in for the MicroPython time module, running on the model's virtual clock.
+
+Installed as ``time`` (and ``utime``) for the firmware modules only, so host code
+keeps the real time module.
+"""
+import datetime
+
+from . import hardware
+from .model import TICKS_PERIOD, time_tuple
+
+def _clock():
+    return hardware.active().clock
+
+def time():
+    return _clock().seconds()
+
+def time_ns():
+    clock = _clock()
+    return clock.epoch_offset*1000000000 + int(clock.now_us*1000)
+
+def gmtime(secs = None):
+    clock = _clock()
+    if secs is None:
+        secs = clock.seconds()
+    return time_tuple(secs, clock.epoch)
+
+localtime = gmtime
+
+def mktime(t):
+    d = datetime.datetime(t[0], t[1], t[2], t[3], t[4], t[5])
+    return int((d - datetime.datetime(_clock().epoch, 1, 1)).total_seconds())
+
+def sleep(seconds):
+    _clock().advance(seconds*1000000)
+
+def sleep_ms(ms):
+    _clock().advance(ms*1000)
+
+def sleep_us(us):
+    _clock().advance(us)
+
+def ticks_us():
+    return int(_clock().now_us) % TICKS_PERIOD
+
+def ticks_ms():
+    return int(_clock().now_us//1000) % TICKS_PERIOD
+
+def ticks_cpu():
+    return ticks_us()
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % TICKS_PERIOD
+
+def ticks_diff(ticks1, ticks2):
+    half = TICKS_PERIOD//2
+    return ((ticks1 - ticks2 + half) % TICKS_PERIOD) - half
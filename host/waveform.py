@@ -0,0 +1,106 @@
+"""Load raw waveform captures written by capture.capture().
+
+The captures are memory-mapped, so long files are not read into memory until their
+values are used, and each block's arrays are NumPy views of the file.  Run from any
+directory to list the captures in a file::
+
+    python host/waveform.py waveCTD.bin
+
+Example
+-------
+>>> import waveform
+>>> blocks = waveform.read('waveCTD.bin')
+>>> b = blocks[0]
+>>> current = waveform.interleave(b['imeas1'], b['imeas2'])
+>>> plt.plot(b['us'], current)
+"""
+import argparse
+import os
+import struct
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pyboard'))
+import capture
+
+HEADER_SIZE = struct.calcsize(capture.HEADER_FORMAT)
+BLOCK_SIZE = struct.calcsize(capture.BLOCK_FORMAT)
+COUNT_FIELDS = ('imeas1', 'p3meas1', 'p4meas1', 'imeas2', 'p3meas2', 'p4meas2')
+
+def read_header(fname):
+    """Read and check the file header; return the epoch year of the capture times."""
+    with open(fname, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE:
+        raise ValueError('%s is too short to be a waveform file' % fname)
+    [magic, version, epoch] = struct.unpack(capture.HEADER_FORMAT, header)
+    if magic != capture.MAGIC:
+        raise ValueError('%s is not a waveform file' % fname)
+    if version != capture.VERSION:
+        raise ValueError('%s has format version %d, expected %d' % (fname, version, capture.VERSION))
+    return epoch
+
+def read(fname):
+    """Memory-map every complete capture in a waveform file.
+
+    Parameters
+    ----------
+    fname: str
+        Name of the file written by capture.capture()
+
+    Returns
+    -------
+    list of dict
+        One dict per capture with time (s since the epoch of the board), datetime,
+        rate (half-cycles per second), n, flags, bits, the six count arrays in
+        COUNT_FIELDS (n values each) and us (2n times, microseconds since the first
+        reading, alternating normal and reverse polarity).  A partial capture at the
+        end of the file is ignored.
+    """
+    epoch = read_header(fname)
+    data = np.memmap(fname, dtype = np.uint8, mode = 'r')
+    blocks = []
+    offset = HEADER_SIZE
+    while offset + BLOCK_SIZE <= len(data):
+        [stamp, rate, n, flags, bits, size] = struct.unpack(capture.BLOCK_FORMAT, bytes(data[offset:offset + BLOCK_SIZE]))
+        dtype = np.dtype('<i%d' % size)
+        offset += BLOCK_SIZE
+        end = offset + 8*n*size
+        if end > len(data):
+            break
+        block = {'time': stamp, 'datetime': np.datetime64('%d-01-01' % epoch, 's') + np.timedelta64(stamp, 's'),
+                 'rate': rate, 'n': n, 'flags': flags, 'bits': bits}
+        for name in COUNT_FIELDS:
+            block[name] = data[offset:offset + n*size].view(dtype)
+            offset += n*size
+        block['us'] = data[offset:end].view(dtype)
+        offset = end
+        blocks.append(block)
+    return blocks
+
+def interleave(normal, reverse):
+    """Readings of one channel in time order, alternating normal and reverse polarity."""
+    out = np.empty(2*len(normal), dtype = np.result_type(normal, reverse))
+    out[0::2] = normal
+    out[1::2] = reverse
+    return out
+
+def polarity_drift(block, name = 'p3meas1'):
+    """Least-squares slope (counts per ms) of one count array over the capture.
+
+    A steady slope at both polarities shows the electrodes charging (polarization)
+    through the capture.
+    """
+    start = 0 if name.endswith('1') else 1
+    t = block['us'][start::2]/1000
+    return np.polyfit(t, block[name].astype(float), 1)[0]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'List the captures in a waveform file.')
+    parser.add_argument('fname')
+    args = parser.parse_args()
+    print('%-20s %6s %10s %6s %10s %12s' % ('time', 'n', 'rate (Hz)', 'burst', 'span (ms)', 'p3 drift'))
+    for b in read(args.fname):
+        print('%-20s %6d %10.0f %6d %10.2f %12.3g' % (b['datetime'], b['n'], b['rate'], b['flags'] & capture.FLAG_BURST,
+                                                    b['us'][-1]/1000, polarity_drift(b)))
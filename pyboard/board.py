@@ -0,0 +1,73 @@
+"""Board-specific constants and ADC paths for the pyboard (STM32F405).
+
+conductivity4pole.py, thermistor_ac.py and sensor_bank.py import board instead of pyb
+or machine, so the same files run on the pyboard and the Raspberry Pi Pico; each
+board's folder has its own board.py with the same names.
+"""
+import time
+from pyb import Pin, ADC, Timer
+
+NAME = 'pyboard'
+#ADC.read() returns 12-bit counts
+BITS = 12
+FULL_SCALE = 4095
+VREF = 3.3
+#right shift from a count to the 12-bit count used to index the thermistor lookup table
+SHIFT = BITS - 12
+#push-pull output mode for the excitation pins
+OUT = Pin.OUT_PP
+#input mode, leaving an excitation pin in high impedance
+IN = Pin.IN
+#True if timed_burst() is available
+TIMED = True
+
+def reader(adc):
+    """Function returning one count from adc, i.e. the bound method ADC.read."""
+    return adc.read
+
+def timed_burst(gpio1, gpio2, adcs, bufs, freq, duty, timer = 2, ch1 = 3, ch2 = 4):
+    """
+    Drive gpio1 and gpio2 as complementary PWM outputs and read the ADCs on each timer event.
+
+    A single timer in center-aligned mode powers each pin once per period and paces
+    ``ADC.read_timed_multi``, which reads every channel on each update event, i.e. in
+    the middle of each half-cycle.  The pins are returned to plain outputs, both low.
+
+    Parameters
+    ----------
+    gpio1, gpio2: :obj:'pyb.Pin'
+        Excitation pins
+    adcs: tuple of :obj:'pyb.ADC'
+        Channels read on every event
+    bufs: tuple of :obj:'array.array' or memoryview
+        One 16-bit buffer per channel, filled with alternating polarities
+    freq: int
+        Half-cycles per second
+    duty: int
+        Percent of each half-cycle that the power pin is on, up to 50
+    timer: int, optional
+        Timer id with PWM channels on gpio1 and gpio2. Default is 2 (X3 = TIM2_CH3, X4 = TIM2_CH4).
+    ch1, ch2: int, optional
+        Timer channels connected to gpio1 and gpio2, default = 3 and 4
+
+    Returns
+    -------
+    ok: boolean
+        False if the reads could not keep up with the timer
+    elapsed: int
+        Time (us) taken by the burst
+    """
+    tim = Timer(timer, freq = freq, mode = Timer.CENTER)
+    tim.channel(ch1, Timer.PWM, pin = gpio1, pulse_width_percent = duty)
+    tim.channel(ch2, Timer.PWM_INVERTED, pin = gpio2, pulse_width_percent = 100 - duty)
+    starttime = time.ticks_us()
+    ok = ADC.read_timed_multi(adcs, bufs, tim)
+    endtime = time.ticks_us()
+    tim.deinit()
+
+    #return power pins to plain outputs, both low
+    gpio1.init(OUT)
+    gpio2.init(OUT)
+    gpio1.low()
+    gpio2.low()
+    return ok, time.ticks_diff(endtime, starttime)
@@ -0,0 +1,129 @@
+"""Salinity, conductivity at 25C and total dissolved solids for arrays of readings.
+
+cond_sensor.salinity(), k25() and TDS() convert one reading at a time.  The functions
+here fill an output array from arrays of temperature and conductivity, e.g. the
+readings of several probes in a sensor_bank or the records held by a log_writer, and
+the same equations are used on the host by ``host/reprocess.py``.
+
+The temperature polynomial of the salinity equation is evaluated in Horner form
+(six multiplications instead of six powers).  ``host/bench_derived.py`` checks it
+against the original scalar formulas.  An interpolated table of the polynomial was
+tried and dropped: the index and interpolation cost about as many float operations as
+the Horner form, and it measured about 50% slower on CPython.  The conductivity term
+keeps its single non-integer power: replacing it with a polynomial of the mantissa
+(math.frexp) took about four times as long on CPython, and each extra float operation
+allocates on the pyboard's heap.
+
+Readings with temperature -999 (no thermistor) or conductivity at or below zero give
+-999, as in cond_sensor.measure().
+"""
+#coefficients B0 to B6 of the temperature polynomial in the salinity equation
+#(Miller, Bradford, and Peters, USGS Water Supply Paper 2311)
+B = (0.13855E1, -0.46485668E-1, 0.14887785E-2, -0.63083433E-4, 0.25144517E-5, -0.59600245E-7, 0.57778085E-9)
+def polynomial(T):
+    """Temperature polynomial of the salinity equation, in Horner form."""
+    return B[0] + T*(B[1] + T*(B[2] + T*(B[3] + T*(B[4] + T*(B[5] + T*B[6])))))
+
+def salinity(T, k):
+    """Salinity (parts per thousand) from temperature (degrees C) and conductance (mS/cm).
+
+    Parameters
+    ----------
+    T: float
+        Temperature (degrees C)
+    k: float
+        Conductance (mS/cm)
+
+    Returns
+    -------
+    float
+        Salinity (parts per thousand), or -999 if T is -999 or k is not positive
+    """
+    if T == -999 or k <= 0:
+        return -999
+    return 1.80655*0.36996*polynomial(T)/(k**(-1.07) - 0.7464E-3)
+
+def salinity_batch(T, k, out, n = None):
+    """
+    Fill out with the salinity of each pair of temperature and conductance.
+
+    Parameters
+    ----------
+    T: :obj:'array.array' or list
+        Temperature (degrees C)
+    k: :obj:'array.array' or list
+        Conductance (mS/cm)
+    out: :obj:'array.array'
+        Salinity (parts per thousand); may be T or k
+    n: int, optional
+        Number of values, default len(out)
+
+    Returns
+    -------
+    :obj:'array.array'
+        out
+    """
+    if n is None:
+        n = len(out)
+    for i in range(n):
+        out[i] = salinity(T[i], k[i])
+    return out
+
+def k25_batch(k, T, out, n = None):
+    """
+    Fill out with conductivity at 25C, for KCl or fresh water, as in cond_sensor.k25().
+
+    Values with T of -999 give -999.
+
+    Parameters
+    ----------
+    k: :obj:'array.array' or list
+        Conductivity
+    T: :obj:'array.array' or list
+        Temperature (degrees C)
+    out: :obj:'array.array'
+        Conductivity at 25C, in the units of k; may be k or T
+    n: int, optional
+        Number of values, default len(out)
+
+    Returns
+    -------
+    :obj:'array.array'
+        out
+    """
+    if n is None:
+        n = len(out)
+    for i in range(n):
+        t = T[i]
+        if t == -999:
+            out[i] = -999
+        else:
+            out[i] = k[i]/(1 + 0.0191*(t - 25))
+    return out
+
+def TDS_batch(k25, out, n = None):
+    """
+    Fill out with total dissolved solids from conductivity at 25C, as in cond_sensor.TDS().
+
+    Values of -999 stay -999.
+
+    Parameters
+    ----------
+    k25: :obj:'array.array' or list
+        Conductivity at 25C
+    out: :obj:'array.array'
+        Total dissolved solids; may be k25
+    n: int, optional
+        Number of values, default len(out)
+
+    Returns
+    -------
+    :obj:'array.array'
+        out
+    """
+    if n is None:
+        n = len(out)
+    for i in range(n):
+        x = k25[i]
+        out[i] = -999 if x == -999 else 0.65*x
+    return out
@@ -0,0 +1,117 @@
+"""Power-managed idle phase between readings.
+
+Instead of waking every 2 seconds to blink the LED and poll the switch, the
+idle_timer class sleeps once (machine.lightsleep(), which is stop mode on the
+pyboard) until the next sample time, with the RTC waking the board.  The user switch
+is set up as an interrupt, so pressing it wakes the board early.  Standby/deepsleep
+is not used because it resets the board, losing the records buffered by
+logwriter.log_writer and the state of scheduler.event_scheduler.
+
+After each idle phase, the number of times the board woke and an estimate of the
+mean current drawn while idle are kept, so the saving can be checked in the field.
+"""
+import machine
+import time
+
+class idle_timer:
+    """A class for sleeping until the next sample time with a single RTC alarm.
+
+    Parameters
+    ----------
+    switch : pyb.Switch or machine.Pin, optional
+        Switch that ends the idle phase early.  A pyb.Switch is set up with callback(),
+        a machine.Pin with irq() on the falling edge (switch to ground with a pull-up).
+    max_sleep : int, optional
+        Longest single sleep (ms), e.g. shorter than the watchdog timeout.  Default is
+        None (sleep the whole interval at once).
+    feed : function, optional
+        Called with no arguments each time the board wakes, e.g. wdt.feed
+    sleep_current : float, optional
+        Current (mA) drawn while asleep, default 0.5 (pyboard in stop mode)
+    awake_current : float, optional
+        Current (mA) drawn while awake, default 40 (pyboard at 168 MHz)
+
+    Attributes
+    ----------
+    pressed : boolean
+        True if the switch has been pressed since sleep_until() last returned;
+        cleared when sleep_until() reports it
+    wakes : int
+        Number of times the board woke during the last idle phase
+    awake_ms : float
+        Time (ms) spent awake during the last idle phase
+    slept_ms : float
+        Time (ms) spent asleep during the last idle phase
+    current : float
+        Estimated mean current (mA) during the last idle phase
+
+    Example
+    -------
+    >>> import idle
+    >>> sleeper = idle.idle_timer(pyb.Switch())
+    >>> if sleeper.sleep_until(log_time):
+    >>>     print('switch pressed')
+    >>> print(sleeper.wakes, sleeper.current)
+
+    """
+
+    def __init__(self, switch = None, max_sleep = None, feed = None, sleep_current = 0.5, awake_current = 40):
+        self.max_sleep = max_sleep
+        self.feed = feed
+        self.sleep_current = sleep_current
+        self.awake_current = awake_current
+        self.pressed = False
+        self.wakes = 0
+        self.awake_ms = 0
+        self.slept_ms = 0
+        self.current = 0
+        if switch is not None:
+            try:
+                switch.callback(self.press)
+            except AttributeError:
+                switch.irq(self.press, machine.Pin.IRQ_FALLING)
+
+    def press(self, *args):
+        """Interrupt handler for the switch; only sets a flag."""
+        self.pressed = True
+
+    def sleep_until(self, log_time):
+        """Sleep until time.time() reaches log_time or the switch is pressed.
+
+        Parameters
+        ----------
+        log_time : int
+            Time (s, as returned by time.time()) of the next reading
+
+        Returns
+        -------
+        boolean
+            True if the switch was pressed, during this idle phase or while the board
+            was awake since the last one (in which case it returns at once)
+        """
+        self.wakes = 0
+        self.awake_ms = 0
+        start = time.time()
+        while not self.pressed:
+            awake = time.ticks_us()
+            remaining = 1000*(log_time - time.time())
+            if remaining <= 0:
+                break
+            if self.max_sleep is not None and remaining > self.max_sleep:
+                remaining = self.max_sleep
+            if self.feed is not None:
+                self.feed()
+            self.awake_ms += time.ticks_diff(time.ticks_us(), awake)/1000
+            machine.lightsleep(remaining)
+            self.wakes += 1
+        #ticks may stop while asleep, so the time asleep is taken from the RTC
+        self.slept_ms = max(1000*(time.time() - start) - self.awake_ms, 0)
+        total = self.awake_ms + self.slept_ms
+        if total > 0:
+            self.current = (self.awake_ms*self.awake_current + self.slept_ms*self.sleep_current)/total
+        else:
+            self.current = self.awake_current
+        #clear the flag only once the press has been reported
+        pressed = self.pressed
+        self.pressed = False
+        return pressed
@@ -7,13 +7,53 @@ import math
 import array as arr
 import thermistor_ac
 import conductivity4pole
+import logwriter
+import scheduler
+import idle
+import profiler
+import cal_model
 import time
+try:
+    import uasyncio as asyncio   #only needed by log_async
+except ImportError:
+    asyncio = None
 
-def log(t):
+#column names of the text log; the trimmed-mean raw counts are followed by the number of 
+#conductivity samples and thermistor readings used, 1 for records taken at the fast rate,
+#and the calibrated conductivity
+HEADER = 'YY/MM/DD,Hour:Min:Sec,r1,r2,MS5803_T,pressure,therm_T,icount1,probe3count1,probe4count1,icount2,probe3count2,probe4count2,n,n_T,burst,k\r\n'
+
+def write_header(fname):
+    """Write the column names to the text log if the file is new or empty."""
+    try:
+        f = open(fname,'r')
+        empty = len(f.read(1)) == 0
+        f.close()
+    except OSError:
+        empty = True
+    if empty:
+        f = open(fname,'w')
+        f.write(HEADER)
+        f.close()
+
+def low_battery(threshold = 3.2):
+    """True if the supply has dropped far enough that the 3.3 V reference (VDDA) sags below threshold (volts)."""
+    try:
+        return pyb.ADCAll(12, 0x70000).read_vref() < threshold
+    except:
+        return False
+
+def usb_attached():
+    """True if USB power (VBUS) is present."""
+    return pyb.Pin.board.USB_VBUS.value() == 1
+
+def log(t, binary = False, n = 12, tol = None, T_tol = None, fast = None, k_change = 0.02, pres_change = 5, profile = 0, cal = 'calCTD.json'):
     """ A function for logging data to file at a regular interval.
 
     The function saves a line of text at each interval representing conductivity, temperature,
-    pressure. The device then goes into standby mode for interval t.  After interval t, the
+    pressure, followed by the six raw counts returned by cond_sensor.measure(), so that 
+    resistance can be recomputed later (see host/reprocess.py), and the number of samples
+    used for conductivity and temperature. The device then goes into standby mode for interval t.  After interval t, the
     device awakes as if from a hard reset.  The function is designed to be called from
     main.py. Puts device in standby mode upon completion.
 
@@ -21,6 +61,38 @@ def log(t):
     ----------
     t: int
         logging interval (seconds)
+    binary: boolean, optional
+        If True, records are packed by logwriter.log_writer and appended to
+        datalogCTD.bin in blocks of 32, or sooner if the battery is low, USB power
+        is attached or the switch is pressed. Default is False (text file).
+    n: int, optional
+        Number of conductivity samples per polarity, or the maximum if tol is given. Default is 12.
+    tol: float, optional
+        Target standard error of resistance (ohm) for adaptive sampling (see cond_sensor.measure()).
+        Default is None (always n samples).
+    T_tol: float, optional
+        Target standard error of temperature (degrees C) for adaptive thermistor sampling.
+        Default is None (always 400 readings).
+    fast: int, optional
+        If given, t is the base interval used while readings are steady, and the interval
+        drops to fast (seconds) when conductivity or pressure changes by more than k_change
+        or pres_change between cycles, then decays back (see scheduler.event_scheduler).
+        Records taken at the faster rate are tagged in the burst column (text) or with 
+        logwriter.FLAG_BURST (binary). Default is None (fixed interval t).
+    k_change: float, optional
+        Relative change in conductivity that starts a burst, default 0.02
+    pres_change: float, optional
+        Change in pressure (mbar) that starts a burst, default 5
+    profile: int, optional
+        If not 0, the time spent in each phase of the cycle (start delay, conductivity
+        acquisition and computation, thermistor, pressure, write and the whole awake
+        period) is appended to profileCTD.txt every profile cycles (see profiler.phase_timer
+        and host/profile_summary.py). Default is 0 (no profiling).
+    cal: str, optional
+        Name of a calibration model file saved by cal_model.cal_model.save().  If the
+        file is on the board, conductivity is computed with that model instead of the
+        linear cell_const and b, and the calibrated value is written in the k column.
+        Default is 'calCTD.json'.
     
     Example
     -------
@@ -42,10 +114,64 @@ def log(t):
     #from machine import WDT
     #wdt = machine.WDT(timeout=30000)
     
+    #define conductivity sensor once, so that its sample buffers are reused every cycle
+    gpio1 = Pin('X3', Pin.OUT_PP)  #connected directly to electrode
+    gpio2 = Pin('X4', Pin.OUT_PP)  #connected to resistor connected to electrode
+    adc1 = ADC('X5')          #connected to middle pole not adjacent to
+    adc2 = ADC('X6')          #connected to middle pole adjacent to resistor
+    adc3_current = ADC('X7')
+    adc4_therm = ADC('X8')
+    con_resistance = 250
+    therm_resistance = 20000
+    cell_const = 1     #run external calibration to get A
+    b = 0     #run external calibration to get B
+    t_1 = gpio1
+    t_2 = gpio2
+    try:
+        model = cal_model.load(cal)
+    except:
+        model = None
+        print('Could not read calibration model from %s, using cell_const and b' % cal)
+    conductivity_sensor = conductivity4pole.cond_sensor(gpio1,gpio2,adc1,adc2,adc3_current,adc4_therm,con_resistance,therm_resistance,cell_const,b,t_1,t_2,model = model)
+
+    #define pressure sensor once, so that its PROM is read and checked only at start up.
+    #Connect SCL to X9, SDA to X10, VCC to Y7, GND to Y8
+    pres_power = Pin('Y7', Pin.OUT_PP)
+    pres_gnd = Pin('Y8', Pin.OUT_PP)
+    i2c = machine.I2C(scl='X9', sda='X10', freq = 100000)
+    try:
+        pres_sensor = pressure.MS5803_sensor(i2c, pres_power, pres_gnd)
+        pres_sensor.power_off()
+    except:
+        pres_sensor = None
+        pres_power.value(0)
+        print('Pressure sensor not found')
+    writer = None
+    if binary:
+        writer = logwriter.log_writer('datalogCTD.bin', low_battery = low_battery, usb_attached = usb_attached)
+    else:
+        try:
+            write_header('datalogCTD.txt')
+        except:
+            pass
+    schedule = None
+    if fast is not None:
+        schedule = scheduler.event_scheduler(t, fast, k_change, pres_change)
+    #wake before the watchdog times out if it is enabled
+    try:
+        sleeper = idle.idle_timer(pyb.Switch(), max_sleep = 20000, feed = wdt.feed)
+    except:
+        sleeper = idle.idle_timer(pyb.Switch())
+    timer = None
+    if profile:
+        timer = profiler.phase_timer('profileCTD.txt', profile)
+        conductivity_sensor.phase_hook = timer.add
+    
     while True:
             #keep track of elapsed time
         start_time = time.time()
         log_time = start_time + t
+        awake = time.ticks_us()
         try:
             wdt.feed()
         except:
@@ -57,6 +183,7 @@ def log(t):
         datetime = rtc.datetime()
 
         #light up LED to let user know it is on
+        phase = time.ticks_us()
         led = pyb.LED(2)
         led.on()
 
@@ -67,36 +194,18 @@ def log(t):
         led.off()
         time.sleep(0.5)
         led.on()
+        if timer is not None:
+            timer.add('start', phase)
 
         #define clock object, set next wakeup time (in milliseconds) and get the time
         rtc = pyb.RTC()
         datetime = rtc.datetime()
 
-        #define conductivity sensor 
-        gpio1 = Pin('X3', Pin.OUT_PP)  #connected directly to electrode
-        gpio2 = Pin('X4', Pin.OUT_PP)  #connected to resistor connected to electrode
-        adc1 = ADC('X5')          #connected to middle pole not adjacent to
-        adc2 = ADC('X6')          #connected to middle pole adjacent to resistor
-        adc3_current = ADC('X7')
-        adc4_therm = ADC('X8')
-        con_resistance = 250
-        therm_resistance = 20000
-        cell_const = 1     #run external calibration to get A
-        b = 0     #run external calibration to get B
-        t_1 = gpio1
-        t_2 = gpio2
-        conductivity_sensor = conductivity4pole.cond_sensor(gpio1,gpio2,adc1,adc2,adc3_current,adc4_therm,con_resistance,therm_resistance,cell_const,b,t_1,t_2)
-
         try:
             wdt.feed()
         except:
             pass
             
-        #define pressure sensor in Pressure.py.  Connect SCL to X9, SDA to X10, VCC to Y7, GND to Y8
-        pres_power = Pin('Y7', Pin.OUT_PP)
-        pres_gnd = Pin('Y8', Pin.OUT_PP)
-        i2c = machine.I2C(scl='X9', sda='X10', freq = 100000)
-                    
         #write header in textfile
         #headerline = 'YY/MM/DD,Hour:Min:Sec,count1,count2,r1,r2,temp,pressure\r\n'
         #f = open('datalogDuw.txt','a')
@@ -104,33 +213,62 @@ def log(t):
         #f.close()
 
         #read values from sensors
+        phase = time.ticks_us()
         try:
-            [r1, r2, T, k, icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2] = conductivity_sensor.measure()
+            [r1, r2, T, k, icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2] = conductivity_sensor.measure(n = n, tol = tol, T_tol = T_tol)
+            n_used = conductivity_sensor.n_used
+            n_T = conductivity_sensor.n_T
         except:
             [r1, r2, T, k, icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2] = [-999,-999,-999,-999,-999,-999,-999,-999,-999,-999]
+            n_used = 0
+            n_T = 0
+        if timer is not None:
+            timer.add('conductivity', phase)
+        phase = time.ticks_us()
         try:
-            [pres, ctemp] = pressure.MS5803(i2c, pres_power, pres_gnd)
+            if pres_sensor is None:
+                #try again in case it was not connected at start up
+                pres_sensor = pressure.MS5803_sensor(i2c, pres_power, pres_gnd)
+            else:
+                pres_sensor.power_on()
+            [pres, ctemp] = pres_sensor.read()
         except:
             pres = -999
             ctemp = -999
             print('Pressure reading failed')
+        pres_power.value(0)
+        if timer is not None:
+            timer.add('pressure', phase)
         try:
             wdt.feed()
         except:
             pass
             
+        #choose the next interval, sampling faster after a change
+        burst = 0
+        if schedule is not None:
+            log_time = start_time + schedule.update(k, pres)
+            if schedule.burst:
+                burst = 1
         
         #write results to file
         outputtxt = ('%s/%s/%s,%s:%s:%s,' % (datetime[0], datetime[1], datetime[2], datetime[4], datetime[5], datetime[6]))
         outputtxt += ('%5.2f,%5.2f,' % (r1, r2))
         outputtxt += ('%s,%s,' % (ctemp, pres))
-        #outputtxt += ('%s, %s, %s, %s, %s, %s,' % (icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2))
-        outputtxt += ('%s\r\n' % T)
+        outputtxt += ('%s,' % T)
+        outputtxt += ('%.2f,%.2f,%.2f,%.2f,%.2f,%.2f,' % (icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2))
+        outputtxt += ('%s,%s,%s,%s\r\n' % (n_used, n_T, burst, k))
         print (outputtxt)
+        phase = time.ticks_us()
         try:
-            f = open('datalogCTD.txt','a')
-            f.write(outputtxt)
-            f.close()
+            if writer is not None:
+                writer.append(start_time, r1, r2, T, k, pres, ctemp,
+                              icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2,
+                              flags = burst*logwriter.FLAG_BURST, n = n_used, n_T = n_T)
+            else:
+                f = open('datalogCTD.txt','a')
+                f.write(outputtxt)
+                f.close()
         except:
             led1 = pyb.LED(1)
             led1.on()
@@ -140,26 +278,218 @@ def log(t):
             led4 = pyb.LED(4)
             led.on()
             time.sleep(1)
+        if timer is not None:
+            timer.add('write', phase)
+            timer.add('awake', awake)
+            timer.end_cycle()
             
-        sw = pyb.Switch()    
-        while time.time() < log_time:    
+        #blink once, then sleep until the next reading or until the switch is pressed
+        led.on()
+        time.sleep(0.005)
+        led.off()
+        if sleeper.sleep_until(log_time):
+            if writer is not None:
+                writer.flush()
+            pyb.usb_mode(None)
+            pyb.LED(3).on()
+            time.sleep(5)
+            pyb.usb_mode('VCP+MSC')
             try:
                 wdt.feed()
             except:
-                pass          
-            led.on()
-            time.sleep(0.005)
-            led.off()
-            if sw():
-                pyb.usb_mode(None)
-                pyb.LED(3).on()
-                time.sleep(5)
-                pyb.usb_mode('VCP+MSC')
-                try:
-                    wdt.feed()
-                except:
-                    pass
-                break
-            rtc.wakeup(2000)
-            pyb.stop()
-            
+                pass
+        print('idle: %d wakes, %.2f mA' % (sleeper.wakes, sleeper.current))
+
+#records kept in memory by log_async() while writes to the log file fail
+MAX_UNSAVED = 20
+
+async def read_pressure(sensor, timer):
+    """Read the MS5803, yielding to other tasks while each conversion runs."""
+    start = time.ticks_us()
+    sensor.power_on()
+    wait = sensor.start_conversion('pressure')
+    await asyncio.sleep_ms(wait//1000 + 1)
+    D1 = sensor.read_result()
+    wait = sensor.start_conversion('temperature')
+    await asyncio.sleep_ms(wait//1000 + 1)
+    D2 = sensor.read_result()
+    sensor.power_off()
+    if timer is not None:
+        timer.add('pressure', start)
+    return sensor.compensate(D1, D2)
+
+async def read_conductivity(sensor, timer):
+    """Measure conductivity with the thermistor sampled in the same excitation sequence."""
+    #yield once so that the pressure conversion is started before the burst blocks
+    await asyncio.sleep_ms(0)
+    start = time.ticks_us()
+    result = sensor.measure(combined = True)
+    if timer is not None:
+        timer.add('conductivity', start)
+    return result
+
+async def acquire(conductivity_sensor, pres_sensor, timer):
+    """Run the pressure and the conductivity/temperature measurements of one cycle as concurrent tasks."""
+    pres_task = None
+    if pres_sensor is not None:
+        pres_task = asyncio.create_task(read_pressure(pres_sensor, timer))
+    try:
+        cond = await read_conductivity(conductivity_sensor, timer)
+    except:
+        cond = [-999,-999,-999,-999,-999,-999,-999,-999,-999,-999]
+    pres = [-999,-999]
+    if pres_task is not None:
+        try:
+            pres = await pres_task
+        except:
+            print('Pressure reading failed')
+    return cond, pres
+
+def log_async(t, fname = 'datalogCTD.txt', cal = 'calCTD.json', profile = 0):
+    """ A function for logging data to file at a regular interval, using concurrent tasks.
+
+    Produces the same records as log(), but the MS5803 conversion waits and the
+    conductivity and thermistor measurement run as cooperative uasyncio tasks, so the
+    awake time in each cycle is close to that of the longer of the two rather than
+    their sum.  The thermistor is sampled during the conductivity excitation
+    (measure(combined = True)), the MS5803 uses pressure.MS5803_sensor, and the 5
+    second start delay happens only once, when logging starts.  Each record is written
+    at the end of its own cycle; if the write fails, the red LED is lit and the record
+    is kept and written with the next one.
+
+    Parameters
+    ----------
+    t: int
+        logging interval (seconds)
+    fname: str, optional
+        name of the log file, default 'datalogCTD.txt'
+    cal: str, optional
+        Name of a calibration model file, as for log(). Default is 'calCTD.json'.
+    profile: int, optional
+        As for log(): if not 0, the time spent in each phase is appended to
+        profileCTD.txt every profile cycles. Default is 0 (no profiling).
+    
+    Example
+    -------
+    To log data at 30 second intervals, save the following two lines as main.py
+	
+    >>> import logger_ctd
+    >>> logger_ctd.log_async(30)
+
+    """
+    #define conductivity sensor 
+    gpio1 = Pin('X3', Pin.OUT_PP)  #connected directly to electrode
+    gpio2 = Pin('X4', Pin.OUT_PP)  #connected to resistor connected to electrode
+    adc1 = ADC('X5')          #connected to middle pole not adjacent to
+    adc2 = ADC('X6')          #connected to middle pole adjacent to resistor
+    adc3_current = ADC('X7')
+    adc4_therm = ADC('X8')
+    con_resistance = 250
+    therm_resistance = 20000
+    cell_const = 1     #run external calibration to get A
+    b = 0     #run external calibration to get B
+    t_1 = gpio1
+    t_2 = gpio2
+    try:
+        model = cal_model.load(cal)
+    except:
+        model = None
+        print('Could not read calibration model from %s, using cell_const and b' % cal)
+    conductivity_sensor = conductivity4pole.cond_sensor(gpio1,gpio2,adc1,adc2,adc3_current,adc4_therm,con_resistance,therm_resistance,cell_const,b,t_1,t_2,model = model)
+
+    #define pressure sensor in Pressure.py.  Connect SCL to X9, SDA to X10, VCC to Y7, GND to Y8
+    pres_power = Pin('Y7', Pin.OUT_PP)
+    pres_gnd = Pin('Y8', Pin.OUT_PP)
+    i2c = machine.I2C(scl='X9', sda='X10', freq = 100000)
+    try:
+        pres_sensor = pressure.MS5803_sensor(i2c, pres_power, pres_gnd)
+        pres_sensor.power_off()
+    except:
+        pres_sensor = None
+        print('Pressure sensor not found')
+
+    rtc = pyb.RTC()
+    led = pyb.LED(2)
+    try:
+        sleeper = idle.idle_timer(pyb.Switch(), max_sleep = 20000, feed = wdt.feed)
+    except:
+        sleeper = idle.idle_timer(pyb.Switch())
+
+    #wait 5 seconds to allow user to jump in
+    led.on()
+    time.sleep(5)
+    led.off()
+
+    timer = None
+    if profile:
+        timer = profiler.phase_timer('profileCTD.txt', profile)
+        conductivity_sensor.phase_hook = timer.add
+
+    try:
+        write_header(fname)
+    except:
+        pass
+
+    #records not yet written because a write failed, at most MAX_UNSAVED
+    unsaved = []
+    while True:
+        #keep track of elapsed time
+        start_time = time.time()
+        log_time = start_time + t
+        datetime = rtc.datetime()
+        led.on()
+        awake = time.ticks_us()
+
+        [cond, pres] = asyncio.run(acquire(conductivity_sensor, pres_sensor, timer))
+        led.off()
+
+        [r1, r2, T, k, icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2] = cond
+        [pres, ctemp] = pres
+        if r1 == -999:
+            n_used = 0
+            n_T = 0
+        else:
+            n_used = conductivity_sensor.n_used
+            n_T = conductivity_sensor.n_T
+
+        #write results to file, with any record left over from a failed write
+        outputtxt = ('%s/%s/%s,%s:%s:%s,' % (datetime[0], datetime[1], datetime[2], datetime[4], datetime[5], datetime[6]))
+        outputtxt += ('%5.2f,%5.2f,' % (r1, r2))
+        outputtxt += ('%s,%s,' % (ctemp, pres))
+        outputtxt += ('%s,' % T)
+        outputtxt += ('%.2f,%.2f,%.2f,%.2f,%.2f,%.2f,' % (icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2))
+        outputtxt += ('%s,%s,0,%s\r\n' % (n_used, n_T, k))
+        print (outputtxt)
+        phase = time.ticks_us()
+        unsaved.append(outputtxt)
+        try:
+            f = open(fname,'a')
+            for line in unsaved:
+                f.write(line)
+            f.close()
+            unsaved = []
+        except:
+            if len(unsaved) > MAX_UNSAVED:
+                del unsaved[0]
+            print('Write failed, %d records kept for the next cycle' % len(unsaved))
+            pyb.LED(1).on()
+            time.sleep(1)
+            pyb.LED(1).off()
+        if timer is not None:
+            timer.add('write', phase)
+            timer.add('awake', awake)
+            timer.end_cycle()
+
+        #blink once, then sleep until the next reading or until the switch is pressed
+        led.on()
+        time.sleep(0.005)
+        led.off()
+        if sleeper.sleep_until(log_time):
+            pyb.usb_mode(None)
+            pyb.LED(3).on()
+            time.sleep(5)
+            pyb.usb_mode('VCP+MSC')
+            try:
+                wdt.feed()
+            except:
+                pass
@@ -5,9 +5,22 @@ from pyb import Pin, ADC
 import pressure
 import math
 import array as arr
+import logwriter
+import idle
 import time
 
-def log(t):
+def low_battery(threshold = 3.2):
+    """True if the supply has dropped far enough that the 3.3 V reference (VDDA) sags below threshold (volts)."""
+    try:
+        return pyb.ADCAll(12, 0x70000).read_vref() < threshold
+    except:
+        return False
+
+def usb_attached():
+    """True if USB power (VBUS) is present."""
+    return pyb.Pin.board.USB_VBUS.value() == 1
+
+def log(t, binary = False):
     """ A function for logging data from an MS5803 sensor to file at a regular interval.
     The function saves a line of text at each interval representing conductivity, temperature,
     pressure. The device then goes into standby mode for interval t.  After interval t, the
@@ -17,6 +30,10 @@ def log(t):
     ----------
     t: int
         logging interval (seconds)
+    binary: boolean, optional
+        If True, records are packed by logwriter.log_writer and appended to
+        datalogCTD.bin in blocks of 32, or sooner if the battery is low, USB power
+        is attached or the switch is pressed. Default is False (text file).
     
     Example
     -------
@@ -50,10 +67,14 @@ def log(t):
     
     #write file header
     outputtxt = 'date,time,pressure(mbar),temperature(C)\r\n'
+    writer = None
     try:
-        f = open('datalogCTD.txt','a')
-        f.write(outputtxt)
-        f.close()
+        if binary:
+            writer = logwriter.log_writer('datalogCTD.bin', low_battery = low_battery, usb_attached = usb_attached)
+        else:
+            f = open('datalogCTD.txt','a')
+            f.write(outputtxt)
+            f.close()
     except:
         #briefly turn all leds on if fails to write
         red.on()
@@ -65,6 +86,24 @@ def log(t):
         green.off()
         blue.off()
         yellow.off()
+    #wake before the watchdog times out if it is enabled
+    try:
+        sleeper = idle.idle_timer(pyb.Switch(), max_sleep = 20000, feed = wdt.feed)
+    except:
+        sleeper = idle.idle_timer(pyb.Switch())
+
+    #define pressure sensor once, so that its PROM is read and checked only at start up.
+    #Connect SCL to Y10, SDA to Y9, VCC to Y7, GND to Y8
+    pres_power = Pin('Y7', Pin.OUT_PP)
+    pres_gnd = Pin('Y8', Pin.OUT_PP)
+    i2c = machine.I2C(scl='Y10', sda='Y9', freq = 100000)
+    try:
+        pres_sensor = pressure.MS5803_sensor(i2c, pres_power, pres_gnd)
+        pres_sensor.power_off()
+    except:
+        pres_sensor = None
+        pres_power.value(0)
+        print('Pressure sensor not found')
     
     start_time = time.time()
     
@@ -84,6 +123,7 @@ def log(t):
         rtc = pyb.RTC()
         datetime = rtc.datetime()
         log_time = start_time + t
+        timestamp = start_time
         start_time = log_time
 
         try:
@@ -91,11 +131,6 @@ def log(t):
         except:
             pass
             
-        #define pressure sensor in Pressure.py.  Connect SCL to X9, SDA to X10, VCC to Y7, GND to Y8
-        pres_power = Pin('Y7', Pin.OUT_PP)
-        pres_gnd = Pin('Y8', Pin.OUT_PP)
-        i2c = machine.I2C(scl='Y10', sda='Y9', freq = 100000)
-                    
         #write header in textfile
         #headerline = 'YY/MM/DD,Hour:Min:Sec,count1,count2,r1,r2,temp,pressure\r\n'
         #f = open('datalogDuw.txt','a')
@@ -104,7 +139,12 @@ def log(t):
 
         #read values from sensors
         try:
-            [pres, ctemp] = pressure.MS5803(i2c, pres_power, pres_gnd)
+            if pres_sensor is None:
+                #try again in case it was not connected at start up
+                pres_sensor = pressure.MS5803_sensor(i2c, pres_power, pres_gnd)
+            else:
+                pres_sensor.power_on()
+            [pres, ctemp] = pres_sensor.read()
         except:
             pres = -999
             ctemp = -999
@@ -112,6 +152,7 @@ def log(t):
             yellow.on()
             time.sleep(1)
             yellow.off()
+        pres_power.value(0)
         try:
             wdt.feed()
         except:
@@ -122,9 +163,12 @@ def log(t):
         outputtxt += ('%s,%s\r\n' % (pres, ctemp))
         print (outputtxt)
         try:
-            f = open('datalogCTD.txt','a')
-            f.write(outputtxt)
-            f.close()
+            if writer is not None:
+                writer.append(timestamp, pressure = pres, ctemp = ctemp)
+            else:
+                f = open('datalogCTD.txt','a')
+                f.write(outputtxt)
+                f.close()
         except:
             #briefly turn all leds on if fails to write
             red.on()
@@ -137,25 +181,20 @@ def log(t):
             blue.off()
             yellow.off()
             
-        sw = pyb.Switch()    
-        while time.time() < log_time:    
+        #blink once, then sleep until the next reading or until the switch is pressed
+        green.on()
+        time.sleep(0.005)
+        green.off()
+        if sleeper.sleep_until(log_time):
+            if writer is not None:
+                writer.flush()
+            pyb.usb_mode(None)
+            yellow.on()
+            time.sleep(5)
+            pyb.usb_mode('VCP+MSC')
             try:
                 wdt.feed()
             except:
-                pass          
-            green.on()
-            time.sleep(0.005)
-            green.off()
-            if sw():
-                pyb.usb_mode(None)
-                yellow.on()
-                time.sleep(5)
-                pyb.usb_mode('VCP+MSC')
-                try:
-                    wdt.feed()
-                except:
-                    pass
-                break
-            rtc.wakeup(2000)
-            pyb.stop()
+                pass
+        print('idle: %d wakes, %.2f mA' % (sleeper.wakes, sleeper.current))
             
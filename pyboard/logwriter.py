@@ -0,0 +1,182 @@
+"""Buffered binary log writer with fixed-size records.
+
+Appending a formatted line to a text file every cycle opens the file, writes a few
+bytes and closes it again, which updates the FAT on the SD card or flash every time.
+The log_writer class instead packs each reading into a fixed-size record, keeps the
+records in a ring buffer in RAM, and appends them to the log file in blocks.  Records
+that have not been flushed are lost if the board resets, so flush() should be called
+before the board is disconnected or the battery runs down.
+
+Each file starts with a 10-byte header (magic ``CTDB``, format version, record size and
+the epoch year of the board's clock), followed by records packed with RECORD_FORMAT.
+The host-side module ``host/decode.py`` reads these files back.  If the log file was
+started by another version of this module (a different header), it is renamed, e.g. to
+datalogCTD_1.bin, and a new file is started, so a file never holds records of two sizes.
+"""
+import os
+import struct
+import time
+
+MAGIC = b'CTDB'
+VERSION = 2
+HEADER_FORMAT = '<4sHHH'
+#timestamp (s), flags, conductivity samples, thermistor readings, r1, r2, T, k, pressure, MS5803 T,
+#and the six trimmed-mean counts
+RECORD_FORMAT = '<IHHH12f'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+FIELDS = ('time', 'flags', 'n', 'n_T', 'r1', 'r2', 'T', 'k', 'pressure', 'MS5803_T',
+          'icount1', 'probe3count1', 'probe4count1', 'icount2', 'probe3count2', 'probe4count2')
+#bits of the flags field
+FLAG_BURST = 1    #record taken at the fast rate of scheduler.event_scheduler
+
+def retired_name(fname):
+    """First unused name fname_1, fname_2, ... (before the extension) for an old log file."""
+    dot = fname.rfind('.')
+    if dot > 0:
+        [base, ext] = [fname[:dot], fname[dot:]]
+    else:
+        [base, ext] = [fname, '']
+    i = 1
+    while True:
+        name = '%s_%d%s' % (base, i, ext)
+        try:
+            os.stat(name)
+        except OSError:
+            return name
+        i += 1
+
+class log_writer:
+    """A class for buffering fixed-size log records in RAM and writing them in blocks.
+
+    Parameters
+    ----------
+    fname : str
+        Name of the binary log file.  A header is written if the file is new or empty.
+    capacity : int, optional
+        Number of records held in RAM, default 64
+    threshold : int, optional
+        Number of buffered records that triggers a flush, default 32
+    low_battery : function, optional
+        Called with no arguments after each record; the buffer is flushed if it returns True
+    usb_attached : function, optional
+        Called with no arguments after each record; the buffer is flushed if it returns True
+
+    Attributes
+    ----------
+    count : int
+        Number of records waiting to be written
+    dropped : int
+        Number of records overwritten because the buffer filled before it could be written
+    retired : str
+        New name of a log file of another format found when the writer was created, or
+        None
+
+    Example
+    -------
+    >>> import logwriter
+    >>> writer = logwriter.log_writer('datalogCTD.bin', threshold = 16)
+    >>> writer.append(time.time(), r1, r2, T, k, pres, ctemp)
+    >>> writer.flush()
+
+    """
+
+    def __init__(self, fname, capacity = 64, threshold = 32, low_battery = None, usb_attached = None):
+        self.fname = fname
+        self.capacity = capacity
+        self.threshold = min(threshold, capacity)
+        self.low_battery = low_battery
+        self.usb_attached = usb_attached
+        self.buffer = bytearray(capacity*RECORD_SIZE)
+        self.start = 0
+        self.count = 0
+        self.dropped = 0
+        self.retired = None
+        self.write_header()
+
+    def write_header(self):
+        """Write the file header if the file does not exist yet or is empty.
+
+        If the file starts with any other header (another format version or record
+        size, or not a log file at all), it is renamed with retired_name() and a new
+        file is started.
+        """
+        header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, RECORD_SIZE, time.gmtime(0)[0])
+        try:
+            f = open(self.fname, 'rb')
+            existing = f.read(len(header))
+            f.close()
+        except OSError:
+            existing = b''
+        if existing == header:
+            return
+        if existing:
+            self.retired = retired_name(self.fname)
+            os.rename(self.fname, self.retired)
+            print('%s has another format; renamed to %s' % (self.fname, self.retired))
+        f = open(self.fname, 'wb')
+        f.write(header)
+        f.close()
+
+    def append(self, timestamp, r1 = -999, r2 = -999, T = -999, k = -999, pressure = -999, ctemp = -999,
+               icount1 = -999, probe3count1 = -999, probe4count1 = -999, icount2 = -999, probe3count2 = -999, probe4count2 = -999,
+               flags = 0, n = 0, n_T = 0):
+        """Pack one record into the buffer, flushing it if required.
+
+        Parameters
+        ----------
+        timestamp : int
+            Time of the reading (seconds since the board's epoch)
+        r1, r2, T, k, pressure, ctemp : float, optional
+            Resistances, temperature, conductivity, pressure and MS5803 temperature; -999 if not measured
+        icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2 : float, optional
+            Trimmed-mean raw counts returned by cond_sensor.measure(); -999 if not recorded
+        flags : int, optional
+            Bit field for tagging records, default 0
+        n : int, optional
+            Number of conductivity samples per polarity used for the reading, default 0 (not recorded)
+        n_T : int, optional
+            Number of thermistor readings used for the reading, default 0 (not recorded)
+        """
+        if self.count == self.capacity:
+            #buffer full and earlier flushes failed, so overwrite the oldest record
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+            self.dropped += 1
+        index = (self.start + self.count) % self.capacity
+        struct.pack_into(RECORD_FORMAT, self.buffer, index*RECORD_SIZE, int(timestamp), flags, n, n_T,
+                         r1, r2, T, k, pressure, ctemp,
+                         icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2)
+        self.count += 1
+        if self.count >= self.threshold:
+            self.flush()
+        elif self.low_battery is not None and self.low_battery():
+            self.flush()
+        elif self.usb_attached is not None and self.usb_attached():
+            self.flush()
+
+    def flush(self):
+        """Append all buffered records to the file in at most two writes.
+
+        Returns
+        -------
+        boolean
+            True if the records were written (or there were none), False if writing failed.
+            Records are kept in the buffer if writing fails.
+        """
+        if self.count == 0:
+            return True
+        mv = memoryview(self.buffer)
+        end = self.start + self.count
+        try:
+            f = open(self.fname, 'ab')
+            if end <= self.capacity:
+                f.write(mv[self.start*RECORD_SIZE:end*RECORD_SIZE])
+            else:
+                f.write(mv[self.start*RECORD_SIZE:])
+                f.write(mv[:(end - self.capacity)*RECORD_SIZE])
+            f.close()
+        except OSError:
+            return False
+        self.start = 0
+        self.count = 0
+        return True
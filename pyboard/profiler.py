@@ -0,0 +1,118 @@
+"""Per-phase timing of a logging cycle.
+
+The phase_timer class keeps the count, total, minimum and maximum time (from
+time.ticks_us) of each named phase of a logging cycle, e.g. the conductivity
+acquisition, the thermistor readings, the pressure conversions and the file write.
+Every few cycles, it appends one line per phase to a text file and starts again, so
+the file can be copied off the board and summarized with ``host/profile_summary.py``.
+
+Phases are recorded by passing the ticks_us value at the start of the phase to add():
+
+>>> start = time.ticks_us()
+>>> [pres, ctemp] = pressure.MS5803(i2c, pres_power, pres_gnd)
+>>> timer.add('pressure', start)
+
+The loggers only create a phase_timer when profiling is requested, and the drivers
+only call their phase_hook when one is set, so profiling costs nothing when it is off.
+"""
+import time
+
+#column names of the diagnostics file
+HEADER = 'time,cycles,phase,n,min_us,mean_us,max_us\r\n'
+
+class phase_timer:
+    """A class for accumulating the time spent in each phase of a logging cycle.
+
+    Parameters
+    ----------
+    fname : str, optional
+        Name of the text file that the statistics are appended to, default 'profileCTD.txt'.
+        A header is written if the file is new or empty.
+    every : int, optional
+        Number of cycles between lines written to fname, default 10.  If 0, nothing is
+        written and the statistics keep accumulating.
+
+    Attributes
+    ----------
+    stats : dict
+        [count, total, min, max] (microseconds) for each phase since the last write
+    cycles : int
+        Number of cycles since the last write
+
+    Example
+    -------
+    >>> import profiler
+    >>> timer = profiler.phase_timer('profileCTD.txt', 10)
+    >>> sensor.phase_hook = timer.add
+    >>> start = time.ticks_us()
+    >>> sensor.measure()
+    >>> timer.add('conductivity', start)
+    >>> timer.end_cycle()
+
+    """
+
+    def __init__(self, fname = 'profileCTD.txt', every = 10):
+        self.fname = fname
+        self.every = every
+        self.stats = {}
+        self.order = []
+        self.cycles = 0
+        if every:
+            try:
+                f = open(fname,'r')
+                empty = len(f.read(1)) == 0
+                f.close()
+            except OSError:
+                empty = True
+            if empty:
+                f = open(fname,'w')
+                f.write(HEADER)
+                f.close()
+
+    def add(self, name, start):
+        """Record a phase that started at time.ticks_us() value start and ends now."""
+        us = time.ticks_diff(time.ticks_us(), start)
+        s = self.stats.get(name)
+        if s is None:
+            self.stats[name] = [1, us, us, us]
+            self.order.append(name)
+        else:
+            s[0] += 1
+            s[1] += us
+            if us < s[2]:
+                s[2] = us
+            if us > s[3]:
+                s[3] = us
+
+    def lines(self):
+        """One text line per phase: time, cycles, phase, n, min, mean and max (us)."""
+        now = time.time()
+        lines = []
+        for name in self.order:
+            s = self.stats[name]
+            lines.append('%s,%s,%s,%s,%s,%s,%s\r\n' % (now, self.cycles, name, s[0], s[2], s[1]//s[0], s[3]))
+        return lines
+
+    def end_cycle(self):
+        """Count a cycle, and write and reset the statistics every `every` cycles.
+
+        Returns
+        -------
+        boolean
+            True if the statistics were written
+        """
+        self.cycles += 1
+        if not self.every or self.cycles < self.every:
+            return False
+        try:
+            f = open(self.fname,'a')
+            for line in self.lines():
+                f.write(line)
+            f.close()
+            written = True
+        except:
+            written = False
+        self.stats = {}
+        self.order = []
+        self.cycles = 0
+        return written
@@ -0,0 +1,91 @@
+"""Event-triggered logging interval.
+
+The event_scheduler class lets a logger sample slowly while readings are steady and
+switch to a fast rate when conductivity or pressure changes quickly, e.g. when a tidal
+salt front passes.  After the readings settle, the interval doubles every few cycles
+until it is back at the base interval.
+"""
+
+class event_scheduler:
+    """A class for choosing the next logging interval from the change between readings.
+
+    Parameters
+    ----------
+    base : int
+        Logging interval (seconds) while readings are steady
+    fast : int
+        Logging interval (seconds) after a change is detected
+    k_change : float, optional
+        Relative change in conductivity (or resistance) between cycles that starts a burst, default 0.02
+    pres_change : float, optional
+        Change in pressure (mbar) between cycles that starts a burst, default 5
+    hold : int, optional
+        Number of steady cycles at each interval before the interval is doubled, default 10
+
+    Attributes
+    ----------
+    interval : int
+        Current logging interval (seconds)
+    burst : boolean
+        True while the interval is shorter than the base interval
+
+    Example
+    -------
+    >>> import scheduler
+    >>> schedule = scheduler.event_scheduler(600, 30)
+    >>> interval = schedule.update(k, pres)
+    >>> tag = schedule.burst
+
+    """
+
+    def __init__(self, base, fast, k_change = 0.02, pres_change = 5, hold = 10):
+        self.base = base
+        self.fast = min(fast, base)
+        self.k_change = k_change
+        self.pres_change = pres_change
+        self.hold = hold
+        self.interval = base
+        self.burst = False
+        self.steady = 0
+        self.k = None
+        self.pres = None
+
+    def changed(self, k, pres):
+        """True if k or pres differs from the previous valid reading by more than the threshold."""
+        change = False
+        if k != -999 and self.k is not None and abs(k - self.k) > self.k_change*abs(self.k):
+            change = True
+        if pres != -999 and self.pres is not None and abs(pres - self.pres) > self.pres_change:
+            change = True
+        #failed readings (-999) are skipped, so the next one is compared with the last good one
+        if k != -999:
+            self.k = k
+        if pres != -999:
+            self.pres = pres
+        return change
+
+    def update(self, k, pres):
+        """Compare a new reading with the previous one and return the next interval.
+
+        Parameters
+        ----------
+        k : float
+            Conductivity, or any quantity proportional to it or to resistance; -999 if the reading failed
+        pres : float
+            Pressure (mbar); -999 if the reading failed
+
+        Returns
+        -------
+        int
+            Logging interval (seconds) until the next reading
+        """
+        if self.changed(k, pres):
+            self.interval = self.fast
+            self.steady = 0
+        elif self.interval < self.base:
+            self.steady += 1
+            if self.steady >= self.hold:
+                self.interval = min(2*self.interval, self.base)
+                self.steady = 0
+        self.burst = self.interval < self.base
+        return self.interval
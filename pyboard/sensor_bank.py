@@ -0,0 +1,242 @@
+"""Several four-pole conductivity probes measured in one interleaved sequence.
+
+Each probe is described by a conductivity4pole.cond_sensor, which holds its pins,
+ADCs, calibration and sample buffers.  Probes may have their own ADC channels or
+share them through an analog multiplexer, selected by a function passed to
+sensor_bank.
+
+Instead of measuring the probes one after another, sensor_bank excites them in
+turn within each cycle: every probe is read at normal polarity, then every probe at
+reverse polarity.  The off time of one probe is spent exciting the others, so it
+only sleeps for whatever is left of off after the other probes have been read.
+Only one probe is powered at a time, and each gets the same on time at both
+polarities.  The electrode pins of every other probe are left in high impedance
+(inputs) while a probe is excited, and are only made outputs around their own
+excitation, so an idle probe in the same water is not a return path for the current
+of the powered one, and the net charge on each stays balanced.  The pins are left as
+inputs after a measurement.
+
+Probes whose thermistor shares the electrode pins are read during the excitation.
+Probes with separate thermistor pins are read after the interleaved excitation, one
+after another with thermistor_ac.temperature() (T_n readings each, 400 by default),
+which takes longer than the conductivity readings for more than a few probes.
+"""
+import time
+import array as arr
+import board
+import robust_stats
+import thermistor_ac
+import conductivity4pole
+
+#values stored for each probe, in the order returned by cond_sensor.measure()
+FIELDS = ('r1', 'r2', 'T', 'k', 'icount1', 'probe3count1', 'probe4count1', 'icount2', 'probe3count2', 'probe4count2')
+
+def mux_select(pins):
+    """Return a select function that puts the probe index on multiplexer address pins.
+
+    Parameters
+    ----------
+    pins: list of :obj:'pyb.Pin'
+        Address pins, least significant bit first
+
+    Returns
+    -------
+    function
+        select(p), for sensor_bank
+    """
+    def select(p):
+        for bit in range(len(pins)):
+            pins[bit].value((p >> bit) & 1)
+    return select
+
+def drive(s):
+    """Make the electrode pins of sensor s outputs, both low."""
+    s.gpio1.init(board.OUT, value = 0)
+    s.gpio2.init(board.OUT, value = 0)
+
+def release(s):
+    """Put the electrode pins of sensor s in high impedance."""
+    s.gpio1.init(board.IN)
+    s.gpio2.init(board.IN)
+
+class sensor_bank:
+    """A class for measuring several four-pole probes with one interleaved excitation schedule.
+
+    Parameters
+    ----------
+    sensors : list of :obj:'conductivity4pole.cond_sensor'
+        One sensor per probe.  Sensors may share ADC objects if select routes the
+        probe's poles to them.
+    select : function, optional
+        Called as select(p) before probe p is excited, e.g. mux_select(pins).  Defaults
+        to none (each probe has its own ADC channels).
+    n : int, optional
+        Number of samples per polarity to allocate buffers for, default = 12
+
+    Attributes
+    ----------
+    results : :obj:'array.array'
+        Values in FIELDS for each probe, len(FIELDS) per probe, reused by every measurement
+    n_used : int
+        Number of samples per polarity of the last measurement
+
+    Example
+    -------
+    >>> probe1 = conductivity4pole.cond_sensor(Pin('X3', Pin.OUT_PP), Pin('X4', Pin.OUT_PP), ADC('X5'), ADC('X6'), ADC('X7'), ADC('X8'), 250, 20000, 1, 0)
+    >>> probe2 = conductivity4pole.cond_sensor(Pin('Y3', Pin.OUT_PP), Pin('Y4', Pin.OUT_PP), ADC('X5'), ADC('X6'), ADC('X7'), ADC('X8'), 250, 20000, 1, 0)
+    >>> bank = sensor_bank([probe1, probe2], mux_select([Pin('Y5', Pin.OUT_PP)]))
+    >>> bank.measure(n = 12, off = 200)
+    >>> [r1, r2, T, k] = bank.reading(1)[:4]
+
+    """
+
+    def __init__(self, sensors, select = None, n = 12):
+        self.sensors = sensors
+        self.select = select
+        self.results = arr.array('f', [0]*(len(sensors)*len(FIELDS)))
+        self.lows = [0]*len(sensors)
+        self.n_used = 0
+        for s in sensors:
+            release(s)
+            if n > s.size:
+                s.allocate(n)
+
+    def acquire(self, n, on = 0, off = 0):
+        """
+        Fill the count arrays of every sensor, interleaving the probes.
+
+        A probe whose thermistor is powered and grounded by its electrode pins is
+        read during the excitation, as in cond_sensor.acquire_combined().  Each
+        probe's pins are outputs only during its own excitation, see the module
+        docstring.
+
+        Parameters
+        ----------
+        n: int
+            Number of excitation cycles (samples per polarity)
+        on: int, optional
+            Time in microseconds that each probe is powered before it is read, default = 0
+        off: int, optional
+            Least time in microseconds between a probe's pin going low and its other pin
+            going high, default = 0
+        """
+        sensors = self.sensors
+        select = self.select
+        lows = self.lows
+        count = len(sensors)
+        shared = [s.adc4_therm is not None and s.therm_power is s.gpio1 and s.therm_ground is s.gpio2 for s in sensors]
+        for i in range(n):
+            #normal polarity on each probe in turn
+            for p in range(count):
+                s = sensors[p]
+                rest = off - time.ticks_diff(time.ticks_us(), lows[p])
+                if i > 0 and rest > 0:
+                    time.sleep_us(rest)
+                if select is not None:
+                    select(p)
+                drive(s)
+                s.gpio1.high()
+                time.sleep_us(on)
+                s.imeas1[i] = s.read_current()
+                s.p3meas1[i] = s.read_p3()
+                s.p4meas1[i] = s.read_p4()
+                if shared[p]:
+                    s.tmeas[i] = s.read_therm()
+                s.gpio1.low()
+                release(s)
+                lows[p] = time.ticks_us()
+
+            #reverse polarity, for the same time
+            for p in range(count):
+                s = sensors[p]
+                rest = off - time.ticks_diff(time.ticks_us(), lows[p])
+                if rest > 0:
+                    time.sleep_us(rest)
+                if select is not None:
+                    select(p)
+                drive(s)
+                s.gpio2.high()
+                time.sleep_us(on)
+                s.imeas2[i] = s.read_current()
+                s.p3meas2[i] = s.read_p3()
+                s.p4meas2[i] = s.read_p4()
+                if shared[p]:
+                    s.read_therm()
+                s.gpio2.low()
+                release(s)
+                lows[p] = time.ticks_us()
+
+    def measure(self, n = 12, on = 0, off = 0, T_n = 400, T_tol = None):
+        """
+        Measure every probe and store the results.
+
+        Temperature is the trimmed mean of the thermistor readings taken during the
+        excitation for probes whose thermistor shares the electrode pins, and is read
+        with thermistor_ac.temperature() (T_n readings) after the excitation, one probe
+        at a time, otherwise.
+
+        Parameters
+        ----------
+        n: int, optional
+            Number of samples per polarity for each probe, default = 12
+        on, off: int, optional
+            Times in microseconds, as for acquire()
+        T_n: int, optional
+            Number of thermistor readings for probes read separately, default = 400
+        T_tol: float, optional
+            Passed to thermistor_ac.temperature() as tol (degrees C), default none
+
+        Returns
+        -------
+        :obj:'array.array'
+            results; the values for probe p start at p*len(FIELDS)
+        """
+        for s in self.sensors:
+            if n > s.size:
+                s.allocate(n)
+        self.acquire(n, on, off)
+        self.n_used = n
+
+        results = self.results
+        width = len(FIELDS)
+        for p in range(len(self.sensors)):
+            s = self.sensors[p]
+            errors = conductivity4pole.compute_resistances(s.imeas1, s.p3meas1, s.p4meas1, s.imeas2, s.p3meas2, s.p4meas2,
+                                                           s.i1, s.i2, s.V1, s.V2, s.R1, s.R2, n, s.con_resistance)
+            if errors:
+                print('Error in resistance computation (probe %s, %s samples)' % (p, errors))
+            s.resistance1 = robust_stats.trimmed_mean(s.R1, n)
+            s.resistance2 = robust_stats.trimmed_mean(s.R2, n)
+            if s.adc4_therm is None:
+                s.T = -999
+                s.n_T = 0
+            elif s.therm_power is s.gpio1 and s.therm_ground is s.gpio2:
+                table = thermistor_ac.get_table(s.therm_resistance)
+                scale = 1 << board.SHIFT
+                for i in range(n):
+                    s.Tmeas[i] = thermistor_ac.lookup(table, s.tmeas[i], scale)
+                s.T = robust_stats.trimmed_mean(s.Tmeas, n)
+                s.n_T = n
+            else:
+                s.T = thermistor_ac.temperature(s.adc4_therm, s.therm_power, s.therm_ground, s.therm_resistance, T_n, tol = T_tol)
+                s.n_T = thermistor_ac.n_used
+            s.k = s.conductivity((s.resistance1 + s.resistance2)/2, s.cell_const, s.b)
+            s.n_used = n
+
+            j = p*width
+            results[j] = s.resistance1
+            results[j+1] = s.resistance2
+            results[j+2] = s.T
+            results[j+3] = s.k
+            results[j+4] = robust_stats.trimmed_mean(s.imeas1, n)
+            results[j+5] = robust_stats.trimmed_mean(s.p3meas1, n)
+            results[j+6] = robust_stats.trimmed_mean(s.p4meas1, n)
+            results[j+7] = robust_stats.trimmed_mean(s.imeas2, n)
+            results[j+8] = robust_stats.trimmed_mean(s.p3meas2, n)
+            results[j+9] = robust_stats.trimmed_mean(s.p4meas2, n)
+        return results
+
+    def reading(self, p):
+        """Values in FIELDS for probe p from the last measurement, as a tuple."""
+        width = len(FIELDS)
+        return tuple(self.results[p*width:(p+1)*width])
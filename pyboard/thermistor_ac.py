@@ -5,13 +5,111 @@ polarization in other parts of the circuit (e.g., when connected in parallel wit
 Parameters in the code are for a `Littlefuse PS103J2 
 <https://www.littelfuse.com/~/media/electronics/datasheets/leaded_thermistors/littelfuse_leaded_thermistors_interchangeable_thermistors_standard_precision_ps_datasheet.pdf.pdf>`_ 
 thermistor.
+
+Conversion from ADC count to temperature uses a lookup table with one entry per 12-bit
+count by default (see :func:`get_table`), which replaces the two logarithms and the cube
+computed for every sample with an index and a linear interpolation (see :func:`lookup`).
+
+ADC reads go through board.py, so the module also runs on the Raspberry Pi Pico; counts
+from boards with more than 12 bits are interpolated between the 12-bit table entries.
 """
 import math
 import array as arr
 import time
-from pyb import Pin, ADC
+import board
+import robust_stats
+
+#Steinhart-Hart coefficients for the PS103J2
+A = 0.001125308852122
+B = 0.000234711863267
+C = 0.000000085663516
+
+#lookup tables already built, keyed by (R, A, B, C)
+tables = {}
+
+#number of readings used by the last call to temperature()
+n_used = 0
+
+def count_to_temperature(count, R = 20000, A = A, B = B, C = C):
+    """Convert a 12-bit ADC count to temperature using the Steinhart-Hart equation.
+
+        Parameters
+        ----------
+        count: int
+            ADC count (0-4095) read between the fixed resistor and the thermistor
+        R: float, optional
+            Value of the fixed resistor in the resistor divider. Default is 20,000 ohm
+        A, B, C: float, optional
+            Steinhart-Hart coefficients. Default to values for the PS103J2
+
+        Returns
+        -------
+        Float
+            Temperature (Celsius degrees), clamped to 150 at a count of 0 and -55 at full scale
+    """
+    if count>0:
+        if count < 4095:
+            R_t = ((count/4095)*R)/(1-count/4095)
+            return 1/((A+B*(math.log(R_t)))+C*((math.log(R_t))**3))-273.15
+        else:
+            return -55
+    else:
+        return 150
+
+def get_table(R = 20000, A = A, B = B, C = C):
+    """Return a 4096-entry count-to-temperature lookup table, building it on first use.
+
+        The table is built once for each combination of resistor and coefficients
+        and kept for later calls.  It holds 16 kB of single precision floats.
+
+        Parameters
+        ----------
+        R: float, optional
+            Value of the fixed resistor in the resistor divider. Default is 20,000 ohm
+        A, B, C: float, optional
+            Steinhart-Hart coefficients. Default to values for the PS103J2
+
+        Returns
+        -------
+        :obj:'array.array'
+            Temperature (Celsius degrees) indexed by ADC count
+    """
+    key = (R, A, B, C)
+    table = tables.get(key)
+    if table is None:
+        table = arr.array('f',[0]*4096)
+        for count in range(4096):
+            table[count] = count_to_temperature(count, R, A, B, C)
+        tables[key] = table
+    return table
+
+def lookup(table, count, scale = 1):
+    """Look up temperature for an oversampled count, interpolating between table entries.
+
+        Parameters
+        ----------
+        table: :obj:'array.array'
+            Table returned by get_table()
+        count: int or float
+            Reading in units of 1/scale of a 12-bit count, e.g. the sum of scale readings
+            or a 16-bit reading with scale = 16
+        scale: int, optional
+            Number of oversampled units per 12-bit count. Default is 1.
+
+        Returns
+        -------
+        Float
+            Temperature (Celsius degrees)
+    """
+    i = int(count//scale)
+    if i >= 4095:
+        return table[4095]
+    if i < 0:
+        return table[0]
+    frac = (count - i*scale)/scale
+    return table[i] + frac*(table[i+1] - table[i])
 
-def temperature(analog_pin, power_pin = None, ground_pin = None, R = 20000, n = 100):    
+def temperature(analog_pin, power_pin = None, ground_pin = None, R = 20000, n = 100, lut = True, tol = None, n_min = 20):    
     """Function for computing thermister temperature
 
         Parameters
@@ -30,21 +128,36 @@ def temperature(analog_pin, power_pin = None, ground_pin = None, R = 20000, n =
             Value of the fixed resistor in the resistor divider. Default is 20,000 ohm
         n: int, optional
             Number of readings to make--returns average of middle two quartiles. Defaults to 100.
+        lut: boolean, optional
+            If true, convert counts using the lookup table from get_table() and lookup().
+            If false, compute the Steinhart-Hart equation for each reading.  Defaults to true.
+        tol: float, optional
+            If given, stop taking readings once the standard error of the mean temperature,
+            estimated from the running standard deviation, is at most tol (degrees C).
+            n is then the maximum number of readings.  Defaults to none (always n readings).
+        n_min: int, optional
+            Minimum number of readings when tol is given (at least 2). Defaults to 20.
 
         Returns
         -------
         Float
             Temperature (Celsius degrees) 
+
+        Note
+        ----
+        The number of readings used is stored in the module variable n_used.
                 
     """
+    global n_used
     
-    #Define constants for conversion
-    A = 0.001125308852122
-    B = 0.000234711863267
-    C = 0.000000085663516
+    #Build or fetch the lookup table before sampling starts
+    if lut:
+        table = get_table(R)
 
     #Allocate array for storing temperature readings
     T = arr.array('f',[0]*n)
+    read = board.reader(analog_pin)
+    scale = 1 << board.SHIFT
 
     #Turn on the power if necessary, then wait a moment
     if power_pin is not None: power_pin.off()
@@ -54,6 +167,12 @@ def temperature(analog_pin, power_pin = None, ground_pin = None, R = 20000, n =
     if ground_pin is not None: ground_pin.off()
     time.sleep_ms(1)
 
+    #Running mean and sum of squared deviations (Welford), for stopping early
+    mean = 0.0
+    m2 = 0.0
+    m = n
+    n_min = max(n_min, 2)
+
     #Loop through readings, computing thermistor resistance
     #and temperature, then storing in array
     for i in range(n):
@@ -64,7 +183,7 @@ def temperature(analog_pin, power_pin = None, ground_pin = None, R = 20000, n =
             power_pin.on()
             ontick = time.ticks_us()
             time.sleep_us(1000)
-            count = analog_pin.read()
+            count = read()
             power_pin.off()
             offtick = time.ticks_us()
             time_on = time.ticks_diff(offtick, ontick)
@@ -75,21 +194,27 @@ def temperature(analog_pin, power_pin = None, ground_pin = None, R = 20000, n =
                 ground_pin.off()
             
         #calculate resistance and temperature, being careful not to cause an overload 
-        if count>0:
-            if count < 4095:
-                R_t = ((count/4095)*R)/(1-count/4095)
-                T[i] = 1/((A+B*(math.log(R_t)))+C*((math.log(R_t))**3))-273.15
+        if lut:
+            if scale == 1:
+                T[i] = table[count]
             else:
-                T[i] = -55
+                T[i] = lookup(table, count, scale)
         else:
-            T[i] =150
+            T[i] = count_to_temperature(count/scale, R)
+        
+        #stop once the standard error is within tolerance
+        if tol is not None:
+            d = T[i] - mean
+            mean += d/(i + 1)
+            m2 += d*(T[i] - mean)
+            if i + 1 >= n_min and math.sqrt(m2/i/(i + 1)) <= tol:
+                m = i + 1
+                break
     #Turn the power back off if possible
     if power_pin is not None: power_pin.off()
+    n_used = m
 
     #Define and analyze the middle two quartiles
-    upper_index = math.ceil(3*n/4)
-    lower_index = math.floor(n/4)
-    sampled_length = (upper_index - lower_index)
-    T_mean_of_mid_quartiles = sum(sorted(T)[lower_index:upper_index])/sampled_length
+    T_mean_of_mid_quartiles = robust_stats.trimmed_mean(T, m)
 
     return T_mean_of_mid_quartiles
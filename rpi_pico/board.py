@@ -0,0 +1,187 @@
+"""Board-specific constants and ADC paths for the Raspberry Pi Pico (RP2040).
+
+conductivity4pole.py and thermistor_ac.py import board instead of pyb or machine, so
+the same files run on the pyboard and the Pico; each board's folder has its own
+board.py with the same names.
+
+timed_burst() generates the excitation with a PIO state machine and captures the ADC
+in round-robin mode through DMA, so the sample timing does not depend on the
+interpreter.  It needs a MicroPython version with rp2.DMA (v1.21 or later).
+"""
+import time
+import array as arr
+import machine
+from machine import Pin, ADC
+try:
+    import rp2    #only needed by timed_burst()
+except ImportError:
+    rp2 = None
+
+NAME = 'pico'
+#ADC.read_u16() returns counts scaled to 16 bits (the RP2040 converter has 12)
+BITS = 16
+FULL_SCALE = 65535
+VREF = 3.3
+#right shift from a count to the 12-bit count used to index the thermistor lookup table
+SHIFT = BITS - 12
+#push-pull output mode for the excitation pins
+OUT = Pin.OUT
+#input mode, leaving an excitation pin in high impedance
+IN = Pin.IN
+#True if timed_burst() is available
+TIMED = rp2 is not None and hasattr(rp2, 'DMA')
+
+#ADC input (AIN) of the current, pole 3 and pole 4 channels passed to timed_burst(),
+#i.e. GPIO 28, 26 and 27 as wired in logger_ctd_nothermistor_pico.py
+CHANNELS = (2, 0, 1)
+#round-robin sets of conversions per half-cycle; only the last, most settled, one is kept
+SETS = 2
+#ADC registers and DMA request number (RP2040 datasheet, section 4.9)
+ADC_BASE = 0x4004c000
+ADC_CS = ADC_BASE
+ADC_FCS = ADC_BASE + 0x08
+ADC_FIFO = ADC_BASE + 0x0c
+ADC_DIV = ADC_BASE + 0x10
+ADC_CLOCK = 48000000
+DREQ_ADC = 36
+
+#raw round-robin samples, kept between bursts and only grown when needed
+raw = arr.array('H')
+
+def reader(adc):
+    """Function returning one count from adc, i.e. the bound method ADC.read_u16."""
+    return adc.read_u16
+
+if rp2 is not None:
+    @rp2.asm_pio(set_init = (rp2.PIO.OUT_LOW, rp2.PIO.OUT_LOW))
+    def excitation():
+        #high count in y; low count stays in osr, which mov reads without consuming
+        pull(block)
+        mov(y, osr)
+        pull(block)
+        wrap_target()
+        set(pins, 1)
+        mov(x, y)
+        label('high1')
+        jmp(x_dec, 'high1')
+        set(pins, 0)
+        mov(x, osr)
+        label('low1')
+        jmp(x_dec, 'low1')
+        set(pins, 2)
+        mov(x, y)
+        label('high2')
+        jmp(x_dec, 'high2')
+        set(pins, 0)
+        mov(x, osr)
+        label('low2')
+        jmp(x_dec, 'low2')
+        wrap()
+
+def timed_burst(gpio1, gpio2, adcs, bufs, freq, duty, timer = 2, ch1 = None, ch2 = None):
+    """
+    Excite gpio1 and gpio2 from a PIO state machine while DMA captures the ADC in round robin.
+
+    The state machine powers gpio1, then gpio2, for duty percent of each half-cycle.
+    The ADC converts its inputs in turn, paced by its clock divider so that SETS
+    round-robin sets fit in each half-cycle, and DMA moves the results from the ADC
+    FIFO into a preallocated buffer.  The half-cycle length of the state machine is
+    computed from the ADC period actually set, so the two stay in step for the whole
+    burst, and the last set of each half-cycle is copied into bufs, scaled to 16 bits
+    as by read_u16().
+
+    Parameters
+    ----------
+    gpio1, gpio2: :obj:'machine.Pin'
+        Excitation pins; gpio2 must be the GPIO after gpio1 (e.g. 19 and 20)
+    adcs: tuple of :obj:'machine.ADC'
+        Current, pole 3 and pole 4 channels, on the inputs listed in CHANNELS
+    bufs: tuple of :obj:'array.array' or memoryview
+        One 16-bit buffer per channel, filled with alternating polarities
+    freq: int
+        Half-cycles per second, up to about 80000
+    duty: int
+        Percent of each half-cycle that the power pin is on, up to 50
+    timer: int, optional
+        PIO state machine id (0-7), default 2
+    ch1, ch2: optional
+        Not used on the Pico
+
+    Returns
+    -------
+    ok: boolean
+        False if the ADC FIFO overflowed or the DMA did not finish
+    elapsed: int
+        Time (us) taken by the burst
+    """
+    if not TIMED:
+        raise OSError('timed burst acquisition needs rp2.DMA (MicroPython v1.21 or later)')
+    if len(adcs) > len(CHANNELS):
+        raise ValueError('timed burst reads %s channels on the pico' % len(CHANNELS))
+    global raw
+    halves = len(bufs[0])
+    count = len(CHANNELS)*SETS*halves
+    if len(raw) < count:
+        raw = arr.array('H', [0]*count)
+
+    #ADC period in ADC clock cycles (at least 96), in 1/256 steps
+    div = max(int(ADC_CLOCK*256/(freq*len(CHANNELS)*SETS)) - 256, 95*256)
+    period = 1 + div/256
+    #state machine cycles per half-cycle, split into high and low times (3 cycles of overhead each)
+    half = round(machine.freq()*len(CHANNELS)*SETS*period/ADC_CLOCK)
+    low = max(half - half*min(duty, 50)//50, 3)
+    high = half - low
+
+    mask = 0
+    for ch in CHANNELS:
+        mask |= 1 << ch
+    machine.mem32[ADC_CS] = 1                     #EN, stop any free-running conversions
+    while not machine.mem32[ADC_CS] & (1 << 8):   #READY
+        pass
+    while not machine.mem32[ADC_FCS] & (1 << 8):  #drain the FIFO until EMPTY
+        machine.mem32[ADC_FIFO]
+    machine.mem32[ADC_DIV] = div
+    machine.mem32[ADC_FCS] = 1 | (1 << 3) | (1 << 24) | (3 << 10)   #EN, DREQ_EN, THRESH = 1, clear UNDER/OVER
+
+    sm = rp2.StateMachine(timer, excitation, set_base = gpio1)
+    sm.put(high - 3)
+    sm.put(low - 3)
+    dma = rp2.DMA()
+    ctrl = dma.pack_ctrl(size = 1, inc_read = False, inc_write = True, treq_sel = DREQ_ADC)
+    dma.config(read = ADC_FIFO, write = raw, count = count, ctrl = ctrl, trigger = True)
+
+    #start the conversions (round robin from the first channel) and the excitation together
+    starttime = time.ticks_us()
+    machine.mem32[ADC_CS] = 1 | (1 << 3) | (CHANNELS[0] << 12) | (mask << 16)
+    sm.active(1)
+    timeout = 2*halves*1000000//freq + 10000
+    while dma.active() and time.ticks_diff(time.ticks_us(), starttime) < timeout:
+        pass
+    endtime = time.ticks_us()
+    ok = not dma.active()
+
+    machine.mem32[ADC_CS] = 1
+    sm.active(0)
+    dma.close()
+    ok = ok and not machine.mem32[ADC_FCS] & (1 << 11)   #OVER
+    machine.mem32[ADC_FCS] = 0
+    while not machine.mem32[ADC_CS] & (1 << 8):
+        pass
+    machine.mem32[ADC_DIV] = 0
+
+    #return power pins to plain outputs, both low
+    gpio1.init(OUT)
+    gpio2.init(OUT)
+    gpio1.low()
+    gpio2.low()
+
+    #keep the last set of each half-cycle; channel j of adcs is at position j in the set
+    width = len(CHANNELS)
+    for j in range(len(bufs)):
+        buf = bufs[j]
+        k = (SETS - 1)*width + j
+        for i in range(halves):
+            x = raw[k]
+            buf[i] = (x << 4) | (x >> 8)
+            k += SETS*width
+    return ok, time.ticks_diff(endtime, starttime)
@@ -0,0 +1,158 @@
+"""Calibration models from cell resistance to conductivity.
+
+cond_sensor.conductivity() applies k = 1/(cell_const*R) + b.  The validation study
+found power laws fit the probes better over a wide range (see
+ValidationStudy/CalibrationDataAndCode/graph_calibration_2021.py), e.g. the
+deployment scripts use k = 0.625*(1000/R)**0.889 - 8.69.  A cal_model holds one of
+these equations, written in terms of the conductance x = scale/R:
+
+==============  ===========================
+model           equation
+==============  ===========================
+'linear'        k = a*x + c
+'power'         k = a*x**b
+'offset_power'  k = a*x**b + c
+'log_linear'    ln(k) = b*ln(x) + a
+==============  ===========================
+
+The linear model with scale 1 is the equation of cond_sensor.conductivity(), with
+a = 1/cell_const and c = b, and 'log_linear' is the power law fitted by linear
+regression of the logarithms.  Note that graph_calibration_2021.py fits 1/R against the
+conductivity of the standards, so its coefficients describe the inverse equation.
+
+Every model is reduced once, when it is created, to k = coef*R**exponent + offset, so
+evaluating it costs one power, or one division for the linear model (exponent -1).
+
+Models can be saved to and loaded from a small JSON file on the board, e.g.
+calCTD.json::
+
+    {"model": "offset_power", "a": 0.625, "b": 0.889, "c": -8.69, "scale": 1000}
+"""
+import math
+try:
+    import json
+except ImportError:
+    import ujson as json
+
+MODELS = ('linear', 'power', 'offset_power', 'log_linear')
+
+class cal_model:
+    """A class for converting cell resistance to calibrated conductivity.
+
+    Parameters
+    ----------
+    model : str, optional
+        One of MODELS, default 'linear'
+    a, b, c : float, optional
+        Coefficients of the model, see the module docstring.  Defaults 1, 1 and 0.
+    scale : float, optional
+        Conductance is x = scale/R, e.g. 1000 for R in ohms and x in mS.  Default 1
+
+    Attributes
+    ----------
+    coef, exponent, offset : float
+        k = coef*R**exponent + offset
+
+    Example
+    -------
+    >>> import cal_model
+    >>> model = cal_model.cal_model('offset_power', 0.625, 0.889, -8.69, 1000)
+    >>> model.conductivity(450)
+    >>> model.save('calCTD.json')
+    >>> sensor = conductivity4pole.cond_sensor(gpio1,gpio2,adc1,adc2,adc3_current,adc4_therm,250,20000,1,0,model = cal_model.load('calCTD.json'))
+
+    """
+
+    def __init__(self, model = 'linear', a = 1, b = 1, c = 0, scale = 1):
+        if model not in MODELS:
+            raise ValueError('unknown calibration model %s, expected one of %s' % (model, MODELS))
+        self.model = model
+        self.a = a
+        self.b = b
+        self.c = c
+        self.scale = scale
+        if model == 'linear':
+            self.coef = a*scale
+            self.exponent = -1
+            self.offset = c
+        elif model == 'log_linear':
+            self.coef = math.exp(a)*scale**b
+            self.exponent = -b
+            self.offset = 0
+        else:
+            self.coef = a*scale**b
+            self.exponent = -b
+            self.offset = c if model == 'offset_power' else 0
+
+    def conductivity(self, R):
+        """Calibrated conductivity for resistance R (ohms), or -999 if R is not positive."""
+        if R <= 0:
+            return -999
+        if self.exponent == -1:
+            return self.coef/R + self.offset
+        return self.coef*R**self.exponent + self.offset
+
+    def conductivity_batch(self, R, out, n = None):
+        """
+        Fill out with the calibrated conductivity of each resistance.
+
+        Parameters
+        ----------
+        R: :obj:'array.array' or list
+            Resistance (ohms)
+        out: :obj:'array.array'
+            Conductivity; may be R
+        n: int, optional
+            Number of values, default len(out)
+
+        Returns
+        -------
+        :obj:'array.array'
+            out
+        """
+        if n is None:
+            n = len(out)
+        coef = self.coef
+        exponent = self.exponent
+        offset = self.offset
+        for i in range(n):
+            r = R[i]
+            if r <= 0:
+                out[i] = -999
+            elif exponent == -1:
+                out[i] = coef/r + offset
+            else:
+                out[i] = coef*r**exponent + offset
+        return out
+
+    def config(self):
+        """Dictionary of the model name and coefficients, as saved by save()."""
+        return {'model': self.model, 'a': self.a, 'b': self.b, 'c': self.c, 'scale': self.scale}
+
+    def save(self, fname = 'calCTD.json'):
+        """Write the model to a JSON file."""
+        f = open(fname,'w')
+        f.write(json.dumps(self.config()))
+        f.close()
+
+def load(fname = 'calCTD.json'):
+    """Read a model saved by cal_model.save().
+
+    Parameters
+    ----------
+    fname: str, optional
+        Name of the JSON file, default 'calCTD.json'
+
+    Returns
+    -------
+    :obj:'cal_model' or None
+        None if the file does not exist
+    """
+    try:
+        f = open(fname,'r')
+    except OSError:
+        return None
+    config = json.loads(f.read())
+    f.close()
+    return cal_model(config.get('model', 'linear'), config.get('a', 1), config.get('b', 1),
+                     config.get('c', 0), config.get('scale', 1))
@@ -0,0 +1,109 @@
+"""Raw waveform capture of a conductivity measurement to a binary file.
+
+measure(printflag = True) prints ten formatted values per sample over serial, which is
+slow and stretches the very timing it is meant to show.  capture() instead runs one
+acquisition with cond_sensor.acquire() or cond_sensor.burst() and appends the six raw
+count arrays and a time for every reading to a binary file, written straight from the
+arrays with no formatting.  The host-side module ``host/waveform.py`` memory-maps these
+files into NumPy.
+
+Each file starts with an 8-byte header (magic ``CTDW``, format version and the epoch
+year of the board's clock).  Each capture is a block: BLOCK_FORMAT (time (s), achieved
+half-cycles per second, samples per polarity n, flags, ADC bits and the size of an
+integer), then the count arrays imeas1, p3meas1, p4meas1, imeas2, p3meas2 and p4meas2
+(n signed integers each, 4 bytes on the boards), then 2n integer times (us since the
+first reading), alternating normal and reverse polarity.  The times are read with
+time.ticks_us() after each set of readings; for a burst (FLAG_BURST) they are
+computed from the achieved rate instead.
+"""
+import struct
+import time
+import array as arr
+try:
+    import board    #not needed by host/waveform.py, which only uses the constants
+except ImportError:
+    board = None
+
+MAGIC = b'CTDW'
+VERSION = 1
+HEADER_FORMAT = '<4sHH'
+#time (s), half-cycles per second, samples per polarity, flags, ADC bits, bytes per integer
+BLOCK_FORMAT = '<IfHHHH'
+#size of the 'l' array items written
+ITEM_SIZE = struct.calcsize('l')
+#bits of the flags field
+FLAG_BURST = 1    #timer-paced burst; times computed from the rate
+
+#times of the last capture, kept between captures and only grown when needed
+stamps = arr.array('l')
+
+def write_header(fname):
+    """Write the file header if the file does not exist yet or is empty."""
+    try:
+        f = open(fname, 'rb')
+        empty = len(f.read(1)) == 0
+        f.close()
+    except OSError:
+        empty = True
+    if empty:
+        f = open(fname, 'wb')
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, time.gmtime(0)[0]))
+        f.close()
+
+def capture(sensor, fname = 'waveCTD.bin', n = 200, on1 = 0, off1 = 0, on2 = 0, off2 = 0, burst = False, freq = 2000, duty = 50):
+    """
+    Acquire n samples per polarity and append the raw counts and times to fname.
+
+    Nothing is computed or printed during the acquisition, so its timing is the same
+    as in measure(), apart from one time.ticks_us() call per polarity.
+
+    Parameters
+    ----------
+    sensor: :obj:'conductivity4pole.cond_sensor'
+        Sensor to read
+    fname: str, optional
+        Name of the binary file, default 'waveCTD.bin'
+    n: int, optional
+        Number of samples per polarity, default 200
+    on1, off1, on2, off2: int, optional
+        Times in microseconds, as for cond_sensor.measure()
+    burst: boolean, optional
+        If true, use cond_sensor.burst() at freq and duty instead of acquire(). Default false
+    freq, duty: int, optional
+        As for cond_sensor.burst(), default 2000 and 50
+
+    Returns
+    -------
+    float
+        Achieved half-cycles per second
+    """
+    global stamps
+    if n > sensor.size:
+        sensor.allocate(n)
+    if len(stamps) < 2*n:
+        stamps = arr.array('l', [0]*(2*n))
+    timestamp = time.time()
+    if burst:
+        rate = sensor.burst(sensor.imeas1, sensor.p3meas1, sensor.p4meas1, sensor.imeas2, sensor.p3meas2, sensor.p4meas2,
+                            n, freq, duty)
+        for i in range(2*n):
+            stamps[i] = int(i*1000000/rate)
+        flags = FLAG_BURST
+    else:
+        starttime = time.ticks_us()
+        sensor.acquire(n, on1, off1, on2, off2, stamps = stamps)
+        rate = 2*n/time.ticks_diff(time.ticks_us(), starttime)*1000000
+        #ticks to microseconds since the first reading, outside the timed loop
+        first = stamps[0]
+        for i in range(2*n):
+            stamps[i] = time.ticks_diff(stamps[i], first)
+        flags = 0
+
+    write_header(fname)
+    f = open(fname, 'ab')
+    f.write(struct.pack(BLOCK_FORMAT, timestamp, rate, n, flags, board.BITS, ITEM_SIZE))
+    for counts in (sensor.imeas1, sensor.p3meas1, sensor.p4meas1, sensor.imeas2, sensor.p3meas2, sensor.p4meas2):
+        f.write(memoryview(counts)[:n])
+    f.write(memoryview(stamps)[:2*n])
+    f.close()
+    return rate
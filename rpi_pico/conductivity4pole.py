@@ -0,0 +1,741 @@
+"""A four-pole conductivity sensor containing a thermistor.
+
+The same file runs on the pyboard and the Raspberry Pi Pico.  The ADC read method,
+full-scale count and timed acquisition come from board.py, which differs between
+the pyboard and rpi_pico folders.
+"""
+
+import board
+import time
+import math
+import gc
+import micropython
+import array as arr
+import robust_stats
+import thermistor_ac
+import derived
+
+#count at the ADC reference voltage, and the reference voltage, of this board
+FULL_SCALE = board.FULL_SCALE
+VREF = board.VREF
+
+@micropython.native
+def compute_resistances(imeas1, p3meas1, p4meas1, imeas2, p3meas2, p4meas2, i1, i2, V1, V2, R1, R2, n, con_resistance):
+    """Convert n samples of counts to current, voltage drop and resistance, in place.
+
+    Compiled with the native code emitter and writes into the arrays passed in,
+    so that no intermediate arrays are created for each measurement.  A resistance
+    of -999999 is stored for samples with zero current.
+
+    Returns
+    -------
+    int
+        Number of samples for which resistance could not be computed
+    """
+    errors = 0
+    scale = VREF/FULL_SCALE
+    for i in range(n):
+        i1[i] = imeas1[i] * scale / con_resistance 
+        i2[i] = (VREF - imeas2[i] * scale) / con_resistance
+        V1[i] = (p3meas1[i] - p4meas1[i]) * scale
+        V2[i] = (p4meas2[i] - p3meas2[i]) * scale
+        if i1[i] != 0 and i2[i] != 0:
+            R1[i] = V1[i]/i1[i]
+            R2[i] = V2[i]/i2[i]
+        else:
+            R1[i] = -999999
+            R2[i] = -999999
+            errors += 1
+    return errors
+
+#number of excitation cycles between checks of the standard error in adaptive mode
+STEP = 4
+
+@micropython.native
+def spread(R1, R2, n):
+    """Sample standard deviation of (R1 + R2)/2 over the first n samples (n >= 2)."""
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        x = (R1[i] + R2[i])/2
+        d = x - mean
+        mean += d/(i + 1)
+        m2 += d*(x - mean)
+    return math.sqrt(m2/(n - 1))
+
+class cond_sensor:
+    """A class for interacting with a four-pole conductivity sensor and thermistor.
+
+    Performs measurement using the analog to digial converter
+    to read values of voltage drop across the two inner electrodes 
+    (when excited by a square wave applied to two outer electrodes) 
+    and to read values from the thermistor.  Also includes methods for
+    converting readings to physical values, based on calibration
+    parameters specified when instantiated. 
+    
+    Parameters
+    ----------
+    gpio1 : :obj:'pyb.Pin(pinid, Pin.OUT_PP)' or :obj:'machine.Pin(pinid, Pin.OUT)'
+        Power/ground pin connected directly to current balancing resistor R1
+    gpio2 : :obj:'pyb.Pin(pinid, Pin.OUT_PP)' or :obj:'machine.Pin(pinid, Pin.OUT)'
+        Power/ground pin connected to current measuring resistor R1
+    adc1 : :obj:'pyb.ADC(pinid)' or :obj:'machine.ADC(pinid)'
+        ADC pin connected to pole 3 (sensing pole farthest from current measuring resistor)
+    adc2 : :obj:'pyb.ADC(pinid)' or :obj:'machine.ADC(pinid)'
+        ADC pin connected to pole 4 (sensing pole closest to current measuring resistor)
+    adc3_current : :obj:'pyb.ADC(pinid)' or :obj:'machine.ADC(pinid)'
+        ADC pin connected between conductivity resistor and conductivity electrode
+    adc4_therm : :obj:'pyb.ADC(pinid)' or :obj:'machine.ADC(pinid)'
+        ADC pin connected between thermistor resistor and thermistor, or None if there
+        is no thermistor (temperature is then -999)
+    con_resistance: float
+        Resistance (ohm) of current measuring resistor 
+    therm_resistance : float
+        Resistance in measurement circuit for 10KOhm Thermistor
+    cell_const : float
+        Cell constant (1/cm) of conductivity probe (found by calibration)
+    b : float
+        Intercept in linear calibration equation
+    therm_power : obj:'pyb.Pin(pinid, Pin.OUT_PP'), optional
+        Power pin used to power thermistor.  Defaults to none (power from 3.3V).
+    therm_ground : :obj:'pyb.Pin(pinid, Pin.OUT_PP'), optional
+        Ground pin used to ground thermistor.  Defaults to none (directly wired to ground).
+    n : int, optional
+        Number of samples per polarity to allocate buffers for, default = 12
+    stats_hook : function, optional
+        Called at the end of each measurement as stats_hook(mem_before, mem_after, n), with the
+        heap in use (bytes, from gc.mem_alloc) before and after the measurement.  Defaults to none.
+    phase_hook : function, optional
+        Called during each measurement as phase_hook(name, start), with start the
+        time.ticks_us() value at the start of each phase ('acquire', 'compute' and 'thermistor'), e.g.
+        profiler.phase_timer.add.  Defaults to none.
+    model : :obj:'cal_model.cal_model', optional
+        Calibration model used by conductivity() instead of cell_const and b, e.g.
+        cal_model.load('calCTD.json').  Defaults to none (linear calibration).
+        
+    Attributes
+    ----------     
+    resistance1 : float
+        Apparent resistance computed from count1 
+    resistance2 : float
+        Apparent resistance computed from count2
+    T : float
+        Temperature (degrees C)
+    k : float
+        Conductivity (uS/cm)
+    S : float
+        Salinity
+    n_used : int
+        Number of samples per polarity used by the last measurement
+    n_T : int
+        Number of thermistor readings used by the last measurement
+    sample_rate : float
+        Achieved half-cycles per second of the last burst measurement
+    burst_ok : boolean
+        False if the last burst measurement could not keep up with the requested rate
+    
+    Example
+    -------
+    >>> gpio1 = Pin('X3', Pin.OUT_PP)
+    >>> gpio2 = Pin('X4', Pin.OUT_PP)
+    >>> t_1 = gpio1  #may be same pin as connected to charged electrode
+    >>> t_2 = gpio2  #may be same pin as connected to charged electrode
+    >>> adc1 = ADC('X5')
+    >>> adc2 = ADC('X6')
+    >>> adc3_current = ADC('X7')
+    >>> adc4_therm = ADC('X8')
+    >>> res = 250
+    >>> cell_const = 1
+    >>> b = 0
+    >>> tres = 20000
+    >>> Sensor1 = cond_sensor(gpio1,gpio2,adc1,adc2,adc3_current,adc4_therm,res,tres,cell_const,b,t_1,t_2)
+    >>> Sensor1.calibrate()
+    >>> #run external calibration to get cell constant and b
+    >>> cell_const = 1 #enter correct values here
+    >>> b = 0
+    >>> Sensor1.measure()
+
+    On the Pico, with no thermistor connected (machine.Pin and machine.ADC):
+
+    >>> Sensor2 = cond_sensor(Pin(19, Pin.OUT), Pin(20, Pin.OUT), ADC(26), ADC(27), ADC(28), None, 250, 20000, 1, 0)
+
+    """
+    
+        
+    def __init__(self,gpio1,gpio2,adc1,adc2,adc3_current,adc4_therm,con_resistance,therm_resistance,cell_const,b,therm_power = None,therm_ground = None,n = 12,stats_hook = None,phase_hook = None,model = None):
+        
+        self.gpio1 = gpio1
+        self.gpio2 = gpio2
+        self.gpio1.low()
+        self.gpio2.low()
+        self.adc1 = adc1
+        self.adc2 = adc2
+        self.adc3_current = adc3_current
+        self.adc4_therm = adc4_therm
+        self.con_resistance = con_resistance
+        self.therm_resistance = therm_resistance
+        self.cell_const = cell_const
+        self.b = b
+        self.therm_power = therm_power
+        self.therm_ground = therm_ground
+        self.stats_hook = stats_hook
+        self.phase_hook = phase_hook
+        self.model = model
+        #bound read methods of the ADCs, looked up once
+        self.read_current = board.reader(adc3_current)
+        self.read_p3 = board.reader(adc1)
+        self.read_p4 = board.reader(adc2)
+        self.read_therm = None
+        if adc4_therm is not None:
+            self.read_therm = board.reader(adc4_therm)
+        self.ibuf = arr.array('H')
+        self.p3buf = arr.array('H')
+        self.p4buf = arr.array('H')
+        self.tbuf = arr.array('H')
+        self.gpio1.low()
+        self.gpio2.low()
+        self.allocate(n)
+
+    def allocate(self, n):
+        """
+        Allocate the count, current, voltage and resistance arrays used by measure().
+
+        Called when the sensor is created and again only if measure() is asked for
+        more samples than the arrays hold, so repeated measurements reuse the same
+        memory and do not leave garbage on the heap.
+
+        Parameters
+        ----------
+        n: int
+            Number of samples per polarity the arrays must hold
+        """
+        self.size = n
+        self.imeas1 = arr.array('l',[0]*n)
+        self.imeas2 = arr.array('l',[0]*n)
+        self.p3meas1 = arr.array('l',[0]*n)
+        self.p3meas2 = arr.array('l',[0]*n)
+        self.p4meas1 = arr.array('l',[0]*n)
+        self.p4meas2 = arr.array('l',[0]*n)
+        self.i1 = arr.array('f',[0]*n)
+        self.i2 = arr.array('f',[0]*n)
+        self.V1 = arr.array('f',[0]*n)
+        self.V2 = arr.array('f',[0]*n)
+        self.R1 = arr.array('f',[0]*n)
+        self.R2 = arr.array('f',[0]*n)
+        self.tmeas = arr.array('l',[0]*n)
+        self.Tmeas = arr.array('f',[0]*n)
+
+    def conductivity(self,r2,cell_const,b):
+        """Apply the sensor-specific conductivity calibration equation.
+
+        Compute a sensor-specific value of conductivity from measured cell resistance
+        and calibration values. Returns a sensor-specific value of conductivity
+        Using the linear relationship between k and calibration data
+        Parameters are sensor-specific parameters that must
+        be found by calibration.  If the sensor has a calibration model (see
+        cal_model.py), the model is applied instead and cell_const and b are ignored.
+        
+        Parameters
+        ----------
+        r2 : float
+            Apparent resistance (ohms) of the solution when the power is applied to electrode connected 
+            directly to the power pin.
+        cell_const : float
+            cell constant (1/cm). Equivalent to slope of d(EC)/dR. 
+        b : float
+            intercept (micro S/cm) in equation EC = 1/(cell_c*R2)+b 
+
+        Returns
+        -------
+        float
+            Calibrated conductivity
+                
+        """
+        if self.model is not None:
+            return self.model.conductivity(r2)
+        k = 1/(cell_const*r2) + b
+        return k     
+
+    def salinity(self,T,k):
+        """Salinity computation for seawater and estuarine water.      
+        Salinity computation is from Miller, Bradford, and Peters,
+        USGS Water Supply Paper 2311.    
+        
+        Parameters
+        ----------      
+        T: float
+            Temperature (degrees C)
+        k: float
+            Conductance (mS/cm) 
+
+        Returns
+        -------
+        float
+            Salinity (parts per thousand), or -999 if k is not positive.  See
+            derived.salinity_batch() for arrays of readings.
+                
+        """
+        return derived.salinity(T, k)
+            
+    def k25(self,k,T):
+        """
+        Calculate conductivity at standard temperature of 25C, for KCl or fresh water (not seawater).
+        
+        Given by USGS Water Supply Paper and Pawlowicz 2008.  See derived.k25_batch()
+        for arrays of readings.
+        
+        """
+        return k*(1/(1+0.0191*(T-25)))
+    
+    def TDS(self,k25):
+        """
+        Calculate total dissolved solids from conductivity at 25C, from Pawlowicz 2008, which says the coefficient varies widely.
+        """
+        TDS = 0.65*k25
+        return TDS
+
+    def burst(self, imeas1, p3meas1, p4meas1, imeas2, p3meas2, p4meas2, n, freq = 2000, duty = 50, timer = 2, ch1 = 3, ch2 = 4, tmeas = None):
+        """
+        Fill the six count arrays using a timer-paced burst of ADC readings (board.timed_burst()).
+
+        On the pyboard, a single timer running in center-aligned mode drives gpio1 and 
+        gpio2 as complementary PWM outputs, so each pole is powered once per timer period.
+        The same timer paces ``ADC.read_timed_multi``, which generates an update
+        event at the top and bottom of each count, i.e. in the middle of each half-cycle.
+        The current, pole-3 and pole-4 channels are read back-to-back on each event,
+        so the three readings of a sample are only a few microseconds apart.  On the
+        Pico, a PIO state machine drives gpio1 and gpio2 while the ADC runs in round-robin
+        mode and DMA stores the readings.  Raises OSError on boards without a timed
+        burst (board.TIMED is False).
+        
+        Parameters
+        ----------
+        imeas1, p3meas1, p4meas1, imeas2, p3meas2, p4meas2: :obj:'array.array'
+            Count arrays of length n to be filled (normal polarity, then reverse polarity)
+        n: int
+            Number of excitation cycles (samples per polarity)
+        freq: int, optional
+            Number of half-cycles (ADC samples per channel) per second, default = 2000
+        duty: int, optional
+            Percent of each half-cycle that the power pin is on, up to 50, default = 50. 
+            Values under 50 leave a gap with both pins low around each transition.
+        timer: int, optional
+            Timer id with PWM channels on gpio1 and gpio2. Default is 2 (X3 = TIM2_CH3, X4 = TIM2_CH4).
+            On the Pico, the PIO state machine id.
+        ch1: int, optional
+            Timer channel connected to gpio1, default = 3 (not used on the Pico)
+        ch2: int, optional
+            Timer channel connected to gpio2, default = 4 (not used on the Pico)
+        tmeas: :obj:'array.array', optional
+            If given, the thermistor channel is read on every event as well, and its
+            readings at normal polarity are stored here.  Only meaningful when the 
+            thermistor is powered by gpio1 and grounded by gpio2.
+
+        Returns
+        -------
+        float
+            Achieved sample rate (half-cycles per second) over the burst
+        """
+        #raw buffers are kept between bursts and only grown when n increases
+        if len(self.ibuf) < 2*n:
+            self.ibuf = arr.array('H',[0]*(2*n))
+            self.p3buf = arr.array('H',[0]*(2*n))
+            self.p4buf = arr.array('H',[0]*(2*n))
+            self.tbuf = arr.array('H',[0]*(2*n))
+        ibuf = self.ibuf
+        p3buf = self.p3buf
+        p4buf = self.p4buf
+        tbuf = self.tbuf
+        adcs = (self.adc3_current, self.adc1, self.adc2)
+        bufs = (ibuf, p3buf, p4buf)
+        if tmeas is not None:
+            adcs = adcs + (self.adc4_therm,)
+            bufs = bufs + (tbuf,)
+        if len(ibuf) > 2*n:
+            #read_timed_multi fills whole buffers, so hand it views of the right length
+            bufs = tuple(memoryview(buf)[:2*n] for buf in bufs)
+
+        duty = min(duty, 50)
+        [self.burst_ok, elapsed] = board.timed_burst(self.gpio1, self.gpio2, adcs, bufs, freq, duty, timer, ch1, ch2)
+
+        #samples alternate between polarities, but the phase of the first update event
+        #is not fixed.  Current counts are low when gpio1 is on, so use them to sort.
+        even = 0
+        odd = 0
+        for i in range(n):
+            even += ibuf[2*i]
+            odd += ibuf[2*i+1]
+        first = 0 if even <= odd else 1
+        
+        for i in range(n):
+            j = 2*i + first
+            k = 2*i + 1 - first
+            imeas1[i] = ibuf[j]
+            p3meas1[i] = p3buf[j]
+            p4meas1[i] = p4buf[j]
+            imeas2[i] = ibuf[k]
+            p3meas2[i] = p3buf[k]
+            p4meas2[i] = p4buf[k]
+            if tmeas is not None:
+                tmeas[i] = tbuf[j]
+
+        return 2*n/elapsed*1000000
+
+    def acquire(self, n, on1 = 0, off1 = 0, on2 = 0, off2 = 0, start = 0, stamps = None):
+        """
+        Fill samples start to n-1 of the count arrays, reading the ADCs from Python.
+
+        Uses the board's fastest single-read method (board.reader()), looked up once
+        when the sensor is created.
+
+        Parameters
+        ----------
+        n: int
+            One past the last sample to fill
+        on1, off1, on2, off2: int, optional
+            Times in microseconds, as for measure()
+        start: int, optional
+            First sample to fill, default = 0
+        stamps: :obj:'array.array', optional
+            If given, time.ticks_us() after each polarity's readings is stored here, at
+            2*i for normal and 2*i+1 for reverse polarity (see capture.py).  Default none
+        """
+        imeas1 = self.imeas1
+        imeas2 = self.imeas2
+        p3meas1 = self.p3meas1
+        p3meas2 = self.p3meas2
+        p4meas1 = self.p4meas1
+        p4meas2 = self.p4meas2
+        read_current = self.read_current
+        read_p3 = self.read_p3
+        read_p4 = self.read_p4
+        for i in range(start, n):
+            #first measurement at initial polarity
+            self.gpio1.high()
+            time.sleep_us(on1)
+            imeas1[i] = read_current()
+            p3meas1[i] = read_p3()
+            p4meas1[i] = read_p4()
+            if stamps is not None:
+                stamps[2*i] = time.ticks_us()
+            self.gpio1.low()
+            time.sleep_us(off1)
+            
+            #second measurement at reverse polarity
+            self.gpio2.high()
+            time.sleep_us(on2)
+            imeas2[i] = read_current()
+            p3meas2[i] = read_p3()
+            p4meas2[i] = read_p4()
+            if stamps is not None:
+                stamps[2*i+1] = time.ticks_us()
+            self.gpio2.low()
+            time.sleep_us(off2)
+
+    def acquire_until(self, acquire, n, n_min, tol, on1 = 0, off1 = 0, on2 = 0, off2 = 0):
+        """
+        Take samples until the standard error of the mean resistance is at most tol.
+
+        Takes n_min samples, then STEP more at a time, estimating the standard error as
+        spread()/sqrt(samples) between blocks.  Samples with a failed resistance 
+        computation inflate the spread, so they make the measurement continue.
+
+        Parameters
+        ----------
+        acquire: function
+            acquire or acquire_combined
+        n: int
+            Maximum number of samples per polarity
+        n_min: int
+            Minimum number of samples per polarity (at least 2)
+        tol: float
+            Target standard error (ohm)
+        on1, off1, on2, off2: int, optional
+            Times in microseconds, as for measure()
+
+        Returns
+        -------
+        int
+            Number of samples per polarity taken
+        """
+        m = min(max(n_min, 2), n)
+        acquire(m, on1, off1, on2, off2)
+        while m < n:
+            compute_resistances(self.imeas1, self.p3meas1, self.p4meas1, self.imeas2, self.p3meas2, self.p4meas2,
+                                self.i1, self.i2, self.V1, self.V2, self.R1, self.R2, m, self.con_resistance)
+            if spread(self.R1, self.R2, m)/math.sqrt(m) <= tol:
+                break
+            stop = min(m + STEP, n)
+            acquire(stop, on1, off1, on2, off2, m)
+            m = stop
+        return m
+
+    def acquire_combined(self, n, on1 = 0, off1 = 0, on2 = 0, off2 = 0, start = 0):
+        """
+        Fill the count arrays and the thermistor count array in one excitation sequence.
+
+        If the thermistor is powered and grounded by gpio1 and gpio2 (wired in parallel
+        with the electrodes), it is read while gpio1 is high, alongside the conductivity
+        channels, and a matching dummy read is made while gpio2 is high so that both 
+        polarities stay on for the same time.  Otherwise the thermistor is powered during 
+        the off1 gap, while both electrode pins are low, and its ground pin is raised for 
+        the same length of time during the off2 gap, as in thermistor_ac.temperature().
+
+        Parameters
+        ----------
+        n: int
+            Number of excitation cycles (samples per polarity)
+        on1, off1, on2, off2: int, optional
+            Times in microseconds, as for measure(). With separate thermistor pins, off1 
+            is the time the thermistor is powered before it is read.
+        start: int, optional
+            First sample to fill, default = 0
+        """
+        imeas1 = self.imeas1
+        imeas2 = self.imeas2
+        p3meas1 = self.p3meas1
+        p3meas2 = self.p3meas2
+        p4meas1 = self.p4meas1
+        p4meas2 = self.p4meas2
+        tmeas = self.tmeas
+        shared = self.therm_power is self.gpio1 and self.therm_ground is self.gpio2
+        read_current = self.read_current
+        read_p3 = self.read_p3
+        read_p4 = self.read_p4
+        read_therm = self.read_therm
+        
+        for i in range(start, n):
+            #first measurement at initial polarity
+            self.gpio1.high()
+            time.sleep_us(on1)
+            imeas1[i] = read_current()
+            p3meas1[i] = read_p3()
+            p4meas1[i] = read_p4()
+            if shared:
+                tmeas[i] = read_therm()
+            self.gpio1.low()
+            
+            #sample the thermistor while the electrodes are idle
+            if shared:
+                time.sleep_us(off1)
+            elif self.therm_power is not None:
+                self.therm_power.on()
+                ontick = time.ticks_us()
+                time.sleep_us(off1)
+                tmeas[i] = read_therm()
+                self.therm_power.off()
+                time_on = time.ticks_diff(time.ticks_us(), ontick)
+            else:
+                time.sleep_us(off1)
+                tmeas[i] = read_therm()
+            
+            #second measurement at reverse polarity
+            self.gpio2.high()
+            time.sleep_us(on2)
+            imeas2[i] = read_current()
+            p3meas2[i] = read_p3()
+            p4meas2[i] = read_p4()
+            if shared:
+                read_therm()
+            self.gpio2.low()
+            
+            #reverse the thermistor current for as long as it was on
+            if not shared and self.therm_power is not None and self.therm_ground is not None:
+                self.therm_ground.on()
+                time.sleep_us(time_on)
+                self.therm_ground.off()
+            else:
+                time.sleep_us(off2)
+
+    def measure(self, printflag = False,n = 12,on1 = 0, off1 = 0, on2 = 0, off2 = 0, burst = False, freq = 2000, duty = 50, combined = False, tol = None, n_min = 8, T_tol = None): #take a reading
+        """
+        Performs a measurement of conductivity across a four-pole probe.
+        
+        Parameters
+        ----------
+        saveflag: boolean, optional
+            Flag to determine if output is saved for calibration, default false
+        n: int, optional
+            Number of adc readings to take for the measurement, default = 12
+        on1: int, optional
+            time in microseconds that power pin 1 is on before taking a reading, default = 0
+        off1: int, optional
+            time in microseconds that power pin 1 is turned off before turning on power pin, default = 0
+        on2: int, optional
+            time in microseconds that power pin 2 is on before taking a reading, default = 0
+        off2: int,optional
+            time in microseconds that power pin 2 is turned off before turning on power pin, default = 0
+        burst: boolean, optional
+            If true, use timer-paced burst acquisition (see burst(); PIO and DMA on the Pico)
+            instead of reading the ADCs from Python.  on1, off1, on2 and off2 are then ignored. Default false
+        freq: int, optional
+            Half-cycles per second in burst mode, default = 2000
+        duty: int, optional
+            Percent of each half-cycle that the power pin is on in burst mode, default = 50
+        combined: boolean, optional
+            If true, sample the thermistor once per excitation cycle during the conductivity
+            measurement (see acquire_combined()) instead of with 400 separate readings 
+            afterwards.  Temperature is then the trimmed mean of n readings, converted with 
+            the thermistor_ac lookup table. Default false
+        tol: float, optional
+            If given, stop sampling once the standard error of the mean resistance is at
+            most tol (ohm), checking every STEP samples (see acquire_until()); n is then the
+            maximum number of samples.  Ignored in burst mode. Default none (always n samples)
+        n_min: int, optional
+            Minimum number of samples per polarity when tol is given, default = 8
+        T_tol: float, optional
+            Passed to thermistor_ac.temperature() as tol (degrees C) when the thermistor is 
+            read separately, so it also stops early. Default none (400 readings)
+            
+        Returns
+        -------
+        resistance1 : float
+            Apparent resistance computed using normal polarity.
+        resistance2 : float
+            Apparent resistance computed using reverse polarity.
+        temperature : float
+            Temperature (degrees C)
+        conductivity : float
+            Conductivity.
+                            
+        Note
+        ----
+        Also sets the value for temperature, conductivity, counts, and resistances,
+        and the number of samples used (n_used and n_T)
+        """
+        
+        if self.stats_hook is not None:
+            mem_before = gc.mem_alloc()
+
+        #arrays for counts to be read into are allocated once and reused
+        if n > self.size:
+            self.allocate(n)
+        imeas1 = self.imeas1
+        imeas2 = self.imeas2
+        p3meas1 = self.p3meas1
+        p3meas2 = self.p3meas2
+        p4meas1 = self.p4meas1
+        p4meas2 = self.p4meas2
+
+        starttime = time.ticks_us()
+        #read1_us = arr.array('l',[0]*n)
+        #read2_us = arr.array('l',[0]*n)
+        #startticks = time.ticks_us()
+        shared = self.therm_power is self.gpio1 and self.therm_ground is self.gpio2
+        #without a thermistor there is nothing to sample alongside the electrodes
+        combined = combined and self.adc4_therm is not None
+        if burst:
+            #the thermistor can only share a burst if it is excited by the electrode pins
+            combined = combined and shared
+            tmeas = self.tmeas if combined else None
+            self.sample_rate = self.burst(imeas1, p3meas1, p4meas1, imeas2, p3meas2, p4meas2, n, freq, duty, tmeas = tmeas)
+        elif tol is not None:
+            #stop as soon as the precision target is met
+            acquire = self.acquire_combined if combined else self.acquire
+            n = self.acquire_until(acquire, n, n_min, tol, on1, off1, on2, off2)
+        elif combined:
+            self.acquire_combined(n, on1, off1, on2, off2)
+        else:
+            self.acquire(n, on1, off1, on2, off2)
+        self.n_used = n
+        
+        endtime = time.ticks_us()
+        if self.phase_hook is not None:
+            self.phase_hook('acquire', starttime)
+        
+        #current, voltage drop across poles, and resistance, for flow each direction
+        i1 = self.i1
+        i2 = self.i2
+        V1 = self.V1
+        V2 = self.V2
+        R1 = self.R1
+        R2 = self.R2
+
+        #compute current, voltage, and resistance for each sample (do outside sampling loop to maintain sampling timing)
+        errors = compute_resistances(imeas1, p3meas1, p4meas1, imeas2, p3meas2, p4meas2, i1, i2, V1, V2, R1, R2, n, self.con_resistance)
+        if errors:
+            print('Error in resistance computation (%s samples)' % errors)
+                
+        #print samples first, since the trimmed means below reorder the arrays in place
+        if printflag:
+            for i in range (n):
+                print('R1 = %s, R2 = %s, V1 = %s, V2 = %s, i1 = %s, i2 = %s, p3count1 = %s, p3count2 = %s, p4count1 = %s, p4count2 = %s' % (R1[i], R2[i], V1[i], V2[i], i1[i], i2[i], p3meas1[i], p3meas2[i], p4meas1[i], p4meas2[i]))
+
+        #clean data by sampling middle two quartiles
+        self.resistance1 = robust_stats.trimmed_mean(R1, n)
+        self.resistance2 = robust_stats.trimmed_mean(R2, n)
+
+        icount1 = robust_stats.trimmed_mean(imeas1, n)
+        probe3count1 = robust_stats.trimmed_mean(p3meas1, n)
+        probe4count1 = robust_stats.trimmed_mean(p4meas1, n)
+        icount2 = robust_stats.trimmed_mean(imeas2, n)
+        probe3count2 = robust_stats.trimmed_mean(p3meas2, n)
+        probe4count2 = robust_stats.trimmed_mean(p4meas2, n)
+        if self.phase_hook is not None:
+            self.phase_hook('compute', endtime)
+            therm_start = time.ticks_us()
+               
+        if combined:
+            #convert thermistor counts taken during the conductivity measurement
+            table = thermistor_ac.get_table(self.therm_resistance)
+            Tmeas = self.Tmeas
+            scale = 1 << board.SHIFT
+            for i in range(n):
+                Tmeas[i] = thermistor_ac.lookup(table, self.tmeas[i], scale)
+            self.T = robust_stats.trimmed_mean(Tmeas, n)
+            self.n_T = n
+        elif self.adc4_therm is None:
+            self.T = -999
+            self.n_T = 0
+        else:
+            #call thermistor reading, with up to 400 adc readings per measurement
+            self.T = thermistor_ac.temperature(self.adc4_therm, self.therm_power, self.therm_ground, self.therm_resistance, 400, tol = T_tol)        
+            self.n_T = thermistor_ac.n_used
+        if self.phase_hook is not None:
+            self.phase_hook('thermistor', therm_start)
+        ave_res = (self.resistance1 + self.resistance2)/2
+        self.k = self.conductivity(ave_res,self.cell_const,self.b)
+        self.S = -999
+        if self.T != -999:
+            self.S = self.salinity(self.T, self.k)
+        #self.k25 = self.k25(self.k,self.T)
+
+        elapsed_time = time.ticks_diff(endtime,starttime)  
+        
+        if printflag:
+            print('elapsed time = %s microseconds' % (elapsed_time))
+            print('frequency = %s Hz' % (n/elapsed_time*1000000))
+            print('samples used = %s, thermistor readings used = %s' % (self.n_used, self.n_T))
+            if burst:
+                print('burst sample rate = %s Hz (requested %s Hz, timing ok = %s)' % (self.sample_rate, freq, self.burst_ok))
+
+        if self.stats_hook is not None:
+            self.stats_hook(mem_before, gc.mem_alloc(), n)
+            
+        return(self.resistance1, self.resistance2, self.T, self.k, icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2)
+
+    def calibrate(self):
+        """
+        Record calibration data.
+
+        Prompts user to enter data about calibration standard, then makes measurement and 
+        saves results to user-specified file.
+        """
+        fname = input('Enter file name: ')
+        headerline = 'EC_from_Standard,Count1,Computed R1,Count2,Computed R2,Temperature\r\n'
+        f = open(fname,'w')
+        f.write(headerline)
+        f.close()
+
+        n = int(input('Enter number of samples to test: '))
+        for i in range(n):
+            k_cal = float(input('Enter conductivity for standard calibration fluid: '))
+            input('Now place probe in fluid and press enter when ready')
+            self.measure()
+            textline = ('%s,%s,%s,%s,%s,%s\r\n' % (k_cal,self.count1,self.r1,self.count2,self.r2,self.T))
+            print(textline)
+            f = open(fname,'a')
+            print(f.write(textline))
+            f.close()
+            time.sleep(0.5)
+            
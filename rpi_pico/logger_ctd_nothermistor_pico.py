@@ -5,14 +5,32 @@ import pressure
 import math
 import array as arr
 #import thermistor_ac
-import conductivity4pole_pico
+import conductivity4pole
+import logwriter
+import scheduler
+import idle
+import profiler
+import cal_model
 import time
 
-def log(t):
+def low_battery(threshold = 3.1):
+    """True if VSYS (read through the divider on GPIO 29) is below threshold (volts)."""
+    try:
+        return ADC(29).read_u16()*3*3.3/65535 < threshold
+    except:
+        return False
+
+def usb_attached():
+    """True if USB power (VBUS, sensed on GPIO 24) is present."""
+    return Pin(24, Pin.IN).value() == 1
+
+def log(t, binary = False, n = 50, tol = None, fast = None, k_change = 0.02, pres_change = 5, switch = None, profile = 0, cal = 'calCTD.json'):
     """ A function for logging data to file at a regular interval.
 
     The function saves a line of text at each interval representing conductivity, temperature,
-    pressure. The device then goes into standby mode for interval t.  After interval t, the
+    pressure, followed by the six raw counts returned by cond_sensor.measure(), so that 
+    resistance can be recomputed later (see host/reprocess.py), and the number of samples
+    used. The device then goes into standby mode for interval t.  After interval t, the
     device awakes as if from a hard reset.  The function is designed to be called from
     main.py. Puts device in standby mode upon completion.
 
@@ -20,6 +38,38 @@ def log(t):
     ----------
     t: int
         logging interval (seconds)
+    binary: boolean, optional
+        If True, records are packed by logwriter.log_writer and appended to
+        datalogCTD.bin in blocks of 32, or sooner if the battery is low or USB
+        power is attached. Default is False (text file).
+    n: int, optional
+        Number of conductivity samples per polarity, or the maximum if tol is given. Default is 50.
+    tol: float, optional
+        Target standard error of resistance (ohm) for adaptive sampling (see cond_sensor.measure()).
+        Default is None (always n samples).
+    fast: int, optional
+        If given, t is the base interval used while readings are steady, and the interval
+        drops to fast (seconds) when resistance or pressure changes by more than k_change
+        or pres_change between cycles, then decays back (see scheduler.event_scheduler).
+        Records taken at the faster rate are tagged in the burst column (text) or with 
+        logwriter.FLAG_BURST (binary). Default is None (fixed interval t).
+    k_change: float, optional
+        Relative change in resistance that starts a burst, default 0.02
+    pres_change: float, optional
+        Change in pressure (mbar) that starts a burst, default 5
+    switch: int, optional
+        GPIO number of a push button to ground.  Pressing it wakes the board, flushes the
+        binary log and takes the next reading.  Default is None (no switch).
+    profile: int, optional
+        If not 0, the time spent in each phase of the cycle (start flash, conductivity
+        acquisition and computation, pressure, write and the whole awake period) is appended
+        to profileCTD.txt every profile cycles (see profiler.phase_timer and
+        host/profile_summary.py). Default is 0 (no profiling).
+    cal: str, optional
+        Name of a calibration model file saved by cal_model.cal_model.save().  If the
+        file is on the board, conductivity is computed with that model instead of the
+        linear cell_const and b, and the calibrated value is written in the k column.
+        Default is 'calCTD.json'.
     
     Example
     -------
@@ -52,76 +102,151 @@ def log(t):
             time.sleep(t)
             
     #write file header
-    outputtxt = 'time(s),R1(ohm),R2(ohm),temp(C),pres(mbar)\r\n'
+    outputtxt = 'time(s),R1(ohm),R2(ohm),temp(C),pres(mbar),icount1,probe3count1,probe4count1,icount2,probe3count2,probe4count2,n,burst,k\r\n'
+    writer = None
     try:
-        f = open('datalogCTD.txt','a')
-        f.write(outputtxt)
-        f.close()
+        if binary:
+            writer = logwriter.log_writer('datalogCTD.bin', low_battery = low_battery, usb_attached = usb_attached)
+        else:
+            f = open('datalogCTD.txt','a')
+            f.write(outputtxt)
+            f.close()
     except:
         #short flash led if fails to write
         flash(20,0.2)
         
+    #define conductivity sensor once, so that its sample buffers are reused every cycle
+    gpio1 = Pin(19, Pin.OUT)  #connected directly to electrode
+    gpio2 = Pin(20, Pin.OUT)  #connected to resistor connected to electrode
+    adc1 = ADC(26)          #connected to middle pole not adjacent to
+    adc2 = ADC(27)          #connected to middle pole adjacent to resistor
+    adc3_current = ADC(28)
+    adc_therm = None        #Not used in pico 2040, but may be available on other 2040 boards
+    con_resistance = 250
+    therm_resistance = 20000
+    cell_const = 1    
+    b = 0     
+    try:
+        model = cal_model.load(cal)
+    except:
+        model = None
+        print('Could not read calibration model from %s, using cell_const and b' % cal)
+    conductivity_sensor = conductivity4pole.cond_sensor(gpio1,gpio2,adc1,adc2,adc3_current,adc_therm,con_resistance,therm_resistance,cell_const,b,n = n,model = model)
+
+    #define pressure sensor once, so that its PROM is read and checked only at start up
+    pres_power = Pin(18, Pin.OUT)
+    #pres_gnd = Pin(19, Pin.OUT_PP)   #not needed if ground pin directly connected to gnd
+    i2c = machine.I2C(0, scl=Pin(17), sda=Pin(16), freq = 100000)
+    try:
+        pres_sensor = pressure.MS5803_sensor(i2c, pres_power)
+        pres_sensor.power_off()
+    except:
+        pres_sensor = None
+        pres_power.value(0)
+        print('Pressure sensor not found')
+    
+    schedule = None
+    if fast is not None:
+        schedule = scheduler.event_scheduler(t, fast, k_change, pres_change)
+    interval = t
+    if switch is not None:
+        switch = Pin(switch, Pin.IN, Pin.PULL_UP)
+    #approximate currents (mA) in lightsleep and running at 10 MHz
+    sleeper = idle.idle_timer(switch, sleep_current = 1.4, awake_current = 8)
+    timer = None
+    if profile:
+        timer = profiler.phase_timer('profileCTD.txt', profile)
+        conductivity_sensor.phase_hook = timer.add
+    
     start_time = time.time()   
     
     while True:
         #single flash LED to let user know reading is being taken
         machine.freq(125000000)
+        awake = time.ticks_us()
         flash(1,0.25)
+        if timer is not None:
+            timer.add('start', awake)
         
-        log_time = start_time + t
+        log_time = start_time + interval
         start_time = log_time
         
-        #define conductivity sensor 
-        gpio1 = Pin(19, Pin.OUT)  #connected directly to electrode
-        gpio2 = Pin(20, Pin.OUT)  #connected to resistor connected to electrode
-        adc1 = ADC(26)          #connected to middle pole not adjacent to
-        adc2 = ADC(27)          #connected to middle pole adjacent to resistor
-        adc3_current = ADC(28)
-        #adc_therm = ADC(28)        #Not used in pico 2040, but may be available on other 2040 boards
-        con_resistance = 250
-        #therm_resistance = 20000
-        cell_const = 1    
-        b = 0     
-        conductivity_sensor = conductivity4pole_pico.cond_sensor(gpio1,gpio2,adc1,adc2,adc3_current,con_resistance,cell_const,b)
-
-        #define pressure sensor in Pressure.py.  
-        pres_power = Pin(18, Pin.OUT)
-        #pres_gnd = Pin(19, Pin.OUT_PP)   #not needed if ground pin directly connected to gnd
-        i2c = machine.I2C(0, scl=Pin(17), sda=Pin(16), freq = 100000)
-                    
         #read values from sensors
+        phase = time.ticks_us()
         try:
-            [r1, r2, icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2] = conductivity_sensor.measure(n = 50)
+            [r1, r2, T, k, icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2] = conductivity_sensor.measure(n = n, tol = tol)
+            n_used = conductivity_sensor.n_used
         except:
-            [r1, r2, icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2] = [-999,-999,-999,-999,-999,-999,-999,-999,-999,-999]
+            [r1, r2, T, k, icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2] = [-999,-999,-999,-999,-999,-999,-999,-999,-999,-999]
+            n_used = 0
+        if timer is not None:
+            timer.add('conductivity', phase)
         
+        phase = time.ticks_us()
         try:
-            [pres, ctemp] = pressure.MS5803(i2c, pres_power)
+            if pres_sensor is None:
+                #try again in case it was not connected at start up
+                pres_sensor = pressure.MS5803_sensor(i2c, pres_power)
+            else:
+                pres_sensor.power_on()
+            [pres, ctemp] = pres_sensor.read()
         except:
             pres = -999
             ctemp = -999
             print('Pressure reading failed')
             flash(5,.2)
+        pres_power.value(0)
+        if timer is not None:
+            timer.add('pressure', phase)
+        
+        #choose the next interval, sampling faster after a change
+        burst = 0
+        if schedule is not None:
+            if r1 == -999:
+                R = -999
+            else:
+                R = (r1 + r2)/2
+            next_interval = schedule.update(R, pres)
+            log_time += next_interval - interval
+            start_time = log_time
+            interval = next_interval
+            if schedule.burst:
+                burst = 1
         
         #write results to file
         #outputtxt = ('%s/%s/%s,%s:%s:%s,' % (datetime[0], datetime[1], datetime[2], datetime[4], datetime[5], datetime[6]))
         outputtxt = ('%s,' % (start_time-1609459241))
         outputtxt += ('%5.2f,%5.2f,' % (r1, r2))
         outputtxt += ('%5.2f,' % ctemp)
-        outputtxt += ('%5.1f\r\n' % pres)
+        outputtxt += ('%5.1f,' % pres)
+        outputtxt += ('%.2f,%.2f,%.2f,%.2f,%.2f,%.2f,' % (icount1, probe3count1, probe4count1, icount2, probe3count2, probe4count2))
+        outputtxt += ('%s,%s,%s\r\n' % (n_used, burst, k))
         print (outputtxt)
+        phase = time.ticks_us()
         try:
-            f = open('datalogCTD.txt','a')
-            f.write(outputtxt)
-            f.close()
+            if writer is not None:
+                writer.append(start_time, r1, r2, k = k, pressure = pres, ctemp = ctemp,
+                              icount1 = icount1, probe3count1 = probe3count1, probe4count1 = probe4count1,
+                              icount2 = icount2, probe3count2 = probe3count2, probe4count2 = probe4count2,
+                              flags = burst*logwriter.FLAG_BURST, n = n_used)
+            else:
+                f = open('datalogCTD.txt','a')
+                f.write(outputtxt)
+                f.close()
             flash(5,0.05)
         except:
             flash(20,0.2)
+        if timer is not None:
+            timer.add('write', phase)
+            timer.add('awake', awake)
+            timer.end_cycle()
         
         machine.freq(10000000)
-        while time.time() < log_time:          
-            flash(1, 0.05)
-            green.value(0)
-            time.sleep(1)
-            #machine.lightsleep(1)
+        #blink once, then sleep until the next reading or until the switch is pressed
+        flash(1, 0.05)
+        if sleeper.sleep_until(log_time):
+            if writer is not None:
+                writer.flush()
+            flash(3, 0.2)
+        print('idle: %d wakes, %.2f mA' % (sleeper.wakes, sleeper.current))
             
@@ -1,18 +1,284 @@
+"""Reading pressure and temperature from an MS5803 sensor over I2C.
+
+The sensor is hooked up according to instructions at
+the `cave pearl project <https://thecavepearlproject.org/2014/03/27/adding-a-ms5803-02-high-resolution-pressure-sensor/>`_.
+Power and ground should be connected through a 100 nf (104) decoupling capacitor, and CSB
+should be pulled high using a 10 kOhm resistor.  Tested with MS5803_BA.
+"""
+import time
+
+#command offsets and maximum conversion times (microseconds) for each oversampling ratio
+OSR_COMMAND = {256: 0x00, 512: 0x02, 1024: 0x04, 2048: 0x06, 4096: 0x08}
+OSR_WAIT_US = {256: 600, 512: 1170, 1024: 2280, 2048: 4540, 4096: 9040}
+#time (microseconds) for the supply and decoupling capacitor to settle after the power pin goes high
+POWER_UP_US = 10000
+
+def crc4(prom):
+    """Compute the 4-bit CRC of the eight PROM words, following application note AN520.
+
+    Parameters
+    ----------
+    prom : list of int
+        The eight 16-bit PROM words, with the CRC in the low four bits of the last word
+
+    Returns
+    -------
+    int
+        CRC (0-15) computed from the PROM contents
+    """
+    n_rem = 0
+    for cnt in range(16):
+        word = prom[cnt >> 1]
+        if cnt == 15:
+            word = word & 0xFF00   #the CRC itself is excluded
+        if cnt % 2 == 1:
+            n_rem ^= word & 0x00FF
+        else:
+            n_rem ^= word >> 8
+        for n_bit in range(8):
+            if n_rem & 0x8000:
+                n_rem = ((n_rem << 1) ^ 0x3000) & 0xFFFF
+            else:
+                n_rem = (n_rem << 1) & 0xFFFF
+    return (n_rem >> 12) & 0x000F
+
+class MS5803_sensor:
+    """A class for reading pressure and temperature from an MS5803 sensor.
+
+    The calibration coefficients are read from PROM once, checked against the CRC
+    stored in the sensor, and kept for later readings.  Conversions wait only as
+    long as the datasheet requires for the chosen oversampling ratio, and can be
+    started and read back separately so that other work can be done while the
+    sensor converts.
+
+    Parameters
+    ----------
+    i2c : :obj:'machine.I2C'
+        An I2C bus object
+    power_pin : :obj:'machine.PIN', optional
+        Pin object representing the pin used to power the MS5803
+    ground_pin : :obj:'machine.PIN', optional
+        Pin object representing the pin used to ground the MS5803 (optional)
+    osr : int, optional
+        Oversampling ratio (256, 512, 1024, 2048 or 4096). Default is 256.
+    address : int, optional
+        I2C address of the sensor. Default is 0x76 (118).
+
+    Attributes
+    ----------
+    C : list of int
+        Calibration coefficients C1 to C6 (C[0] is unused)
+    pressure : float
+        Pressure in hPa from the last reading
+    temperature : float
+        Temperature in degrees C from the last reading
+
+    Example
+    -------
+    >>> from machine import I2C, Pin
+    >>> import pressure
+    >>> i2c = I2C(scl='X9', sda='X10', freq = 100000)
+    >>> power_pin = Pin('Y7', Pin.OUT_PP)
+    >>> ground_pin = Pin('Y8', Pin.OUT_PP)
+    >>> sensor = pressure.MS5803_sensor(i2c, power_pin, ground_pin, osr = 1024)
+    >>> [pres, ctemp] = sensor.read()
+    >>> wait_us = sensor.start_conversion('pressure')
+    >>> #do something else for wait_us microseconds
+    >>> D1 = sensor.read_result()
+    >>> sensor.power_off()
+
+    """
+
+    def __init__(self, i2c, power_pin = None, ground_pin = None, osr = 256, address = 0x76):
+        if osr not in OSR_COMMAND:
+            raise ValueError('osr must be one of 256, 512, 1024, 2048 or 4096')
+        self.i2c = i2c
+        self.power_pin = power_pin
+        self.ground_pin = ground_pin
+        self.osr = osr
+        self.address = address
+        self.C = None
+        self.ready_at = None
+        self.pressure = None
+        self.temperature = None
+        self.power_on()
+
+    def power_on(self):
+        """Power the sensor if it is powered from pins, reset it, and read PROM if not yet cached."""
+        #turn on power and turn off ground if necessary
+        if not(self.power_pin is None):
+            self.power_pin.value(1)
+        if not(self.ground_pin is None):
+            self.ground_pin.value(0)
+        #let the supply settle before the reset command
+        if not(self.power_pin is None and self.ground_pin is None):
+            time.sleep_us(POWER_UP_US)
+        self.reset()
+        if self.C is None:
+            self.read_prom()
+
+    def power_off(self):
+        """Turn off the power pin, if there is one.  The cached PROM is kept."""
+        if not(self.power_pin is None):
+            self.power_pin.value(0)
+
+    def reset(self):
+        """Send the reset command and wait for the PROM to reload (2.8 ms)."""
+        #       0x1E(30)    Reset command
+        self.i2c.writeto(self.address, bytearray([0x1E]))
+        time.sleep_us(2800)
+        self.ready_at = None
+
+    def read_prom(self):
+        """Read the eight PROM words, check the CRC and store coefficients C1 to C6.
+
+        Raises
+        ------
+        ValueError
+            If the CRC computed from PROM does not match the stored CRC
+        """
+        prom = []
+        for i in range(8):
+            data = self.i2c.readfrom_mem(self.address, 0xA0 + 2*i, 2)
+            prom.append(data[0] * 256 + data[1])
+        if crc4(prom) != prom[7] & 0x000F:
+            raise ValueError('MS5803 PROM CRC check failed')
+        self.C = prom[0:7]
+
+    def start_conversion(self, kind = 'pressure'):
+        """Start a pressure (D1) or temperature (D2) conversion and return without waiting.
+
+        Parameters
+        ----------
+        kind : str, optional
+            'pressure' or 'temperature'. Default is 'pressure'.
+
+        Returns
+        -------
+        int
+            Time (microseconds) until the result can be read
+        """
+        if kind == 'pressure':
+            command = 0x40
+        elif kind == 'temperature':
+            command = 0x50
+        else:
+            raise ValueError("kind must be 'pressure' or 'temperature'")
+        self.i2c.writeto(self.address, bytearray([command + OSR_COMMAND[self.osr]]))
+        wait = OSR_WAIT_US[self.osr]
+        self.ready_at = time.ticks_add(time.ticks_us(), wait)
+        return wait
+
+    def read_result(self, retries = 3):
+        """Wait until the last conversion is complete, then read the 24-bit result.
+
+        The sensor returns 0 if the result is read before the conversion finishes,
+        so a zero reading is retried after a short wait.
+
+        Parameters
+        ----------
+        retries : int, optional
+            Number of extra attempts if the sensor returns 0. Default is 3.
+
+        Returns
+        -------
+        int
+            Raw ADC value (D1 or D2)
+        """
+        if self.ready_at is None:
+            raise ValueError('no conversion has been started')
+        remaining = time.ticks_diff(self.ready_at, time.ticks_us())
+        if remaining > 0:
+            time.sleep_us(remaining)
+        for attempt in range(retries + 1):
+            # Read data back from 0x00(0), 3 bytes
+            # MSB2, MSB1, LSB
+            value = self.i2c.readfrom_mem(self.address, 0x00, 3)
+            result = value[0] * 65536 + value[1] * 256 + value[2]
+            if result != 0:
+                break
+            time.sleep_us(OSR_WAIT_US[256])
+        self.ready_at = None
+        return result
+
+    def compensate(self, D1, D2):
+        """Convert raw values to pressure and temperature using the cached coefficients.
+
+        Parameters
+        ----------
+        D1 : int
+            Raw pressure value
+        D2 : int
+            Raw temperature value
+
+        Returns
+        -------
+        pressure : float
+            Pressure in hPa.
+        temperature : float
+            Temperature in degrees C.
+        """
+        [C0, C1, C2, C3, C4, C5, C6] = self.C
+        dT = D2 - C5 * 256
+        TEMP = 2000 + dT * C6 / 8388608
+        OFF = C2 * 262144 + (C4 * dT) / 32
+        SENS = C1 * 131072 + (C3 * dT ) / 128
+        T2 = 0
+        OFF2 = 0
+        SENS2 = 0
+
+        if TEMP > 2000 :
+            T2 = 0
+            OFF2 = 0
+            SENS2 = 0
+        elif TEMP < 2000 :
+            T2 = 3 * (dT * dT) / 8589934592
+            OFF2 = 3 * ((TEMP - 2000) * (TEMP - 2000)) / 8
+            SENS2 = 7 * ((TEMP - 2000) * (TEMP - 2000)) / 8
+            if TEMP < -1500 :
+                SENS2 = SENS2 + 3 * ((TEMP + 1500) * (TEMP +1500))
+
+        TEMP = TEMP - T2
+        OFF = OFF - OFF2
+        SENS = SENS - SENS2
+        pressure = ((((D1 * SENS) / 2097152) - OFF) / 32768.0) / 100.0
+        cTemp = TEMP / 100.0
+        return([pressure, cTemp])
+
+    def read(self):
+        """Convert and read pressure, then temperature.
+
+        Returns
+        -------
+        pressure : float
+            Pressure in hPa.
+        temperature : float
+            Temperature in degrees C.
+        """
+        self.start_conversion('pressure')
+        D1 = self.read_result()
+        self.start_conversion('temperature')
+        D2 = self.read_result()
+        [self.pressure, self.temperature] = self.compensate(D1, D2)
+        return([self.pressure, self.temperature])
+
 def MS5803(i2c, power_pin=None, ground_pin=None):
     """ A micropython function for reading pressure and temperature from an MS5803 sensor.
-    
-    The function assumes that the MS5803 is hooked up according to instructions at 
+
+    The function assumes that the MS5803 is hooked up according to instructions at
     the `cave pearl project <https://thecavepearlproject.org/2014/03/27/adding-a-ms5803-02-high-resolution-pressure-sensor/>`_.
     Power and ground should be connected through a 100 nf (104) decoupling capacitor, and CSB
-    should be pulled high using a 10 kOhm resistor.  Tested with MS5803_BA. 
+    should be pulled high using a 10 kOhm resistor.  Tested with MS5803_BA.
     Code modified from code originally developed for raspberry pi at the `control everything community <https://github.com/ControlEverythingCommunity/MS5803-05BA/blob/master/Python/MS5803_05BA.py>`_.
-    
+    Kept for compatibility; it creates an MS5803_sensor, takes one OSR-256 reading and
+    turns the power pin off again.
+
     Parameters
     ----------
 	i2c : :obj:'machine.I2C'
 		An I2C bus object
 	power_pin : :obj:'machine.PIN', optional
-		Pin object representing the pin used to power the MS5803 
+		Pin object representing the pin used to power the MS5803
 	ground_pin : :obj:'machine.PIN', optional
 		Pin object representing the pin used to ground the MS5803 (optional)
 
@@ -22,7 +288,7 @@ def MS5803(i2c, power_pin=None, ground_pin=None):
         Pressure in hPa.
     temperature : float
         Temperature in degrees C.
-         
+
     Example
     -------
     >>> from machine import I2C, Pin
@@ -31,112 +297,17 @@ def MS5803(i2c, power_pin=None, ground_pin=None):
     >>> power_pin = Pin('Y7', Pin.OUT_PP)
     >>> ground_pin = Pin('Y8', Pin.OUT_PP)
     >>> [pres, ctemp] = pressure.MS5803(i2c, power_pin, ground_pin)
-    
+
     """
-    import time
-    
-    #turn on power and turn off ground if necessary
-    if not(power_pin is None):
-        power_pin.value(1)
-        
-    if not(ground_pin is None):
-        ground_pin.value(0)
-        
-    #check if device is connected--should be at address 118
-    #i2c.scan()
-    
-    # MS5803_05BA address, 0x76(118)
-    #       0x1E(30)    Reset command
-    reset_command = bytearray([0x1E])
-    i2c.writeto(0x76, reset_command)
-
-    time.sleep(0.5)
-
-    # Read 12 bytes of calibration data
-    # Read pressure sensitivity
-    data = bytearray(2)
-    data = i2c.readfrom_mem(0x76, 0xA2, 2)
-    C1 = data[0] * 256 + data[1]
-
-    # Read pressure offset
-    data = i2c.readfrom_mem(0x76, 0xA4, 2)
-    C2 = data[0] * 256 + data[1]
-
-    # Read temperature coefficient of pressure sensitivity
-    data = i2c.readfrom_mem(0x76, 0xA6, 2)
-    C3 = data[0] * 256 + data[1]
-
-    # Read temperature coefficient of pressure offset
-    data = i2c.readfrom_mem(0x76, 0xA8, 2)
-    C4 = data[0] * 256 + data[1]
-
-    # Read reference temperature
-    data = i2c.readfrom_mem(0x76, 0xAA, 2)
-    C5 = data[0] * 256 + data[1]
-
-    # Read temperature coefficient of the temperature
-    data = i2c.readfrom_mem(0x76, 0xAC, 2)
-    C6 = data[0] * 256 + data[1]
-
-    # MS5803_05BA address, 0x76(118)
-    #       0x40(64)    Pressure conversion(OSR = 256) command
-    pressure_command = bytearray([0x40])
-    i2c.writeto(0x76, pressure_command)
-
-    time.sleep(0.5)
-
-    # Read digital pressure value
-    # Read data back from 0x00(0), 3 bytes
-    # D1 MSB2, D1 MSB1, D1 LSB
-    value = bytearray(3)
-    value = i2c.readfrom_mem(0x76, 0x00, 3)
-    D1 = value[0] * 65536 + value[1] * 256 + value[2]
-
-    # MS5803_05BA address, 0x76(118)
-    #       0x50(64)    Temperature conversion(OSR = 256) command
-    temperature_command = bytearray([0x50])
-    i2c.writeto(0x76, temperature_command)
-    time.sleep(0.5)
-
-    # Read digital temperature value
-    # Read data back from 0x00(0), 3 bytes
-    # D2 MSB2, D2 MSB1, D2 LSB
-
-    value = i2c.readfrom_mem(0x76, 0x00, 3)
-    D2 = value[0] * 65536 + value[1] * 256 + value[2]
-
-    dT = D2 - C5 * 256
-    TEMP = 2000 + dT * C6 / 8388608
-    OFF = C2 * 262144 + (C4 * dT) / 32
-    SENS = C1 * 131072 + (C3 * dT ) / 128
-    T2 = 0
-    OFF2 = 0
-    SENS2 = 0
-
-    if TEMP > 2000 :
-        T2 = 0
-        OFF2 = 0
-        SENS2 = 0
-    elif TEMP < 2000 :
-        T2 = 3 * (dT * dT) / 8589934592
-        OFF2 = 3 * ((TEMP - 2000) * (TEMP - 2000)) / 8
-        SENS2 = 7 * ((TEMP - 2000) * (TEMP - 2000)) / 8
-        if TEMP < -1500 :
-            SENS2 = SENS2 + 3 * ((TEMP + 1500) * (TEMP +1500))
-
-    TEMP = TEMP - T2
-    OFF = OFF - OFF2
-    SENS = SENS - SENS2
-    pressure = ((((D1 * SENS) / 2097152) - OFF) / 32768.0) / 100.0
-    cTemp = TEMP / 100.0
+    sensor = MS5803_sensor(i2c, power_pin, ground_pin)
+    [pressure, cTemp] = sensor.read()
     fTemp = cTemp * 1.8 + 32
 
     # Output data to screen
     print("Pressure : %.2f mbar" %pressure)
     print("Temperature in Celsius : %.2f C" %cTemp)
     print("Temperature in Fahrenheit : %.2f F" %fTemp)
-    
-    if not(power_pin is None):
-        power_pin.value(0)
-        
+
+    sensor.power_off()
+
     return([pressure, cTemp])
@@ -0,0 +1,152 @@
+"""Robust statistics computed in place on array.array buffers.
+
+The drivers reduce each burst of ADC readings to the mean of the middle two quartiles.
+Doing that with ``sorted(a)[lower:upper]`` builds two new lists on the heap for every
+call.  The functions here instead partially order the buffer in place using
+quickselect (Wirth's selection algorithm), which takes O(n) time on average and
+does not allocate.  Note that the buffer is reordered by every function in this module.
+Integer arrays are handled without any allocation; reading a value from a float
+array still creates a short-lived float object on ports that box floats.
+"""
+import math
+import array as arr
+import micropython
+
+@micropython.native
+def select(a, k, lo = 0, hi = None):
+    """Partially order a[lo:hi] in place so that a[k] holds its sorted value.
+
+    After the call, every element of a[lo:k] is less than or equal to a[k] and
+    every element of a[k+1:hi] is greater than or equal to a[k].
+
+    Parameters
+    ----------
+    a: :obj:'array.array' or list
+        Buffer to be reordered
+    k: int
+        Index of the order statistic to find (lo <= k < hi)
+    lo: int, optional
+        First index of the range to consider, default = 0
+    hi: int, optional
+        One past the last index of the range to consider, default = len(a)
+
+    Returns
+    -------
+    value
+        The k-th smallest value of a[lo:hi]
+    """
+    if hi is None:
+        hi = len(a)
+    hi -= 1
+    while lo < hi:
+        x = a[k]
+        i = lo
+        j = hi
+        while True:
+            while a[i] < x:
+                i += 1
+            while x < a[j]:
+                j -= 1
+            if i <= j:
+                a[i], a[j] = a[j], a[i]
+                i += 1
+                j -= 1
+            if i > j:
+                break
+        if j < k:
+            lo = i
+        if k < i:
+            hi = j
+    return a[k]
+
+def trimmed_mean(a, n = None, lower = None, upper = None):
+    """Mean of the values that would occupy a[lower:upper] if a[:n] were sorted.
+
+    Defaults give the mean of the middle two quartiles used throughout the
+    drivers, i.e. lower = floor(n/4) and upper = ceil(3n/4).
+
+    Parameters
+    ----------
+    a: :obj:'array.array' or list
+        Buffer of readings (reordered in place)
+    n: int, optional
+        Number of readings at the start of a to use, default = len(a)
+    lower: int, optional
+        Index of the first sorted value to include
+    upper: int, optional
+        One past the index of the last sorted value to include
+
+    Returns
+    -------
+    float
+        Trimmed mean
+    """
+    if n is None:
+        n = len(a)
+    if lower is None:
+        lower = math.floor(n/4)
+    if upper is None:
+        upper = math.ceil(3*n/4)
+    if lower > 0:
+        select(a, lower, 0, n)
+    if upper < n:
+        select(a, upper - 1, lower, n)
+    total = 0
+    for i in range(lower, upper):
+        total += a[i]
+    return total/(upper - lower)
+
+def median(a, n = None):
+    """Median of a[:n], averaging the two middle values when n is even.
+
+    Parameters
+    ----------
+    a: :obj:'array.array' or list
+        Buffer of readings (reordered in place)
+    n: int, optional
+        Number of readings at the start of a to use, default = len(a)
+
+    Returns
+    -------
+    float
+        Median
+    """
+    if n is None:
+        n = len(a)
+    half = n//2
+    upper = select(a, half, 0, n)
+    if n % 2:
+        return upper
+    #after selection, the largest value in a[:half] is the lower middle value
+    lower = a[0]
+    for i in range(1, half):
+        if a[i] > lower:
+            lower = a[i]
+    return (lower + upper)/2
+
+def mad(a, n = None, scratch = None):
+    """Median absolute deviation of a[:n] from its median (unscaled).
+
+    Parameters
+    ----------
+    a: :obj:'array.array' or list
+        Buffer of readings (reordered in place)
+    n: int, optional
+        Number of readings at the start of a to use, default = len(a)
+    scratch: :obj:'array.array', optional
+        Float buffer of at least n elements for the deviations.  One is
+        allocated if not given.
+
+    Returns
+    -------
+    float
+        Median absolute deviation
+    """
+    if n is None:
+        n = len(a)
+    if scratch is None:
+        scratch = arr.array('f',[0]*n)
+    m = median(a, n)
+    for i in range(n):
+        scratch[i] = abs(a[i] - m)
+    return median(scratch, n)